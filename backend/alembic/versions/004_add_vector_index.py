@@ -0,0 +1,43 @@
+"""add ANN index on embeddings.embedding
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-12-01 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_embeddings_embedding_ann"
+
+
+def upgrade() -> None:
+    # Index type and build parameters come from settings (VECTOR_INDEX_TYPE etc.)
+    index_type = settings.vector_index_type.lower()
+
+    if index_type == "hnsw":
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON embeddings "
+            f"USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)})"
+        )
+    elif index_type == "ivfflat":
+        # IVFFlat clusters existing rows: build it after the table has data
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON embeddings "
+            f"USING ivfflat (embedding vector_cosine_ops) "
+            f"WITH (lists = {int(settings.ivfflat_lists)})"
+        )
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
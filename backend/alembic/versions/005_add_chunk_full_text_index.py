@@ -0,0 +1,36 @@
+"""add full-text search column and GIN index on embeddings.chunk_text
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-12-08 10:00:00.000000
+
+"""
+
+from alembic import op
+from app.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_embeddings_chunk_tsv"
+
+
+def upgrade() -> None:
+    # Stored generated column: kept in sync by Postgres, no write-path changes
+    config = settings.text_search_config.replace("'", "")
+    op.execute(
+        f"ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS chunk_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{config}'::regconfig, chunk_text)) STORED"
+    )
+    op.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON embeddings USING gin (chunk_tsv)"
+    )
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+    op.execute("ALTER TABLE embeddings DROP COLUMN IF EXISTS chunk_tsv")
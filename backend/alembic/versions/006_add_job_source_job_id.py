@@ -0,0 +1,41 @@
+"""add source_job_id to jobs for reused results, index jobs.video_id
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-12-15 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Jobs that reuse another job's blog post point at that job
+    op.add_column(
+        "jobs", sa.Column("source_job_id", postgresql.UUID(as_uuid=True), nullable=True)
+    )
+    op.create_foreign_key(
+        "fk_jobs_source_job_id",
+        "jobs",
+        "jobs",
+        ["source_job_id"],
+        ["id"],
+        ondelete="SET NULL",
+    )
+    # Freshness lookups find the latest completed job per video
+    op.create_index("ix_jobs_video_id", "jobs", ["video_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_video_id", table_name="jobs")
+    op.drop_constraint("fk_jobs_source_job_id", "jobs", type_="foreignkey")
+    op.drop_column("jobs", "source_job_id")
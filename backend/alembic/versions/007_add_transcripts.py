@@ -0,0 +1,42 @@
+"""add transcripts table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-12-22 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Downloaded transcripts: raw timed segments plus compressed joined text
+    op.create_table(
+        "transcripts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("video_id", sa.String(), nullable=False),
+        sa.Column("language", sa.String(), nullable=False),
+        sa.Column("segments", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("text_compressed", sa.LargeBinary(), nullable=False),
+        sa.Column("compression", sa.String(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "video_id", "language", name="uq_transcripts_video_id_language"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("transcripts")
@@ -0,0 +1,42 @@
+"""add job_checkpoints table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-12-29 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One row per completed pipeline stage of a job
+    op.create_table(
+        "job_checkpoints",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("stage", sa.String(), nullable=False),
+        sa.Column("data", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("duration_seconds", sa.Float(), nullable=True),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False
+        ),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("job_id", "stage", name="uq_job_checkpoints_job_id_stage"),
+    )
+    op.create_index("ix_job_checkpoints_job_id", "job_checkpoints", ["job_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_checkpoints_job_id", table_name="job_checkpoints")
+    op.drop_table("job_checkpoints")
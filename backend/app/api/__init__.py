@@ -1,11 +1,13 @@
 """API routes."""
 from fastapi import APIRouter
-from app.api import generate, status, health, email
+from app.api import generate, status, stream, search, health, email
 
 router = APIRouter()
 
 # Include sub-routers
 router.include_router(generate.router, prefix="/generate", tags=["generate"])
 router.include_router(status.router, prefix="/status", tags=["status"])
+router.include_router(stream.router, prefix="/stream", tags=["stream"])
+router.include_router(search.router, prefix="/search", tags=["search"])
 router.include_router(health.router, prefix="/health", tags=["health"])
 router.include_router(email.router, prefix="/email", tags=["email"])
@@ -1,48 +1,142 @@
 """Generate blog post endpoint."""
 import uuid
 import traceback
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas import GenerateRequest, JobResponse
 from app.models.database import JobStatus
-from app.workers.tasks import generate_blog_post_task
 from app.db.session import get_db
 from app.db.crud import JobRepository
+from app.services.events import publish_progress
+from app.services.dedupe import REUSED, lookup_video, reuse_or_attach
+from app.services import scheduler
+from app.config import settings
 
 router = APIRouter()
 
 
+def submitter_key(request: GenerateRequest, http_request: Request) -> str:
+    """Key a job is fairly scheduled by: the given submitter, email, or client address."""
+    if request.submitter:
+        return request.submitter
+    if request.email:
+        return request.email.lower()
+    return http_request.client.host if http_request.client else "anonymous"
+
+
 @router.post("", response_model=JobResponse)
-async def generate_blog_post(request: GenerateRequest, session: AsyncSession = Depends(get_db)):
+async def generate_blog_post(
+    request: GenerateRequest,
+    http_request: Request,
+    session: AsyncSession = Depends(get_db)
+):
     """
     Generate a blog post from a YouTube video.
     
     Creates a background job to process the video and generate the blog post.
+    Jobs wait in the interactive or bulk lane and are dispatched round-robin
+    across submitters; a full lane or a submitter with too many waiting jobs
+    is refused with 503/429 and a Retry-After header.
     """
+    submitter = submitter_key(request, http_request)
+    lane = request.mode
+    if settings.fair_scheduling_enabled:
+        try:
+            lane = await scheduler.admit(lane, submitter)
+        except scheduler.AdmissionError as e:
+            raise HTTPException(
+                status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+            )
+        except Exception as e:
+            print(f"⚠️ Admission check failed, accepting job: {e}")
+    
     try:
         # Create unique job ID
         job_id = uuid.uuid4()
         
         # Save job to database
-        await JobRepository.create(
+        job = await JobRepository.create(
             session,
             job_id=job_id,
             channel_name=request.channel_name,
             video_title=request.video_title
         )
         
-        # Enqueue Celery task
-        generate_blog_post_task.delay(
-            job_id=str(job_id),
-            channel_name=request.channel_name,
-            video_title=request.video_title,
-            email=request.email
-        )
+        # Seed the progress snapshot so status reads never need the database
+        try:
+            await publish_progress(
+                str(job_id),
+                JobStatus.QUEUED.value,
+                0,
+                "Queued",
+                created_at=job.created_at.isoformat()
+            )
+        except Exception as e:
+            print(f"⚠️ Could not publish initial progress for {job_id}: {e}")
+        
+        # A request that resolved to a video before can reuse or join existing work
+        outcome = None
+        if settings.video_dedupe_enabled:
+            try:
+                video_id = await lookup_video(request.channel_name, request.video_title)
+                if video_id:
+                    await JobRepository.update_video_id(session, job_id, video_id)
+                    outcome = await reuse_or_attach(session, str(job_id), video_id)
+            except Exception as e:
+                print(f"⚠️ Dedupe check failed for {job_id}: {e}")
+        
+        if outcome == REUSED:
+            return JobResponse(
+                job_id=str(job_id),
+                status=JobStatus.COMPLETED.value,
+                message="A recent blog post for this video was reused.",
+                reused=True
+            )
+        if outcome:
+            return JobResponse(
+                job_id=str(job_id),
+                status=JobStatus.RUNNING.value,
+                message="Attached to an in-flight generation of this video. Check status using the job_id.",
+                reused=True
+            )
+        
+        # Queue the job behind the submitter's earlier jobs, then hand
+        # whatever fits the lane's in-flight budget to Celery
+        task_kwargs = {
+            "job_id": str(job_id),
+            "channel_name": request.channel_name,
+            "video_title": request.video_title,
+            "email": request.email,
+            "priority": scheduler.PRIORITY_LEVELS[request.priority or scheduler.DEFAULT_PRIORITY[lane]],
+            "lane": lane
+        }
+        priority = task_kwargs["priority"]
+        queued = False
+        if settings.fair_scheduling_enabled:
+            try:
+                await scheduler.enqueue(lane, submitter, str(job_id), task_kwargs, priority)
+                queued = True
+            except Exception as e:
+                print(f"⚠️ Scheduler unavailable, sending job {job_id} directly: {e}")
+        if not queued:
+            await scheduler.asend_job(lane, task_kwargs, priority)
+        else:
+            # Once queued, the job must only leave through dispatch: a failure
+            # here leaves it for the next dispatch pass
+            try:
+                await scheduler.dispatch(lane)
+            except Exception as e:
+                print(f"⚠️ Dispatch failed, job {job_id} stays queued: {e}")
         
+        deferred = lane != request.mode
         return JobResponse(
             job_id=str(job_id),
             status=JobStatus.QUEUED.value,
-            message="Blog post generation started. Check status using the job_id."
+            message=(
+                "Interactive queue is busy; job deferred to the bulk queue. Check status using the job_id."
+                if deferred else "Blog post generation started. Check status using the job_id."
+            ),
+            queue=lane
         )
         
     except Exception as e:
@@ -1,6 +1,8 @@
 """Health check endpoint."""
+from typing import Dict
 from fastapi import APIRouter
 from app.models.schemas import HealthResponse
+from app.services.rate_limit import get_rate_limiter
 
 router = APIRouter()
 
@@ -19,3 +21,15 @@ async def health_check():
         database="connected",
         redis="connected"
     )
+
+
+@router.get("/rate-limits")
+async def rate_limit_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    Time spent waiting for the model rate limiter, per model.
+    
+    With the redis backend the counters cover every worker; otherwise only
+    this process.
+    """
+    rate_limiter = get_rate_limiter()
+    return rate_limiter.stats() if rate_limiter is not None else {}
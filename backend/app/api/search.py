@@ -0,0 +1,81 @@
+"""Semantic search endpoint."""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.schemas import SearchResponse, SearchResult
+from app.db.session import get_db
+from app.services.embeddings import get_embedding_service
+
+router = APIRouter()
+
+
+def encode_cursor(position: Tuple[float, int]) -> str:
+    """Encode a (distance, chunk id) keyset position as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor from encode_cursor, rejecting malformed ones."""
+    try:
+        distance, chunk_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(distance), int(chunk_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=1000, description="Search query"),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page"
+    ),
+    channel: Optional[str] = Query(None, description="Only posts from this channel"),
+    video_id: Optional[str] = Query(None, description="Only posts from this video"),
+    date_from: Optional[datetime] = Query(
+        None, description="Only posts created at or after this time"
+    ),
+    date_to: Optional[datetime] = Query(
+        None, description="Only posts created before this time"
+    ),
+    min_similarity: Optional[float] = Query(
+        None, ge=-1, le=1, description="Minimum cosine similarity"
+    ),
+    collapse: bool = Query(
+        False, description="Return only the best chunk per blog post"
+    ),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Search generated blog posts by meaning.
+
+    Filters, the similarity threshold and keyset pagination run in the
+    database; follow next_cursor until it is null to page through results.
+    """
+    after = decode_cursor(cursor) if cursor else None
+
+    try:
+        hits, next_after = await get_embedding_service().search(
+            session,
+            q,
+            limit=limit,
+            after=after,
+            channel=channel,
+            video_id=video_id,
+            date_from=date_from,
+            date_to=date_to,
+            min_similarity=min_similarity,
+            collapse=collapse,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+    return SearchResponse(
+        query=q,
+        results=[SearchResult(**hit) for hit in hits],
+        next_cursor=encode_cursor(next_after) if next_after else None,
+    )
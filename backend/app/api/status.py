@@ -1,61 +1,166 @@
 """Job status endpoint."""
+from typing import Any, Dict, Optional
 from uuid import UUID
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas import JobStatusResponse, BlogPostResponse
 from app.models.database import JobStatus
 from app.db.session import get_db
 from app.db.crud import JobRepository, BlogPostRepository
+from app.services.events import (
+    TERMINAL_STATUSES, follow_progress, format_sse, get_progress, wait_for_progress
+)
+from app.services.dedupe import leader_snapshot_fields
 
 router = APIRouter()
 
 
+def _parse_job_id(job_id: str) -> UUID:
+    """Parse a job ID, rejecting malformed ones."""
+    try:
+        return UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+
+async def _read_snapshot(job_id: str, wait: float, version: int) -> Optional[Dict[str, Any]]:
+    """Read the job's progress snapshot from Redis, long-polling if asked to."""
+    try:
+        if wait > 0:
+            snapshot = await wait_for_progress(job_id, version, wait)
+        else:
+            snapshot = await get_progress(job_id)
+        
+        # Attached to another job's run for the same video: report that run's progress
+        if snapshot and snapshot.get("source_job_id") and snapshot["status"] not in TERMINAL_STATUSES:
+            leader = await get_progress(snapshot["source_job_id"])
+            if leader:
+                snapshot.update(leader_snapshot_fields(leader))
+        return snapshot
+    except Exception as e:
+        # Redis unavailable: fall back to the database
+        print(f"Progress snapshot unavailable for {job_id}: {e}")
+        return None
+
+
 @router.get("/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str, session: AsyncSession = Depends(get_db)):
+async def get_job_status(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for a newer version than `version`"),
+    version: int = Query(0, ge=0, description="Last version seen by the client"),
+    session: AsyncSession = Depends(get_db)
+):
     """
     Get the status of a blog generation job.
-    
+
+    Progress is served from the Redis snapshot the worker publishes; the
+    database is only read for the finished blog post or when no snapshot
+    exists. With `wait` > 0 the request blocks until the job's version
+    moves past `version` (long-poll) or the wait elapses.
+
     Returns job progress and result if completed.
     """
+    job_uuid = _parse_job_id(job_id)
+
     try:
-        # Parse UUID
-        job_uuid = UUID(job_id)
-        
-        # Fetch job from database
-        job = await JobRepository.get_by_id(session, job_uuid)
-        
-        if not job:
-            raise HTTPException(status_code=404, detail="Job not found")
-        
-        # Base response
-        response = JobStatusResponse(
-            job_id=str(job.id),
-            status=job.status,
-            progress=job.progress,
-            created_at=job.created_at.isoformat(),
-            message=f"Job {job.status}"
-        )
-        
-        # If completed, fetch blog post
-        if job.status == JobStatus.COMPLETED.value:
-            blog_post = await BlogPostRepository.get_by_job_id(session, job_uuid)
-            
+        snapshot = await _read_snapshot(job_id, wait, version)
+
+        if snapshot:
+            response = JobStatusResponse(
+                job_id=job_id,
+                status=snapshot["status"],
+                progress=snapshot.get("progress", 0),
+                created_at=snapshot.get("created_at") or snapshot["updated_at"],
+                updated_at=snapshot["updated_at"],
+                error_message=snapshot.get("error"),
+                message=snapshot.get("message"),
+                version=snapshot["version"],
+                reused=bool(snapshot.get("source_job_id"))
+            )
+            blog_post_id = snapshot.get("blog_post_id")
+            source_job_id = snapshot.get("source_job_id")
+        else:
+            # Fetch job from database
+            job = await JobRepository.get_by_id(session, job_uuid)
+
+            if not job:
+                raise HTTPException(status_code=404, detail="Job not found")
+
+            response = JobStatusResponse(
+                job_id=str(job.id),
+                status=job.status,
+                progress=job.progress,
+                created_at=job.created_at,
+                updated_at=job.updated_at,
+                completed_at=job.completed_at,
+                error_message=job.error_message,
+                message=f"Job {job.status}",
+                reused=job.source_job_id is not None
+            )
+            blog_post_id = None
+            source_job_id = job.source_job_id
+
+        # If completed, fetch blog post (a reused result belongs to the source job)
+        if response.status == JobStatus.COMPLETED.value:
+            if blog_post_id:
+                blog_post = await BlogPostRepository.get_by_id(session, blog_post_id)
+            else:
+                owner = UUID(str(source_job_id)) if source_job_id else job_uuid
+                blog_post = await BlogPostRepository.get_by_job_id(session, owner)
+
             if blog_post:
-                response.blog_post = BlogPostResponse(
-                    id=blog_post.id,
+                response.result = BlogPostResponse(
                     title=blog_post.title,
-                    content=blog_post.content,
+                    markdown_content=blog_post.content,
                     video_metadata=blog_post.video_metadata,
-                    created_at=blog_post.created_at.isoformat()
+                    created_at=blog_post.created_at
                 )
-        
-        # If failed, include error
-        if job.status == JobStatus.FAILED and job.error_message:
-            response.message = job.error_message
-        
+
         return response
-        
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+
+
+@router.get("/{job_id}/events")
+async def stream_job_status(job_id: str):
+    """
+    Push job progress as server-sent events.
+
+    Emits `progress` events carrying the full status snapshot and closes
+    once the job completes or fails.
+    """
+    _parse_job_id(job_id)
+
+    async def event_stream():
+        async for event in follow_progress(job_id):
+            # None means no update for a while: send a keep-alive comment
+            yield format_sse(event) if event else ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/{job_id}/ws")
+async def job_status_websocket(websocket: WebSocket, job_id: str):
+    """Push job progress snapshots over a WebSocket until the job finishes."""
+    try:
+        UUID(job_id)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        async for event in follow_progress(job_id):
+            if event:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
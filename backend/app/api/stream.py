@@ -0,0 +1,39 @@
+"""Server-sent events endpoint streaming generated blog tokens."""
+
+from uuid import UUID
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.services.events import follow_token_stream, format_sse
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+async def stream_job_tokens(job_id: str):
+    """
+    Stream blog tokens for a job as server-sent events.
+
+    Emits `token` events ({stage, token, section}) while sections and the
+    final polish are generated, and a single `end` event ({status, error})
+    when the job finishes. Tokens published before the connection are not
+    replayed; a job that already finished gets its `end` event at once.
+    """
+    try:
+        UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+
+    async def event_stream():
+        async for event in follow_token_stream(job_id):
+            if event is None:
+                # Keep-alive comment so proxies don't close an idle stream
+                yield ": keep-alive\n\n"
+                continue
+
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -20,15 +20,91 @@ class Settings(BaseSettings):
     postgres_password: str = "postgres"
     postgres_db: str = "ytblog"
     
+    # Embeddings
+    embedding_provider: str = "openai"  # openai or local (hashed n-grams, offline)
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int = 1536  # Must match the embeddings.embedding column
+    
+    # Embedding cache (memory alone, or a local LRU tier in front of redis/sqlite)
+    embedding_cache_backend: str = "memory"  # none, memory, redis or sqlite
+    embedding_cache_local_entries: int = 5000
+    embedding_cache_max_entries: int = 50000
+    embedding_cache_ttl_seconds: int = 30 * 24 * 60 * 60
+    
+    # Vector search (pgvector ANN index)
+    vector_index_type: str = "hnsw"  # hnsw, ivfflat or none (exact search)
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40  # Candidates per query; higher = better recall, slower
+    hnsw_iterative_scan: bool = True  # Filtered/paged searches scan on until the page fills; needs pgvector >= 0.8
+    ivfflat_lists: int = 100  # Roughly rows / 1000 up to 1M rows
+    ivfflat_probes: int = 10  # Lists scanned per query
+    
+    # Hybrid search (full-text + vector, fused with reciprocal rank fusion)
+    text_search_config: str = "english"  # Postgres text search configuration
+    hybrid_candidates: int = 20  # Results taken from each ranker before fusion
+    rrf_k: int = 60  # Damps the weight of top ranks; 60 is the usual choice
+    
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     
     # Celery
     celery_broker_url: str = "redis://localhost:6379/0"
     celery_result_backend: str = "redis://localhost:6379/0"
+    stage_max_retries: int = 3  # Retries per pipeline stage before the job fails
+    stage_retry_backoff_max_seconds: int = 300
+    worker_max_in_flight: int = 16  # Concurrent jobs per worker process; keep within the DB pool (10 + 20 overflow)
+    
+    # LLM pipeline
+    llm_context_tokens: int = 0  # Override the model's context window (0 = use model default)
+    section_concurrency: int = 4  # Max section_chain calls in flight per job
+    section_max_retries: int = 2  # Extra attempts for a failed section
+    section_context_top_k: int = 4  # Transcript chunks retrieved per section
+    key_points_mode: str = "map_reduce"  # single or map_reduce
+    key_points_chunk_tokens: int = 3000  # Transcript tokens per map call
+    key_points_max_transcript_tokens: int = 60000  # Token budget for the whole transcript
+    key_points_map_concurrency: int = 4
+    
+    # LLM response cache
+    llm_cache_backend: str = "memory"  # none, memory, redis or sqlite
+    llm_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    llm_cache_max_entries: int = 1000
+    llm_cache_sqlite_path: str = "llm_cache.sqlite3"
+    
+    # Model rate limits: token buckets per model, queueing calls instead of hitting 429s
+    rate_limit_backend: str = "memory"  # none, memory (per process) or redis (shared by all workers)
+    rate_limits: str = "gpt-4=500:10000,text-embedding-3-small=3000:1000000"  # model=RPM:TPM,...
+    
+    # Job scheduling: interactive/bulk lanes, round-robin across submitters, admission control
+    fair_scheduling_enabled: bool = True
+    scheduler_interactive_max_in_flight: int = 32  # Running interactive jobs across all workers
+    scheduler_bulk_max_in_flight: int = 8  # Running bulk jobs across all workers
+    scheduler_default_weight: int = 1  # Jobs a submitter dispatches per round-robin turn
+    scheduler_submitter_weights: str = ""  # Overrides: submitter=weight,...
+    scheduler_in_flight_ttl_seconds: int = 60 * 60  # Frees the slot of a job that never finished
+    scheduler_dispatch_interval_seconds: int = 15  # Periodic dispatch from each worker (0 = off)
+    admission_interactive_max_pending: int = 100  # Beyond this, interactive jobs go to the bulk lane
+    admission_bulk_max_pending: int = 5000  # Beyond this, new jobs are refused (503)
+    admission_max_pending_per_submitter: int = 500  # Beyond this, the submitter is refused (429)
+    
+    # Video-level dedupe of generation jobs
+    video_dedupe_enabled: bool = True
+    video_reuse_window_seconds: int = 24 * 60 * 60  # Reuse completed posts this fresh (0 = never)
+    video_lock_ttl_seconds: int = 30 * 60  # Longer than a generation run
+    video_lookup_ttl_seconds: int = 7 * 24 * 60 * 60  # (channel, title) -> video_id memo
     
     # YouTube
     youtube_api_key: str = ""
+    youtube_cache_backend: str = "memory"  # none, memory, redis or sqlite
+    youtube_cache_local_entries: int = 1000  # In-process tier in front of redis/sqlite
+    youtube_cache_max_entries: int = 10000
+    youtube_channel_cache_ttl_seconds: int = 30 * 24 * 60 * 60  # Handle -> channel ID
+    youtube_search_cache_ttl_seconds: int = 6 * 60 * 60  # (channel ID, query) -> videos
+    youtube_api_base_url: str = "https://www.googleapis.com/youtube/v3"
+    youtube_http2: bool = True  # Used when the h2 package is installed
+    youtube_http_timeout_seconds: float = 10.0
+    youtube_http_max_connections: int = 20
+    transcript_store_enabled: bool = True  # Keep downloaded transcripts in Postgres
     
     # SendGrid
     sendgrid_api_key: str = ""
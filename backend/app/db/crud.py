@@ -1,22 +1,38 @@
 """Database CRUD operations."""
-from typing import Optional, List
+from datetime import timedelta
+from typing import Dict, Optional, List
 from uuid import UUID
-from sqlalchemy import select, update
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.database import Job, BlogPost, Embedding, JobStatus
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.database import Job, BlogPost, Embedding, JobCheckpoint, JobStatus, Transcript
+
+# Rows per multi-row INSERT; keeps bind parameters well under asyncpg's 32767 limit
+BULK_INSERT_BATCH_SIZE = 1000
 
 
 class JobRepository:
     """CRUD operations for Job model."""
     
     @staticmethod
-    async def create(session: AsyncSession, job_id: UUID, channel_name: str, video_title: str) -> Job:
+    async def create(
+        session: AsyncSession,
+        job_id: UUID,
+        channel_name: str,
+        video_title: str,
+        video_id: Optional[str] = None,
+        source_job_id: Optional[UUID] = None,
+        status: JobStatus = JobStatus.QUEUED
+    ) -> Job:
         """Create a new job."""
         job = Job(
             id=job_id,
             channel_name=channel_name,
             video_title=video_title,
-            status=JobStatus.QUEUED
+            video_id=video_id,
+            source_job_id=source_job_id,
+            status=status,
+            progress=100 if status == JobStatus.COMPLETED else 0
         )
         session.add(job)
         await session.commit()
@@ -67,6 +83,30 @@ class JobRepository:
         await session.commit()
 
 
+    @staticmethod
+    async def attach_result(
+        session: AsyncSession,
+        job_id: UUID,
+        source_job_id: UUID,
+        status: Optional[JobStatus] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Point a job at the job whose result it reuses, optionally finishing it."""
+        stmt = update(Job).where(Job.id == job_id).values(source_job_id=source_job_id)
+        
+        if status is not None:
+            stmt = stmt.values(status=status)
+            if status == JobStatus.COMPLETED:
+                stmt = stmt.values(progress=100)
+            if status in (JobStatus.COMPLETED, JobStatus.FAILED):
+                stmt = stmt.values(completed_at=func.now())
+        if error is not None:
+            stmt = stmt.values(error_message=error)
+        
+        await session.execute(stmt)
+        await session.commit()
+
+
 class BlogPostRepository:
     """CRUD operations for BlogPost model."""
     
@@ -97,6 +137,26 @@ class BlogPostRepository:
         )
         return result.scalar_one_or_none()
     
+    @staticmethod
+    async def get_recent_by_video_id(
+        session: AsyncSession,
+        video_id: str,
+        max_age_seconds: int
+    ) -> Optional[BlogPost]:
+        """Get the newest blog post for a video created within max_age_seconds."""
+        result = await session.execute(
+            select(BlogPost)
+            .join(Job, BlogPost.job_id == Job.id)
+            .where(
+                Job.video_id == video_id,
+                Job.status == JobStatus.COMPLETED.value,
+                BlogPost.created_at >= func.now() - timedelta(seconds=max_age_seconds)
+            )
+            .order_by(BlogPost.created_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+    
     @staticmethod
     async def get_by_id(session: AsyncSession, blog_id: int) -> Optional[BlogPost]:
         """Get blog post by ID."""
@@ -128,6 +188,37 @@ class EmbeddingRepository:
         await session.flush()
         return embedding
     
+    @staticmethod
+    async def bulk_create(
+        session: AsyncSession,
+        blog_post_id: int,
+        chunks: List[str],
+        embedding_vectors: List[List[float]],
+        batch_size: int = BULK_INSERT_BATCH_SIZE
+    ) -> int:
+        """
+        Create embeddings for all chunks of a blog post.
+        
+        Rows are written with one multi-row INSERT per batch instead of one
+        flush per chunk.
+        
+        Returns:
+            Number of embeddings created
+        """
+        rows = [
+            {
+                "blog_post_id": blog_post_id,
+                "chunk_text": chunk,
+                "embedding": embedding_vector,
+                "chunk_index": idx
+            }
+            for idx, (chunk, embedding_vector) in enumerate(zip(chunks, embedding_vectors))
+        ]
+        
+        for start in range(0, len(rows), batch_size):
+            await session.execute(insert(Embedding).values(rows[start:start + batch_size]))
+        return len(rows)
+    
     @staticmethod
     async def get_by_blog_post(session: AsyncSession, blog_post_id: int) -> List[Embedding]:
         """Get all embeddings for a blog post."""
@@ -137,3 +228,64 @@ class EmbeddingRepository:
             .order_by(Embedding.chunk_index)
         )
         return list(result.scalars().all())
+
+
+class TranscriptRepository:
+    """CRUD operations for Transcript model."""
+    
+    @staticmethod
+    async def get(session: AsyncSession, video_id: str, language: str) -> Optional[Transcript]:
+        """Get the stored transcript for a video and language."""
+        result = await session.execute(
+            select(Transcript).where(Transcript.video_id == video_id, Transcript.language == language)
+        )
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    async def upsert(
+        session: AsyncSession,
+        video_id: str,
+        language: str,
+        segments: List[dict],
+        text_compressed: bytes,
+        compression: str
+    ) -> None:
+        """Store a transcript, replacing any earlier copy."""
+        values = {
+            "segments": segments,
+            "text_compressed": text_compressed,
+            "compression": compression
+        }
+        stmt = pg_insert(Transcript).values(video_id=video_id, language=language, **values)
+        await session.execute(
+            stmt.on_conflict_do_update(constraint="uq_transcripts_video_id_language", set_=values)
+        )
+        await session.commit()
+
+
+class CheckpointRepository:
+    """CRUD operations for JobCheckpoint model."""
+    
+    @staticmethod
+    async def get_all(session: AsyncSession, job_id: UUID) -> Dict[str, JobCheckpoint]:
+        """Get a job's checkpoints keyed by stage."""
+        result = await session.execute(
+            select(JobCheckpoint).where(JobCheckpoint.job_id == job_id)
+        )
+        return {checkpoint.stage: checkpoint for checkpoint in result.scalars().all()}
+    
+    @staticmethod
+    async def save(
+        session: AsyncSession,
+        job_id: UUID,
+        stage: str,
+        data: dict,
+        duration_seconds: Optional[float] = None
+    ) -> None:
+        """Store a stage's output, replacing any earlier checkpoint of it."""
+        values = {"data": data, "duration_seconds": duration_seconds}
+        stmt = pg_insert(JobCheckpoint).values(job_id=job_id, stage=stage, **values)
+        await session.execute(
+            stmt.on_conflict_do_update(constraint="uq_job_checkpoints_job_id_stage", set_=values)
+        )
+        await session.commit()
@@ -1,16 +1,22 @@
 """Database connection and session management."""
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
 
+
+def create_db_engine() -> AsyncEngine:
+    """Create the async engine and its connection pool."""
+    return create_async_engine(
+        settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=True,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20
+    )
+
+
 # Create async engine
-engine = create_async_engine(
-    settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=True,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
-)
+engine = create_db_engine()
 
 # Create async session factory
 async_session_maker = async_sessionmaker(
@@ -24,6 +30,24 @@ async_session_maker = async_sessionmaker(
 Base = declarative_base()
 
 
+def init_engine() -> AsyncEngine:
+    """
+    Replace the engine with a fresh pool and rebind the session factory.
+    
+    Worker processes call this after forking so each owns its own pool,
+    created for the event loop that will use it.
+    """
+    global engine
+    engine = create_db_engine()
+    async_session_maker.configure(bind=engine)
+    return engine
+
+
+async def dispose_engine() -> None:
+    """Close every pooled connection of the current engine."""
+    await engine.dispose()
+
+
 async def get_db() -> AsyncSession:
     """Dependency for getting async database sessions."""
     async with async_session_maker() as session:
@@ -3,11 +3,14 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 from uuid import UUID
-from sqlalchemy import Column, String, Text, DateTime, Integer, JSON, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID as PostgreSQLUUID
+from sqlalchemy import (
+    Column, String, Text, DateTime, Integer, Float, ForeignKey, Computed, LargeBinary, UniqueConstraint
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID as PostgreSQLUUID
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
+from app.config import settings
 
 
 Base = declarative_base()
@@ -28,7 +31,7 @@ class Job(Base):
     id = Column(PostgreSQLUUID(as_uuid=True), primary_key=True)
     channel_name = Column(String, nullable=False)
     video_title = Column(String, nullable=False)
-    video_id = Column(String, nullable=True)
+    video_id = Column(String, nullable=True, index=True)
     email = Column(String, nullable=True)
     status = Column(String, default=JobStatus.QUEUED.value)
     progress = Column(Integer, default=0)
@@ -36,10 +39,12 @@ class Job(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    source_job_id = Column(
+        PostgreSQLUUID(as_uuid=True), ForeignKey("jobs.id", ondelete="SET NULL"), nullable=True
+    )  # Job whose blog post this job reuses
     
     # Relationship
     blog_post = relationship("BlogPost", back_populates="job", uselist=False)
-    embeddings = relationship("Embedding", back_populates="job")
 
 
 class BlogPost(Base):
@@ -47,15 +52,15 @@ class BlogPost(Base):
     __tablename__ = "blog_posts"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    job_id = Column(String, ForeignKey("jobs.id"), unique=True, nullable=False)
+    job_id = Column(PostgreSQLUUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
     title = Column(String, nullable=False)
-    markdown_content = Column(Text, nullable=False)
-    html_content = Column(Text, nullable=True)
-    video_metadata = Column(JSON, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    content = Column(Text, nullable=False)
+    video_metadata = Column(JSONB, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Relationship
     job = relationship("Job", back_populates="blog_post")
+    embeddings = relationship("Embedding", back_populates="blog_post")
 
 
 class Embedding(Base):
@@ -63,11 +68,45 @@ class Embedding(Base):
     __tablename__ = "embeddings"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    job_id = Column(String, ForeignKey("jobs.id"), nullable=False)
-    content = Column(Text, nullable=False)
-    vector = Column(Vector(1536))  # OpenAI text-embedding-3 dimension
-    chunk_metadata = Column(JSON, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    blog_post_id = Column(Integer, ForeignKey("blog_posts.id", ondelete="CASCADE"), nullable=False, index=True)
+    chunk_text = Column(Text, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    embedding = Column(Vector(1536), nullable=False)  # OpenAI text-embedding-3 dimension
+    chunk_tsv = Column(TSVECTOR, Computed(
+        f"to_tsvector('{settings.text_search_config}'::regconfig, chunk_text)", persisted=True
+    ))  # Full-text search vector, GIN indexed
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Relationship
-    job = relationship("Job", back_populates="embeddings")
+    blog_post = relationship("BlogPost", back_populates="embeddings")
+
+
+class Transcript(Base):
+    """Downloaded video transcript, kept so jobs never fetch it twice."""
+    __tablename__ = "transcripts"
+    __table_args__ = (
+        UniqueConstraint("video_id", "language", name="uq_transcripts_video_id_language"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(String, nullable=False)
+    language = Column(String, nullable=False)
+    segments = Column(JSONB, nullable=False)  # [{"text", "start", "duration"}, ...]
+    text_compressed = Column(LargeBinary, nullable=False)  # Joined text
+    compression = Column(String, nullable=False)  # zstd or zlib
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class JobCheckpoint(Base):
+    """Output of one completed pipeline stage, so a retry resumes after it."""
+    __tablename__ = "job_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("job_id", "stage", name="uq_job_checkpoints_job_id_stage"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(PostgreSQLUUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    stage = Column(String, nullable=False)
+    data = Column(JSONB, nullable=False)
+    duration_seconds = Column(Float, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -1,6 +1,6 @@
 """Pydantic schemas for API requests and responses."""
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -10,6 +10,13 @@ class GenerateRequest(BaseModel):
     channel_name: str = Field(..., min_length=1, max_length=255, description="YouTube channel name or handle")
     video_title: str = Field(..., min_length=1, max_length=500, description="Video title to search for")
     email: Optional[EmailStr] = Field(None, description="Optional email to send the blog post")
+    mode: Literal["interactive", "bulk"] = Field("interactive", description="Queue lane: interactive or bulk")
+    priority: Optional[Literal["high", "normal", "low"]] = Field(
+        None, description="Priority within the workers' queues (default: normal, low for bulk)"
+    )
+    submitter: Optional[str] = Field(
+        None, max_length=255, description="Key jobs are fairly scheduled by (defaults to email, then client address)"
+    )
 
 
 class SendEmailRequest(BaseModel):
@@ -24,6 +31,8 @@ class JobResponse(BaseModel):
     job_id: str
     status: str
     message: str
+    reused: bool = Field(False, description="Served by another job's run for the same video")
+    queue: Optional[str] = Field(None, description="Lane the job was queued in")
 
 
 class JobStatusResponse(BaseModel):
@@ -35,6 +44,9 @@ class JobStatusResponse(BaseModel):
     updated_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    message: Optional[str] = None
+    version: Optional[int] = Field(None, description="Progress version, for long-polling with ?version=")
+    reused: bool = Field(False, description="Result comes from another job's run for the same video")
     result: Optional["BlogPostResponse"] = None
 
 
@@ -53,6 +65,25 @@ class EmailResponse(BaseModel):
     message: str
 
 
+class SearchResult(BaseModel):
+    """A matching blog post chunk."""
+    chunk_text: str
+    chunk_index: int
+    blog_post_id: int
+    blog_title: str
+    channel_name: Optional[str] = None
+    video_id: Optional[str] = None
+    similarity_score: float
+    created_at: datetime
+
+
+class SearchResponse(BaseModel):
+    """A page of semantic search results."""
+    query: str
+    results: List[SearchResult]
+    next_cursor: Optional[str] = Field(None, description="Pass as ?cursor= to fetch the next page")
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str
@@ -1,13 +1,20 @@
 """Services package."""
-from app.services.youtube import YouTubeService
-from app.services.llm_pipeline import LLMPipeline
-from app.services.embeddings import EmbeddingService
+from app.services.youtube import (
+    YouTubeService, AsyncYouTubeService, get_youtube_service, get_async_youtube_service
+)
+from app.services.llm_pipeline import LLMPipeline, get_llm_pipeline
+from app.services.embeddings import EmbeddingService, get_embedding_service
 from app.services.email import EmailService
 
 __all__ = [
     "YouTubeService",
+    "get_youtube_service",
+    "AsyncYouTubeService",
+    "get_async_youtube_service",
     "LLMPipeline",
+    "get_llm_pipeline",
     "EmbeddingService",
+    "get_embedding_service",
     "EmailService",
 ]
 # Services will be implemented in next phase
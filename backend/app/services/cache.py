@@ -0,0 +1,372 @@
+"""Pluggable key-value caches with TTL/size eviction and hit/miss counters."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a content-addressed cache key from JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a cache."""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        """Return counters as a plain dict for logging/metrics."""
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hit_ratio}
+
+
+class CacheBackend:
+    """Base class for string-valued caches."""
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+
+    def _record(self, value: Optional[str]) -> Optional[str]:
+        """Update hit/miss counters for a lookup result."""
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value or None."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        """Store a value."""
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Return the cached value or None (async)."""
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Store a value (async)."""
+        self.set(key, value)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        """Return cached values (or None) for several keys."""
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        """Store several values."""
+        for key, value in items.items():
+            self.set(key, value)
+
+    async def aget_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        """Return cached values (or None) for several keys (async)."""
+        return [await self.aget(key) for key in keys]
+
+    async def aset_many(self, items: Dict[str, str]) -> None:
+        """Store several values (async)."""
+        for key, value in items.items():
+            await self.aset(key, value)
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with optional TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[int] = None):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return self._record(None)
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return self._record(None)
+
+            self._data.move_to_end(key)
+            return self._record(value)
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    """Redis-backed cache shared across worker processes.
+
+    Entries expire via Redis TTLs; size is bounded by the server's
+    maxmemory eviction policy.
+    """
+
+    def __init__(
+        self, redis_url: str, namespace: str, ttl_seconds: Optional[int] = None
+    ):
+        import redis
+        import redis.asyncio as aioredis
+
+        super().__init__(ttl_seconds)
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self._aclient = aioredis.Redis.from_url(redis_url, decode_responses=True)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        return self._record(self._client.get(self._key(key)))
+
+    def set(self, key: str, value: str) -> None:
+        self._client.set(self._key(key), value, ex=self.ttl_seconds)
+
+    async def aget(self, key: str) -> Optional[str]:
+        return self._record(await self._aclient.get(self._key(key)))
+
+    async def aset(self, key: str, value: str) -> None:
+        await self._aclient.set(self._key(key), value, ex=self.ttl_seconds)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return [
+            self._record(value)
+            for value in self._client.mget([self._key(k) for k in keys])
+        ]
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(key), value, ex=self.ttl_seconds)
+            pipe.execute()
+
+    async def aget_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        values = await self._aclient.mget([self._key(k) for k in keys])
+        return [self._record(value) for value in values]
+
+    async def aset_many(self, items: Dict[str, str]) -> None:
+        async with self._aclient.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(key), value, ex=self.ttl_seconds)
+            await pipe.execute()
+
+
+class SQLiteCache(CacheBackend):
+    """Local SQLite file cache, handy for tests and single-host runs."""
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[int] = None,
+    ):
+        super().__init__(ttl_seconds)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return self._record(None)
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+                self._conn.commit()
+                return self._record(None)
+
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._conn.commit()
+            return self._record(value)
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, value, expires_at, now),
+            )
+            # Evict least recently used entries beyond max_entries
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key NOT IN ("
+                "SELECT key FROM cache WHERE namespace = ? "
+                "ORDER BY accessed_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+            self._conn.commit()
+
+
+class TieredCache(CacheBackend):
+    """Checks a fast local tier before a shared tier, promoting shared hits.
+
+    stats counts a hit when any tier has the key; each tier keeps its own
+    stats as well.
+    """
+
+    def __init__(self, local: CacheBackend, shared: CacheBackend):
+        super().__init__()
+        self.local = local
+        self.shared = shared
+
+    @staticmethod
+    def _missing(local_values: List[Optional[str]]) -> List[int]:
+        """Positions the local tier could not serve."""
+        return [i for i, value in enumerate(local_values) if value is None]
+
+    def _merge(
+        self,
+        keys: Sequence[str],
+        local_values: List[Optional[str]],
+        missing: List[int],
+        shared_values: List[Optional[str]],
+    ) -> Tuple[List[Optional[str]], Dict[str, str]]:
+        """Fill local misses from the shared tier; return values and entries to promote."""
+        values = list(local_values)
+        promoted = {}
+        for i, value in zip(missing, shared_values):
+            values[i] = value
+            if value is not None:
+                promoted[keys[i]] = value
+        for value in values:
+            self._record(value)
+        return values, promoted
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many({key: value})
+
+    async def aget(self, key: str) -> Optional[str]:
+        return (await self.aget_many([key]))[0]
+
+    async def aset(self, key: str, value: str) -> None:
+        await self.aset_many({key: value})
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        local_values = self.local.get_many(keys)
+        missing = self._missing(local_values)
+        shared_values = (
+            self.shared.get_many([keys[i] for i in missing]) if missing else []
+        )
+        values, promoted = self._merge(keys, local_values, missing, shared_values)
+        self.local.set_many(promoted)
+        return values
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        self.local.set_many(items)
+        self.shared.set_many(items)
+
+    async def aget_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        local_values = await self.local.aget_many(keys)
+        missing = self._missing(local_values)
+        shared_values = (
+            await self.shared.aget_many([keys[i] for i in missing]) if missing else []
+        )
+        values, promoted = self._merge(keys, local_values, missing, shared_values)
+        await self.local.aset_many(promoted)
+        return values
+
+    async def aset_many(self, items: Dict[str, str]) -> None:
+        await self.local.aset_many(items)
+        await self.shared.aset_many(items)
+
+
+def create_cache(
+    backend: str,
+    namespace: str,
+    max_entries: int = 1000,
+    ttl_seconds: Optional[int] = None,
+    redis_url: Optional[str] = None,
+    sqlite_path: Optional[str] = None,
+    local_entries: int = 0,
+) -> Optional[CacheBackend]:
+    """
+    Create a cache for the configured backend.
+
+    Args:
+        backend: One of "none", "memory", "redis" or "sqlite"
+        namespace: Key prefix separating caches that share a store
+        max_entries: Size limit for memory/sqlite backends
+        ttl_seconds: Entry lifetime, or None to keep entries until evicted
+        redis_url: Redis connection URL for the redis backend
+        sqlite_path: Database file for the sqlite backend
+        local_entries: When > 0, put an in-process LRU tier of this size in
+            front of a redis/sqlite backend
+
+    Returns:
+        Cache instance, or None when caching is disabled
+    """
+    backend = backend.lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return MemoryCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    if backend == "redis":
+        shared = RedisCache(redis_url, namespace=namespace, ttl_seconds=ttl_seconds)
+    elif backend == "sqlite":
+        shared = SQLiteCache(
+            sqlite_path,
+            namespace=namespace,
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+        )
+    else:
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+    if local_entries > 0:
+        return TieredCache(
+            MemoryCache(max_entries=local_entries, ttl_seconds=ttl_seconds), shared
+        )
+    return shared
@@ -0,0 +1,293 @@
+"""Video-level single-flight for generation jobs, coordinated through Redis."""
+
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.crud import BlogPostRepository, JobRepository
+from app.models.database import JobStatus
+from app.services.cache import make_cache_key
+from app.services.events import (
+    TERMINAL_STATUSES,
+    TokenStreamPublisher,
+    get_progress,
+    get_redis,
+    publish_progress,
+)
+
+# Outcomes of reuse_or_attach / claim_or_follow
+REUSED = "reused"
+ATTACHED = "attached"
+
+# Deletes the leader lock only if it is still held by the given job
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Extends the leader lock and the followers set while the given job holds the lock.
+# KEYS: leader lock, followers set. ARGV: job_id, ttl seconds.
+_REFRESH_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('expire', KEYS[1], ARGV[2])
+    redis.call('expire', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def lookup_key(channel_name: str, video_title: str) -> str:
+    """Key mapping a (channel, title) request to the video it resolved to."""
+    digest = make_cache_key(channel_name.strip().lower(), video_title.strip().lower())
+    return f"video:lookup:{digest}"
+
+
+def leader_key(video_id: str) -> str:
+    """Key holding the job currently generating a video."""
+    return f"video:{video_id}:leader"
+
+
+def followers_key(leader_job_id: str) -> str:
+    """Set of jobs waiting on a leader job's result."""
+    return f"job:{leader_job_id}:followers"
+
+
+async def remember_video(channel_name: str, video_title: str, video_id: str) -> None:
+    """Record which video a request resolved to, so repeats skip the search."""
+    await get_redis().set(
+        lookup_key(channel_name, video_title),
+        video_id,
+        ex=settings.video_lookup_ttl_seconds,
+    )
+
+
+async def lookup_video(channel_name: str, video_title: str) -> Optional[str]:
+    """Return the video a (channel, title) request resolved to before, if known."""
+    return await get_redis().get(lookup_key(channel_name, video_title))
+
+
+async def get_leader(video_id: str) -> Optional[str]:
+    """Return the job currently generating a video, if any."""
+    return await get_redis().get(leader_key(video_id))
+
+
+async def claim_video(video_id: str, job_id: str) -> str:
+    """
+    Try to become the job that generates a video.
+
+    The lock expires after video_lock_ttl_seconds so a crashed worker cannot
+    block the video forever.
+
+    Returns:
+        The leader job ID: job_id itself if the claim succeeded
+    """
+    client = get_redis()
+    key = leader_key(video_id)
+    while True:
+        if await client.set(key, job_id, nx=True, ex=settings.video_lock_ttl_seconds):
+            return job_id
+        leader = await client.get(key)
+        if leader:
+            return leader
+        # Lock expired between SET and GET: try again
+
+
+async def release_video(video_id: str, job_id: str) -> None:
+    """Release the leader lock if job_id still holds it."""
+    await get_redis().eval(_RELEASE_SCRIPT, 1, leader_key(video_id), job_id)
+
+
+async def refresh_video_claim(video_id: str, job_id: str) -> bool:
+    """
+    Keep a leader's lock and followers alive for another video_lock_ttl_seconds.
+
+    Called at each stage boundary, so a run outlasting one TTL (retries,
+    backoff, rate-limit waits) keeps the video and its followers.
+
+    Returns:
+        False if job_id no longer holds the video's lock
+    """
+    refreshed = await get_redis().eval(
+        _REFRESH_SCRIPT,
+        2,
+        leader_key(video_id),
+        followers_key(job_id),
+        job_id,
+        settings.video_lock_ttl_seconds,
+    )
+    return bool(refreshed)
+
+
+async def attach_follower(leader_job_id: str, job_id: str) -> Optional[dict]:
+    """
+    Register job_id to receive the leader's result.
+
+    Returns:
+        None while the leader is still running (it will settle the follower
+        when it finishes), otherwise the leader's final progress snapshot, in
+        which case the caller must settle the follower itself
+    """
+    client = get_redis()
+    key = followers_key(leader_job_id)
+    await client.sadd(key, job_id)
+    await client.expire(key, settings.video_lock_ttl_seconds)
+
+    # Checked after registering: a leader finishing in between has either
+    # seen this follower or published its terminal status
+    snapshot = await get_progress(leader_job_id)
+    if snapshot and snapshot["status"] in TERMINAL_STATUSES:
+        await client.srem(key, job_id)
+        return snapshot
+    return None
+
+
+async def pop_followers(leader_job_id: str) -> List[str]:
+    """Remove and return every job waiting on a leader."""
+    key = followers_key(leader_job_id)
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.smembers(key)
+        pipe.delete(key)
+        members, _ = await pipe.execute()
+    return sorted(members)
+
+
+async def settle_follower(
+    session: AsyncSession,
+    job_id: str,
+    leader_job_id: str,
+    status: str,
+    blog_post_id: Optional[int] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Finish a follower job with its leader's outcome."""
+    job_status = JobStatus(status)
+    await JobRepository.attach_result(
+        session, UUID(job_id), UUID(leader_job_id), status=job_status, error=error
+    )
+    if job_status == JobStatus.COMPLETED:
+        await publish_progress(
+            job_id,
+            status,
+            100,
+            "Completed (reused result)",
+            blog_post_id=blog_post_id,
+            source_job_id=leader_job_id,
+        )
+    else:
+        await publish_progress(
+            job_id, status, None, "Failed", error=error, source_job_id=leader_job_id
+        )
+    await TokenStreamPublisher(job_id).end(status, error=error)
+
+
+async def settle_followers(
+    session: AsyncSession,
+    leader_job_id: str,
+    status: str,
+    blog_post_id: Optional[int] = None,
+    error: Optional[str] = None,
+) -> int:
+    """
+    Finish every job attached to a leader.
+
+    Call after the leader's terminal progress is published, so a follower
+    attaching concurrently either is popped here or sees the final status.
+
+    Returns:
+        Number of followers settled
+    """
+    followers = await pop_followers(leader_job_id)
+    for follower in followers:
+        await settle_follower(
+            session, follower, leader_job_id, status, blog_post_id, error
+        )
+    return len(followers)
+
+
+async def reuse_or_attach(
+    session: AsyncSession, job_id: str, video_id: str
+) -> Optional[str]:
+    """
+    Satisfy a job from existing work on the same video, if possible.
+
+    A completed blog post younger than video_reuse_window_seconds is reused
+    outright; otherwise, if another job is generating the video, this job is
+    attached to it and settled when it finishes.
+
+    Returns:
+        REUSED, ATTACHED, or None when the job has to generate the post itself
+    """
+    if settings.video_reuse_window_seconds > 0:
+        blog_post = await BlogPostRepository.get_recent_by_video_id(
+            session, video_id, settings.video_reuse_window_seconds
+        )
+        if blog_post:
+            await settle_follower(
+                session,
+                job_id,
+                str(blog_post.job_id),
+                JobStatus.COMPLETED.value,
+                blog_post.id,
+            )
+            return REUSED
+
+    leader = await get_leader(video_id)
+    if not leader or leader == job_id:
+        return None
+
+    snapshot = await attach_follower(leader, job_id)
+    if snapshot is None:
+        await JobRepository.attach_result(session, UUID(job_id), UUID(leader))
+        await publish_progress(
+            job_id,
+            JobStatus.RUNNING.value,
+            None,
+            "Waiting for an in-flight generation of this video",
+            source_job_id=leader,
+        )
+        return ATTACHED
+    if snapshot["status"] == JobStatus.COMPLETED.value:
+        await settle_follower(
+            session,
+            job_id,
+            leader,
+            JobStatus.COMPLETED.value,
+            snapshot.get("blog_post_id"),
+        )
+        return REUSED
+    # The leader failed: generate independently
+    return None
+
+
+async def claim_or_follow(
+    session: AsyncSession, job_id: str, video_id: str, attempts: int = 3
+) -> Optional[str]:
+    """
+    Single-flight entry point for a worker that resolved a job's video.
+
+    Returns:
+        REUSED or ATTACHED if the job needs no further work, or None once
+        this job holds the video's leader lock (or dedupe gave up after
+        repeated races) and should generate the post
+    """
+    for _ in range(attempts):
+        outcome = await reuse_or_attach(session, job_id, video_id)
+        if outcome:
+            return outcome
+        if await claim_video(video_id, job_id) == job_id:
+            return None
+    return None
+
+
+def leader_snapshot_fields(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Progress fields a follower reports from its leader's snapshot."""
+    return {
+        key: snapshot[key]
+        for key in ("status", "progress", "message")
+        if key in snapshot
+    }
@@ -1,19 +1,74 @@
 """Embedding generation and similarity search service."""
-from typing import List, Dict, Any
+import asyncio
+import base64
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from sqlalchemy import cast, func, select, text as sql_text, tuple_
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
+from app.services.cache import CacheBackend, create_cache, make_cache_key
+from app.services.local_embeddings import HashingEmbeddings
+from app.services.rate_limit import RateLimiter, get_rate_limiter
+from app.services.tokens import count_tokens
+from app.services.retrieval import reciprocal_rank_fusion
 from app.db.crud import EmbeddingRepository
+from app.models.database import Embedding, BlogPost, Job
+
+
+def create_embeddings_model(
+    provider: str,
+    model: str = "text-embedding-3-small",
+    dimensions: int = 1536
+) -> Embeddings:
+    """
+    Create the embedding model for the configured provider.
+    
+    Args:
+        provider: "openai" or "local" (hashed n-grams, no network)
+        model: OpenAI embedding model name
+        dimensions: Vector size; must match the embeddings.embedding column
+        
+    Returns:
+        LangChain Embeddings instance
+    """
+    provider = provider.lower()
+    if provider == "openai":
+        return OpenAIEmbeddings(model=model, openai_api_key=settings.openai_api_key)
+    if provider == "local":
+        return HashingEmbeddings(dimensions=dimensions)
+    raise ValueError(f"Unknown embedding provider: {provider}")
 
 
 class EmbeddingService:
     """Service for generating and managing embeddings."""
     
-    def __init__(self):
-        self.embeddings_model = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=settings.openai_api_key
+    def __init__(
+        self,
+        cache: Optional[CacheBackend] = None,
+        embeddings_model: Optional[Embeddings] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.embeddings_model = embeddings_model or create_embeddings_model(
+            settings.embedding_provider,
+            model=settings.embedding_model,
+            dimensions=settings.embedding_dimensions
+        )
+        
+        # Content-hash keyed vector cache: in-process LRU in front of Redis
+        self.cache = cache if cache is not None else create_cache(
+            settings.embedding_cache_backend,
+            namespace="embedding",
+            max_entries=settings.embedding_cache_max_entries,
+            ttl_seconds=settings.embedding_cache_ttl_seconds,
+            redis_url=settings.redis_url,
+            sqlite_path=settings.llm_cache_sqlite_path,
+            local_entries=settings.embedding_cache_local_entries
         )
         
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -28,15 +83,106 @@ class EmbeddingService:
         chunks = self.text_splitter.split_text(text)
         return chunks
     
+    def _cache_keys(self, texts: List[str]) -> List[str]:
+        """Cache keys for texts: a hash of model name and content."""
+        return [make_cache_key(self.embeddings_model.model, text) for text in texts]
+    
+    @staticmethod
+    def _encode_vector(vector: List[float]) -> str:
+        """Pack a vector as base64 float32 for compact cache storage."""
+        return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+    
+    @staticmethod
+    def _decode_vector(value: str) -> List[float]:
+        """Unpack a vector stored by _encode_vector."""
+        return np.frombuffer(base64.b64decode(value), dtype=np.float32).tolist()
+    
+    def _plan_misses(self, texts: List[str], keys: List[str], cached: List[Optional[str]]):
+        """
+        Decode cache hits and collect the unique texts that still need embedding.
+        
+        Returns:
+            Tuple of (vectors with None for misses, {key: text} to embed)
+        """
+        vectors = [self._decode_vector(value) if value else None for value in cached]
+        to_embed = {}
+        for text, key, vector in zip(texts, keys, vectors):
+            if vector is None:
+                to_embed.setdefault(key, text)
+        return vectors, to_embed
+    
+    def _fill_misses(self, keys: List[str], vectors: List[Optional[List[float]]], embedded: Dict[str, List[float]]):
+        """Fill cache misses with freshly embedded vectors."""
+        return [vector if vector is not None else embedded[key] for key, vector in zip(keys, vectors)]
+    
+    def _rate_limit_cost(self, texts: List[str]) -> Optional[Tuple[str, int]]:
+        """Model and token count to charge the rate limiter, or None if unlimited."""
+        model = self.embeddings_model.model
+        if self.rate_limiter is None or model not in self.rate_limiter.limits:
+            return None
+        return model, sum(count_tokens(text, model) for text in texts)
+    
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        """Call the embedding model once the rate limiter admits the request."""
+        cost = self._rate_limit_cost(texts)
+        if cost:
+            await self.rate_limiter.acquire(*cost)
+        return await self.embeddings_model.aembed_documents(texts)
+    
+    def _embed_sync(self, texts: List[str]) -> List[List[float]]:
+        """Blocking version of _aembed."""
+        cost = self._rate_limit_cost(texts)
+        if cost:
+            self.rate_limiter.acquire_sync(*cost)
+        return self.embeddings_model.embed_documents(texts)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Embedding cache hit/miss counters."""
+        return self.cache.stats.as_dict() if self.cache is not None else {}
+    
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding vector for text."""
-        embedding = await self.embeddings_model.aembed_query(text)
-        return embedding
+        embeddings = await self.embed_documents([text])
+        return embeddings[0]
     
     async def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple documents."""
-        embeddings = await self.embeddings_model.aembed_documents(texts)
-        return embeddings
+        """
+        Generate embeddings for multiple documents.
+        
+        Cached vectors are reused; only the distinct cache misses are sent to
+        the model, in a single request.
+        """
+        if self.cache is None:
+            return await self._aembed(texts)
+        
+        keys = self._cache_keys(texts)
+        vectors, to_embed = self._plan_misses(texts, keys, await self.cache.aget_many(keys))
+        
+        embedded = {}
+        if to_embed:
+            new_vectors = await self._aembed(list(to_embed.values()))
+            embedded = dict(zip(to_embed.keys(), new_vectors))
+            await self.cache.aset_many(
+                {key: self._encode_vector(vector) for key, vector in embedded.items()}
+            )
+        return self._fill_misses(keys, vectors, embedded)
+    
+    def embed_documents_sync(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple documents without an event loop."""
+        if self.cache is None:
+            return self._embed_sync(texts)
+        
+        keys = self._cache_keys(texts)
+        vectors, to_embed = self._plan_misses(texts, keys, self.cache.get_many(keys))
+        
+        embedded = {}
+        if to_embed:
+            new_vectors = self._embed_sync(list(to_embed.values()))
+            embedded = dict(zip(to_embed.keys(), new_vectors))
+            self.cache.set_many(
+                {key: self._encode_vector(vector) for key, vector in embedded.items()}
+            )
+        return self._fill_misses(keys, vectors, embedded)
     
     async def generate_and_store_embeddings(
         self,
@@ -62,23 +208,107 @@ class EmbeddingService:
         embeddings = await self.embed_documents(chunks)
         
         # Store in database
-        for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            await EmbeddingRepository.create(
-                session,
-                blog_post_id=blog_post_id,
-                chunk_text=chunk,
-                embedding_vector=embedding,
-                chunk_index=idx
-            )
+        count = await EmbeddingRepository.bulk_create(session, blog_post_id, chunks, embeddings)
         
         await session.commit()
-        return len(chunks)
+        return count
+    
+    async def configure_search(
+        self,
+        session: AsyncSession,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        min_candidates: int = 0,
+        iterative: bool = False
+    ) -> None:
+        """
+        Tune the ANN index for the current transaction.
+        
+        Uses SET LOCAL, so the setting applies only to queries in the same
+        transaction and never leaks to other users of a pooled connection.
+        
+        An HNSW scan returns at most ef_search candidates, before any WHERE
+        clause. `min_candidates` raises ef_search to cover a page, and
+        `iterative` (pgvector >= 0.8, hnsw_iterative_scan) keeps the scan
+        going, in order, until filtered queries have enough rows.
+        """
+        index_type = settings.vector_index_type.lower()
+        if index_type == "hnsw":
+            value = max(int(ef_search or settings.hnsw_ef_search), int(min_candidates))
+            await session.execute(sql_text(f"SET LOCAL hnsw.ef_search = {value}"))
+            if iterative and settings.hnsw_iterative_scan:
+                await session.execute(sql_text("SET LOCAL hnsw.iterative_scan = strict_order"))
+        elif index_type == "ivfflat":
+            value = int(probes or settings.ivfflat_probes)
+            await session.execute(sql_text(f"SET LOCAL ivfflat.probes = {value}"))
+    
+    @staticmethod
+    def _result_columns():
+        """Columns returned for every search hit."""
+        return (
+            Embedding.id,
+            Embedding.chunk_text,
+            Embedding.chunk_index,
+            BlogPost.title,
+            BlogPost.id.label('blog_post_id')
+        )
+    
+    @staticmethod
+    def _format_hit(row, **scores) -> Dict[str, Any]:
+        """Convert a result row into the public search hit shape."""
+        return {
+            'chunk_text': row.chunk_text,
+            'chunk_index': row.chunk_index,
+            'blog_title': row.title,
+            'blog_post_id': row.blog_post_id,
+            **scores
+        }
+    
+    async def _vector_search(
+        self,
+        session: AsyncSession,
+        query_embedding: List[float],
+        limit: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> list:
+        """Nearest chunks by cosine distance, using the ANN index."""
+        await self.configure_search(session, ef_search=ef_search, probes=probes)
+        
+        # Use the pgvector <=> operator: only operator ORDER BYs can use the ANN index
+        stmt = (
+            select(
+                *self._result_columns(),
+                Embedding.embedding.cosine_distance(query_embedding).label('distance')
+            )
+            .join(BlogPost, Embedding.blog_post_id == BlogPost.id)
+            .order_by('distance')
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return result.all()
+    
+    async def _lexical_search(self, session: AsyncSession, query: str, limit: int) -> list:
+        """Best full-text matches for the query, using the GIN index on chunk_tsv."""
+        ts_query = func.websearch_to_tsquery(cast(settings.text_search_config, REGCONFIG), query)
+        rank = func.ts_rank_cd(Embedding.chunk_tsv, ts_query)
+        stmt = (
+            select(*self._result_columns(), rank.label('rank'))
+            .join(BlogPost, Embedding.blog_post_id == BlogPost.id)
+            .where(Embedding.chunk_tsv.op('@@')(ts_query))
+            .order_by(rank.desc())
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return result.all()
     
     async def similarity_search(
         self,
         session: AsyncSession,
         query: str,
-        limit: int = 5
+        limit: int = 5,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform similarity search across all embeddings.
@@ -87,6 +317,8 @@ class EmbeddingService:
             session: Database session
             query: Search query text
             limit: Maximum number of results
+            ef_search: HNSW candidate list size for this query (recall vs speed)
+            probes: IVFFlat lists to scan for this query (recall vs speed)
             
         Returns:
             List of similar chunks with metadata
@@ -95,33 +327,207 @@ class EmbeddingService:
         query_embedding = await self.embed_text(query)
         
         # Perform vector similarity search (pgvector)
-        from sqlalchemy import select, func
-        from app.models.database import Embedding, BlogPost
+        rows = await self._vector_search(session, query_embedding, limit, ef_search=ef_search, probes=probes)
         
-        # Use pgvector cosine distance operator
+        return [
+            self._format_hit(row, similarity_score=1 - row.distance)  # Convert distance to similarity
+            for row in rows
+        ]
+    
+    async def search(
+        self,
+        session: AsyncSession,
+        query: str,
+        limit: int = 10,
+        after: Optional[Tuple[float, int]] = None,
+        channel: Optional[str] = None,
+        video_id: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        min_similarity: Optional[float] = None,
+        collapse: bool = False,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, int]]]:
+        """
+        Filtered, paginated semantic search.
+        
+        Filters, the similarity threshold and keyset pagination all run in
+        SQL. Results are ordered by (distance, chunk id); pass the returned
+        position as `after` to fetch the next page.
+        
+        With an HNSW index these conditions filter the index scan's output,
+        which holds only ef_search candidates. Filtered and paged queries
+        therefore use pgvector's iterative scan (hnsw_iterative_scan); with
+        it disabled, or before pgvector 0.8, deep pages and selective
+        filters can come back short and end pagination early. IVFFlat has
+        the same limit per `probes`; use vector_index_type "none" for exact
+        results.
+        
+        Args:
+            session: Database session
+            query: Search query text
+            limit: Page size
+            after: (distance, chunk id) of the last result of the previous page
+            channel: Only posts generated from this channel (case-insensitive)
+            video_id: Only posts generated from this video
+            date_from: Only posts created at or after this time
+            date_to: Only posts created before this time
+            min_similarity: Drop chunks less similar than this (cosine)
+            collapse: Return only the best chunk of each blog post
+            ef_search: HNSW candidate list size for this query
+            probes: IVFFlat lists to scan for this query
+            
+        Returns:
+            Tuple of (hits, position of the last hit or None on the last page)
+        """
+        query_embedding = await self.embed_text(query)
+        filtered = (
+            after is not None
+            or min_similarity is not None
+            or any((channel, video_id, date_from, date_to))
+        )
+        await self.configure_search(
+            session,
+            ef_search=ef_search,
+            probes=probes,
+            min_candidates=limit + 1,
+            iterative=filtered or collapse
+        )
+        
+        distance = Embedding.embedding.cosine_distance(query_embedding)
         stmt = (
             select(
-                Embedding.chunk_text,
-                Embedding.chunk_index,
-                BlogPost.title,
-                BlogPost.id.label('blog_post_id'),
-                func.cosine_distance(Embedding.embedding, query_embedding).label('distance')
+                *self._result_columns(),
+                BlogPost.created_at,
+                Job.channel_name,
+                Job.video_id,
+                distance.label('distance')
             )
             .join(BlogPost, Embedding.blog_post_id == BlogPost.id)
-            .order_by('distance')
-            .limit(limit)
+            .join(Job, BlogPost.job_id == Job.id)
         )
+        if channel:
+            stmt = stmt.where(func.lower(Job.channel_name) == channel.lower())
+        if video_id:
+            stmt = stmt.where(Job.video_id == video_id)
+        if date_from:
+            stmt = stmt.where(BlogPost.created_at >= date_from)
+        if date_to:
+            stmt = stmt.where(BlogPost.created_at < date_to)
+        if min_similarity is not None:
+            stmt = stmt.where(distance <= 1 - min_similarity)
+        
+        if collapse:
+            # DISTINCT ON keeps the closest chunk per post; page over those
+            best = (
+                stmt.distinct(BlogPost.id)
+                .order_by(BlogPost.id, distance, Embedding.id)
+                .subquery()
+            )
+            stmt = select(best)
+            distance_col, id_col = best.c.distance, best.c.id
+        else:
+            distance_col, id_col = distance, Embedding.id
+        
+        if after is not None:
+            stmt = stmt.where(tuple_(distance_col, id_col) > tuple_(after[0], after[1]))
+        stmt = stmt.order_by(distance_col, id_col).limit(limit + 1)
         
         result = await session.execute(stmt)
         rows = result.all()
+        page = rows[:limit]
         
+        hits = [
+            self._format_hit(
+                row,
+                similarity_score=1 - row.distance,
+                channel_name=row.channel_name,
+                video_id=row.video_id,
+                created_at=row.created_at
+            )
+            for row in page
+        ]
+        next_after = (page[-1].distance, page[-1].id) if len(rows) > limit else None
+        return hits, next_after
+    
+    async def hybrid_search(
+        self,
+        session: AsyncSession,
+        query: str,
+        limit: int = 5,
+        mode: str = "hybrid",
+        candidates: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search chunks by full text and by vector, fusing the rankings.
+        
+        The query embedding is computed while the full-text query runs, so the
+        embedding round trip overlaps the database work. mode="lexical" skips
+        embedding entirely, which suits keyword-like queries.
+        
+        Args:
+            session: Database session
+            query: Search query text
+            limit: Maximum number of results
+            mode: "hybrid", "lexical" or "vector"
+            candidates: Results taken from each ranker before fusion
+            ef_search: HNSW candidate list size for the vector query
+            probes: IVFFlat lists to scan for the vector query
+            
+        Returns:
+            List of matching chunks with metadata, a fused `score` and the
+            rank each ranker gave the chunk (None if it did not return it)
+        """
+        if mode not in ("hybrid", "lexical", "vector"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        candidates = max(candidates or settings.hybrid_candidates, limit)
+        
+        embedding_task = None
+        if mode != "lexical":
+            embedding_task = asyncio.create_task(self.embed_text(query))
+        
+        try:
+            lexical_rows = []
+            if mode != "vector":
+                lexical_rows = await self._lexical_search(session, query, candidates)
+            
+            vector_rows = []
+            if embedding_task is not None:
+                vector_rows = await self._vector_search(
+                    session, await embedding_task, candidates, ef_search=ef_search, probes=probes
+                )
+        finally:
+            if embedding_task is not None and not embedding_task.done():
+                embedding_task.cancel()
+        
+        rows = {row.id: row for row in vector_rows}
+        rows.update((row.id, row) for row in lexical_rows)
+        lexical_ranks = {row.id: rank for rank, row in enumerate(lexical_rows, start=1)}
+        vector_ranks = {row.id: rank for rank, row in enumerate(vector_rows, start=1)}
+        
+        fused = reciprocal_rank_fusion(
+            [[row.id for row in lexical_rows], [row.id for row in vector_rows]], k=settings.rrf_k
+        )
         return [
-            {
-                'chunk_text': row.chunk_text,
-                'chunk_index': row.chunk_index,
-                'blog_title': row.title,
-                'blog_post_id': row.blog_post_id,
-                'similarity_score': 1 - row.distance  # Convert distance to similarity
-            }
-            for row in rows
+            self._format_hit(
+                rows[chunk_id],
+                score=score,
+                lexical_rank=lexical_ranks.get(chunk_id),
+                vector_rank=vector_ranks.get(chunk_id)
+            )
+            for chunk_id, score in fused[:limit]
         ]
+
+
+_embedding_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide EmbeddingService, creating it on first use."""
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
@@ -0,0 +1,256 @@
+"""Per-job event publishing and subscription over Redis pub/sub."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+
+import redis.asyncio as aioredis
+
+from app.config import settings
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Return the process-wide async Redis client."""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _redis
+
+
+def reset_redis() -> None:
+    """Forget the client, e.g. after fork, so the next use connects afresh."""
+    global _redis
+    _redis = None
+
+
+async def close_redis() -> None:
+    """Close the process-wide client's connections."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+def stream_channel(job_id: str) -> str:
+    """Pub/sub channel carrying generated tokens for a job."""
+    return f"job:{job_id}:stream"
+
+
+async def publish_event(channel: str, event: Dict[str, Any]) -> None:
+    """Publish a JSON event to a channel."""
+    await get_redis().publish(channel, json.dumps(event))
+
+
+class TokenStreamPublisher:
+    """Publishes LLM tokens for one job as they are generated."""
+
+    def __init__(self, job_id: str):
+        self.channel = stream_channel(job_id)
+
+    async def on_token(
+        self, stage: str, token: str, section: Optional[str] = None
+    ) -> None:
+        """Publish one streamed token."""
+        event = {"type": "token", "stage": stage, "token": token}
+        if section:
+            event["section"] = section
+        await publish_event(self.channel, event)
+
+    async def end(self, status: str, error: Optional[str] = None) -> None:
+        """Publish the end-of-stream marker."""
+        await publish_event(
+            self.channel, {"type": "end", "status": status, "error": error}
+        )
+
+
+def progress_channel(job_id: str) -> str:
+    """Pub/sub channel carrying progress snapshots for a job."""
+    return f"job:{job_id}:progress"
+
+
+def progress_key(job_id: str) -> str:
+    """Hash holding the latest progress snapshot for a job."""
+    return f"job:{job_id}:state"
+
+
+# Snapshot fields stored as integers
+_INT_FIELDS = ("progress", "version", "blog_post_id")
+
+# Statuses after which no further progress events are published
+TERMINAL_STATUSES = {"completed", "failed"}
+
+# Progress snapshots outlive the job by a day so late readers still find them
+PROGRESS_TTL_SECONDS = 24 * 60 * 60
+
+
+def _decode_snapshot(raw: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Convert a Redis hash into a typed progress snapshot."""
+    if not raw:
+        return None
+    snapshot: Dict[str, Any] = dict(raw)
+    for field in _INT_FIELDS:
+        if field in snapshot:
+            snapshot[field] = int(snapshot[field])
+    return snapshot
+
+
+async def publish_progress(
+    job_id: str, status: str, progress: Optional[int], message: str, **fields: Any
+) -> Dict[str, Any]:
+    """
+    Record a progress update and fan it out to subscribers.
+
+    None values (e.g. progress on failure) leave the previous value in place.
+
+    The snapshot is updated and its version bumped atomically, then the full
+    snapshot is published so subscribers never need a follow-up read.
+
+    Returns:
+        The new snapshot
+    """
+    values = {
+        "status": status,
+        "progress": progress,
+        "message": message,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **fields,
+    }
+    values = {name: value for name, value in values.items() if value is not None}
+    key = progress_key(job_id)
+
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=values)
+        pipe.hincrby(key, "version", 1)
+        pipe.expire(key, PROGRESS_TTL_SECONDS)
+        pipe.hgetall(key)
+        results = await pipe.execute()
+
+    snapshot = _decode_snapshot(results[-1])
+    await publish_event(progress_channel(job_id), {"type": "progress", **snapshot})
+    return snapshot
+
+
+async def get_progress(job_id: str) -> Optional[Dict[str, Any]]:
+    """Return the latest progress snapshot for a job, if any."""
+    return _decode_snapshot(await get_redis().hgetall(progress_key(job_id)))
+
+
+async def wait_for_progress(
+    job_id: str, after_version: int, timeout: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Long-poll for a snapshot newer than after_version.
+
+    Returns the newer snapshot as soon as one is published, or the current
+    snapshot once timeout seconds pass without a change.
+    """
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(progress_channel(job_id))
+    try:
+        # Wait for the subscribe confirmation before reading the snapshot so
+        # an update published in between is not missed
+        await pubsub.get_message(timeout=1.0)
+        snapshot = await get_progress(job_id)
+        if snapshot and snapshot["version"] > after_version:
+            return snapshot
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=remaining
+            )
+            if message is None:
+                continue
+            event = json.loads(message["data"])
+            if event.get("version", 0) > after_version:
+                event.pop("type", None)
+                return event
+        return snapshot
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+async def follow_progress(
+    job_id: str, timeout: float = 15.0
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yield the current progress snapshot, then every update until the job finishes.
+
+    Yields None whenever no update arrives within timeout seconds.
+    """
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(progress_channel(job_id))
+    try:
+        # Confirm the subscription before reading the snapshot so no update is lost
+        await pubsub.get_message(timeout=1.0)
+        snapshot = await get_progress(job_id)
+        if snapshot:
+            yield {"type": "progress", **snapshot}
+            if snapshot["status"] in TERMINAL_STATUSES:
+                return
+
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=timeout
+            )
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if event.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+async def follow_token_stream(
+    job_id: str, timeout: float = 15.0
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yield a job's token events until its end event.
+
+    A job that already finished yields its end event straight away, built
+    from the progress snapshot, instead of waiting on a silent channel.
+    Yields None whenever no event arrives within timeout seconds.
+    """
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(stream_channel(job_id))
+    try:
+        # Confirm the subscription before reading the snapshot: the terminal
+        # status is published before the end event, so one of them is seen
+        await pubsub.get_message(timeout=1.0)
+        snapshot = await get_progress(job_id)
+        if snapshot and snapshot["status"] in TERMINAL_STATUSES:
+            yield {
+                "type": "end",
+                "status": snapshot["status"],
+                "error": snapshot.get("error"),
+            }
+            return
+
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=timeout
+            )
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if event.get("type") == "end":
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Format an event as a server-sent event frame."""
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
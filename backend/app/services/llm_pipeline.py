@@ -1,10 +1,32 @@
 """LangChain + LangGraph pipeline for blog generation."""
-from typing import TypedDict, List, Dict, Any
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+import threading
+from typing import TypedDict, List, Dict, Any, Optional, Callable, Awaitable
+from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
 from app.config import settings
+from app.services.cache import CacheBackend, create_cache, make_cache_key
+from app.services.tokens import TokenBudget, count_tokens, split_by_tokens, truncate_to_tokens
+from app.services.embeddings import EmbeddingService, get_embedding_service
+from app.services.rate_limit import RateLimiter, get_rate_limiter
+from app.services.retrieval import InMemoryVectorIndex
+
+# Maximum number of outline sections written per blog post
+MAX_SECTIONS = 6
+
+# Async callback receiving (stage, token, section title) while streaming
+TokenCallback = Callable[[str, str, Optional[str]], Awaitable[None]]
+
+# Completion tokens reserved for each chain's response
+OUTPUT_TOKEN_BUDGETS = {
+    "key_points": 800,
+    "key_points_reduce": 800,
+    "outline": 800,
+    "section": 1000,
+    "polish": 3000,
+}
 
 
 class BlogGenerationState(TypedDict):
@@ -18,6 +40,7 @@ class BlogGenerationState(TypedDict):
     key_points: List[str]
     outline: str
     sections: List[Dict[str, str]]
+    failed_sections: List[str]
     final_blog: str
     error: str
 
@@ -25,16 +48,20 @@ class BlogGenerationState(TypedDict):
 class LLMPipeline:
     """LangChain + LangGraph pipeline for generating blog posts."""
     
-    def __init__(self):
-        self.llm = ChatOpenAI(
+    def __init__(
+        self,
+        llm: Optional[Any] = None,
+        cache: Optional[CacheBackend] = None,
+        embedding_service: Optional[EmbeddingService] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        self.llm = llm or ChatOpenAI(
             model="gpt-4",
             temperature=0.7,
             openai_api_key=settings.openai_api_key
         )
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=settings.openai_api_key
-        )
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
         
         # Prompts
         self.key_points_prompt = ChatPromptTemplate.from_messages([
@@ -56,6 +83,23 @@ Transcript:
 Extract the key points:""")
         ])
         
+        self.key_points_reduce_prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are an expert content analyzer. You are given key points extracted from consecutive parts of one YouTube video transcript.
+Merge them into a single list:
+- Combine points that say the same thing
+- Keep the most important insights from across the whole video
+- Preserve the order in which topics appear in the video
+
+Return a numbered list of 5-10 key points."""),
+            ("user", """Video Title: {title}
+Channel: {channel}
+
+Key points from each part of the transcript:
+{key_points}
+
+Merge the key points:""")
+        ])
+        
         self.outline_prompt = ChatPromptTemplate.from_messages([
             ("system", """You are an expert blog writer. Create a detailed blog post outline based on video content.
 The outline should include:
@@ -113,98 +157,440 @@ Blog Draft:
 Polish and finalize:""")
         ])
         
+        # Response cache shared by all chains
+        self.cache = cache if cache is not None else create_cache(
+            settings.llm_cache_backend,
+            namespace="llm",
+            max_entries=settings.llm_cache_max_entries,
+            ttl_seconds=settings.llm_cache_ttl_seconds,
+            redis_url=settings.redis_url,
+            sqlite_path=settings.llm_cache_sqlite_path
+        )
+        
         # Chains
-        self.key_points_chain = self.key_points_prompt | self.llm | StrOutputParser()
-        self.outline_chain = self.outline_prompt | self.llm | StrOutputParser()
-        self.section_chain = self.section_prompt | self.llm | StrOutputParser()
-        self.polish_chain = self.polish_prompt | self.llm | StrOutputParser()
+        # Per-chain token usage, reported for every model call
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+        self._usage_lock = threading.Lock()
+        
+        # Chains (shrinkable inputs are listed least important first)
+        self.key_points_chain = self._build_chain(
+            "key_points", self.key_points_prompt, ["description", "transcript"]
+        )
+        self.key_points_reduce_chain = self._build_chain(
+            "key_points_reduce", self.key_points_reduce_prompt, ["key_points"]
+        )
+        self.outline_chain = self._build_chain(
+            "outline", self.outline_prompt, ["key_points"]
+        )
+        self.section_chain = self._build_chain(
+            "section", self.section_prompt, ["context", "key_points"], stream=True
+        )
+        self.polish_chain = self._build_chain(
+            "polish", self.polish_prompt, ["draft"], stream=True
+        )
+        
+        # Compiled once and reused by every generate_blog call
+        self._stage_runnables = self.stage_nodes()
+        self.graph = self.build_graph()
     
-    def extract_key_points(self, state: BlogGenerationState) -> BlogGenerationState:
-        """Extract key points from transcript."""
-        try:
-            key_points_text = self.key_points_chain.invoke({
+    def _record_usage(self, name: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """Accumulate and report token counts for one model call."""
+        with self._usage_lock:
+            usage = self.token_usage.setdefault(
+                name, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            )
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+        print(f"[LLM] {name}: {prompt_tokens} prompt + {completion_tokens} completion tokens")
+    
+    def _build_chain(
+        self,
+        name: str,
+        prompt: ChatPromptTemplate,
+        shrinkable: List[str],
+        stream: bool = False
+    ) -> Runnable:
+        """
+        Build prompt | llm | parser with token budgeting and response caching.
+        
+        Inputs are packed to fit the model's context window minus the chain's
+        output budget, and identical prompts are served from the cache. Model
+        calls wait for the rate limiter, charged with the prompt tokens plus
+        the output budget (as the provider counts them). With
+        stream=True, async calls stream tokens to the "on_token" callback in
+        the run's configurable, if one was given to generate_blog.
+        """
+        model_name = getattr(self.llm, "model_name", type(self.llm).__name__)
+        temperature = getattr(self.llm, "temperature", None)
+        max_output_tokens = OUTPUT_TOKEN_BUDGETS[name]
+        budget = TokenBudget(
+            model_name, max_output_tokens, context_tokens=settings.llm_context_tokens or None
+        )
+        
+        chain = prompt | self.llm.bind(max_tokens=max_output_tokens) | StrOutputParser()
+        cache = self.cache
+        limiter = self.rate_limiter
+        templates = [
+            getattr(getattr(message, "prompt", None), "template", repr(message))
+            for message in prompt.messages
+        ]
+        
+        def cache_key(inputs: Dict[str, Any]) -> str:
+            return make_cache_key(
+                templates, prompt.format(**inputs), model_name, temperature, max_output_tokens
+            )
+        
+        def invoke(inputs: Dict[str, Any]) -> str:
+            inputs, prompt_tokens = budget.fit(prompt, inputs, shrinkable)
+            key = cache_key(inputs) if cache is not None else None
+            if cache is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached
+            if limiter is not None:
+                limiter.acquire_sync(model_name, prompt_tokens + max_output_tokens)
+            result = chain.invoke(inputs)
+            self._record_usage(name, prompt_tokens, count_tokens(result, model_name))
+            if cache is not None:
+                cache.set(key, result)
+            return result
+        
+        async def ainvoke(inputs: Dict[str, Any], config: RunnableConfig) -> str:
+            on_token = config.get("configurable", {}).get("on_token") if stream else None
+            section = inputs.get("section_title")
+            inputs, prompt_tokens = budget.fit(prompt, inputs, shrinkable)
+            key = cache_key(inputs) if cache is not None else None
+            if cache is not None:
+                cached = await cache.aget(key)
+                if cached is not None:
+                    if on_token:
+                        await on_token(name, cached, section)
+                    return cached
+            
+            if limiter is not None:
+                await limiter.acquire(model_name, prompt_tokens + max_output_tokens)
+            if on_token:
+                parts = []
+                async for token in chain.astream(inputs):
+                    parts.append(token)
+                    await on_token(name, token, section)
+                result = "".join(parts)
+            else:
+                result = await chain.ainvoke(inputs)
+            self._record_usage(name, prompt_tokens, count_tokens(result, model_name))
+            if cache is not None:
+                await cache.aset(key, result)
+            return result
+        
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"{name}_chain")
+    
+    def _key_points_inputs(self, state: BlogGenerationState) -> Dict[str, str]:
+        """Build key_points_chain inputs."""
+        return {
+            "title": state["video_title"],
+            "channel": state["channel_title"],
+            "description": state["video_description"],
+            "transcript": state["transcript"]  # Trimmed to the token budget by the chain
+        }
+    
+    def _parse_key_points(self, key_points_text: str) -> List[str]:
+        """Parse a numbered/bulleted LLM response into a list of key points."""
+        return [
+            line.strip() for line in key_points_text.split('\n')
+            if line.strip() and (line.strip()[0].isdigit() or line.strip().startswith('-'))
+        ]
+    
+    def _key_points_chunks(self, transcript: str) -> List[str]:
+        """Split the transcript, bounded by the key point token budget, into map chunks."""
+        transcript = truncate_to_tokens(transcript, settings.key_points_max_transcript_tokens)
+        return split_by_tokens(transcript, settings.key_points_chunk_tokens)
+    
+    def _key_points_map_inputs(self, state: BlogGenerationState, chunks: List[str]) -> List[Dict[str, str]]:
+        """Build key_points_chain inputs for each transcript chunk."""
+        return [
+            {
                 "title": state["video_title"],
                 "channel": state["channel_title"],
                 "description": state["video_description"],
-                "transcript": state["transcript"][:15000]  # Limit for token management
-            })
+                "transcript": chunk
+            }
+            for chunk in chunks
+        ]
+    
+    def _merge_key_points(self, partial_texts: List[str]) -> List[str]:
+        """Merge partial key point lists, dropping duplicates."""
+        merged = []
+        seen = set()
+        for text in partial_texts:
+            for point in self._parse_key_points(text):
+                content = point.lstrip('0123456789.-)* ').strip()
+                normalized = ' '.join(''.join(
+                    char.lower() if char.isalnum() else ' ' for char in content
+                ).split())
+                if normalized and normalized not in seen:
+                    seen.add(normalized)
+                    merged.append(content)
+        return merged
+    
+    def _key_points_reduce_inputs(self, state: BlogGenerationState, merged: List[str]) -> Dict[str, str]:
+        """Build key_points_reduce_chain inputs."""
+        return {
+            "title": state["video_title"],
+            "channel": state["channel_title"],
+            "key_points": "\n".join(f"- {point}" for point in merged)
+        }
+    
+    def _use_map_reduce(self, chunks: List[str]) -> bool:
+        """Whether key points should be extracted with map-reduce."""
+        return settings.key_points_mode == "map_reduce" and len(chunks) > 1
+    
+    def extract_key_points(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Extract key points from transcript."""
+        try:
+            chunks = self._key_points_chunks(state["transcript"])
+            if self._use_map_reduce(chunks):
+                # Map: key points per chunk, in parallel
+                partial_texts = self.key_points_chain.batch(
+                    self._key_points_map_inputs(state, chunks),
+                    config={"max_concurrency": settings.key_points_map_concurrency}
+                )
+                merged = self._merge_key_points(partial_texts)
+                
+                # Reduce: consolidate the deduplicated points
+                key_points_text = self.key_points_reduce_chain.invoke(
+                    self._key_points_reduce_inputs(state, merged)
+                )
+                state["key_points"] = self._parse_key_points(key_points_text)
+                return state
             
-            # Parse into list
-            key_points = [
-                line.strip() for line in key_points_text.split('\n') 
-                if line.strip() and (line.strip()[0].isdigit() or line.strip().startswith('-'))
-            ]
+            key_points_text = self.key_points_chain.invoke(self._key_points_inputs(state))
+            state["key_points"] = self._parse_key_points(key_points_text)
+            return state
+        except Exception as e:
+            state["error"] = f"Key points extraction failed: {str(e)}"
+            return state
+    
+    async def aextract_key_points(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Extract key points from transcript (async)."""
+        try:
+            chunks = self._key_points_chunks(state["transcript"])
+            if self._use_map_reduce(chunks):
+                # Map: key points per chunk, in parallel
+                partial_texts = await self.key_points_chain.abatch(
+                    self._key_points_map_inputs(state, chunks),
+                    config={"max_concurrency": settings.key_points_map_concurrency}
+                )
+                merged = self._merge_key_points(partial_texts)
+                
+                # Reduce: consolidate the deduplicated points
+                key_points_text = await self.key_points_reduce_chain.ainvoke(
+                    self._key_points_reduce_inputs(state, merged)
+                )
+                state["key_points"] = self._parse_key_points(key_points_text)
+                return state
             
-            state["key_points"] = key_points
+            key_points_text = await self.key_points_chain.ainvoke(self._key_points_inputs(state))
+            state["key_points"] = self._parse_key_points(key_points_text)
             return state
         except Exception as e:
             state["error"] = f"Key points extraction failed: {str(e)}"
             return state
     
+    def _outline_inputs(self, state: BlogGenerationState) -> Dict[str, str]:
+        """Build outline_chain inputs."""
+        return {
+            "title": state["video_title"],
+            "channel": state["channel_title"],
+            "key_points": "\n".join(state["key_points"])
+        }
+    
     def generate_outline(self, state: BlogGenerationState) -> BlogGenerationState:
         """Generate blog outline."""
         try:
-            outline = self.outline_chain.invoke({
-                "title": state["video_title"],
-                "channel": state["channel_title"],
-                "key_points": "\n".join(state["key_points"])
-            })
-            
-            state["outline"] = outline
+            state["outline"] = self.outline_chain.invoke(self._outline_inputs(state))
             return state
         except Exception as e:
             state["error"] = f"Outline generation failed: {str(e)}"
             return state
     
-    def write_sections(self, state: BlogGenerationState) -> BlogGenerationState:
-        """Write individual blog sections."""
+    async def agenerate_outline(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Generate blog outline (async)."""
         try:
-            sections = []
-            
-            # Parse outline to extract section titles
-            outline_lines = state["outline"].split('\n')
-            section_titles = [
-                line.strip('# ').strip()
-                for line in outline_lines
-                if line.startswith('##') or line.startswith('###')
-            ]
-            
-            # Write each section
-            for section_title in section_titles[:6]:  # Limit to 6 sections
-                section_content = self.section_chain.invoke({
-                    "section_title": section_title,
-                    "context": state["transcript"][:10000],
-                    "key_points": "\n".join(state["key_points"])
-                })
-                
+            state["outline"] = await self.outline_chain.ainvoke(self._outline_inputs(state))
+            return state
+        except Exception as e:
+            state["error"] = f"Outline generation failed: {str(e)}"
+            return state
+    
+    def _parse_section_titles(self, outline: str) -> List[str]:
+        """Parse section titles out of a Markdown outline."""
+        outline_lines = outline.split('\n')
+        section_titles = [
+            line.strip('# ').strip()
+            for line in outline_lines
+            if line.startswith('##') or line.startswith('###')
+        ]
+        return section_titles[:MAX_SECTIONS]
+    
+    def _section_inputs(
+        self,
+        state: BlogGenerationState,
+        section_title: str,
+        context: str
+    ) -> Dict[str, str]:
+        """Build section_chain inputs for one section."""
+        return {
+            "section_title": section_title,
+            "context": context,
+            "key_points": "\n".join(state["key_points"])
+        }
+    
+    def _select_contexts(self, chunks: List[str], vectors: List[List[float]]) -> List[str]:
+        """Pick the top-k transcript chunks for each section from one batch of embeddings."""
+        index = InMemoryVectorIndex(chunks, vectors[:len(chunks)])
+        matches = index.search(vectors[len(chunks):], settings.section_context_top_k)
+        
+        # Keep selected chunks in transcript order so the context reads naturally
+        return ["\n\n".join(chunks[i] for i in sorted(ids)) for ids in matches]
+    
+    def _section_contexts(self, state: BlogGenerationState, section_titles: List[str]) -> List[str]:
+        """Retrieve the transcript context relevant to each section."""
+        chunks = self.embedding_service.split_text(state["transcript"])
+        if len(chunks) <= settings.section_context_top_k:
+            return [state["transcript"]] * len(section_titles)
+        
+        try:
+            # Chunks and section titles are embedded in a single request
+            vectors = self.embedding_service.embed_documents_sync(chunks + section_titles)
+            return self._select_contexts(chunks, vectors)
+        except Exception as e:
+            print(f"Section retrieval failed, using full transcript: {e}")
+            return [state["transcript"]] * len(section_titles)
+    
+    async def _asection_contexts(self, state: BlogGenerationState, section_titles: List[str]) -> List[str]:
+        """Retrieve the transcript context relevant to each section (async)."""
+        chunks = self.embedding_service.split_text(state["transcript"])
+        if len(chunks) <= settings.section_context_top_k:
+            return [state["transcript"]] * len(section_titles)
+        
+        try:
+            # Chunks and section titles are embedded in a single request
+            vectors = await self.embedding_service.embed_documents(chunks + section_titles)
+            return self._select_contexts(chunks, vectors)
+        except Exception as e:
+            print(f"Section retrieval failed, using full transcript: {e}")
+            return [state["transcript"]] * len(section_titles)
+    
+    def _collect_sections(
+        self,
+        state: BlogGenerationState,
+        section_titles: List[str],
+        results: List[Any]
+    ) -> BlogGenerationState:
+        """Store written sections in outline order, recording any that failed."""
+        sections = []
+        failed_sections = []
+        for section_title, result in zip(section_titles, results):
+            if isinstance(result, Exception):
+                print(f"Section '{section_title}' failed: {result}")
+                failed_sections.append(section_title)
+            else:
                 sections.append({
                     "title": section_title,
-                    "content": section_content
+                    "content": result
                 })
+        
+        state["sections"] = sections
+        state["failed_sections"] = failed_sections
+        
+        # Only fail the job when no section could be written at all
+        if section_titles and not sections:
+            state["error"] = f"Section writing failed: all {len(section_titles)} sections failed"
+        return state
+    
+    def write_sections(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Write individual blog sections concurrently."""
+        try:
+            section_titles = self._parse_section_titles(state["outline"])
+            contexts = self._section_contexts(state, section_titles)
+            inputs = [
+                self._section_inputs(state, title, context)
+                for title, context in zip(section_titles, contexts)
+            ]
+            config = {"max_concurrency": settings.section_concurrency}
             
-            state["sections"] = sections
-            return state
+            results = self.section_chain.batch(inputs, config=config, return_exceptions=True)
+            
+            # Retry only the sections that failed
+            for _ in range(settings.section_max_retries):
+                pending = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+                if not pending:
+                    break
+                retried = self.section_chain.batch(
+                    [inputs[i] for i in pending], config=config, return_exceptions=True
+                )
+                for i, result in zip(pending, retried):
+                    results[i] = result
+            
+            return self._collect_sections(state, section_titles, results)
         except Exception as e:
             state["error"] = f"Section writing failed: {str(e)}"
             return state
     
-    def assemble_and_polish(self, state: BlogGenerationState) -> BlogGenerationState:
-        """Assemble sections and polish the final blog."""
+    async def awrite_sections(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Write individual blog sections concurrently (async)."""
         try:
-            # Assemble draft
-            draft_parts = []
-            for section in state["sections"]:
-                draft_parts.append(f"## {section['title']}\n\n{section['content']}\n")
+            section_titles = self._parse_section_titles(state["outline"])
+            contexts = await self._asection_contexts(state, section_titles)
+            inputs = [
+                self._section_inputs(state, title, context)
+                for title, context in zip(section_titles, contexts)
+            ]
+            config = {"max_concurrency": settings.section_concurrency}
             
-            draft = "\n".join(draft_parts)
+            results = await self.section_chain.abatch(inputs, config=config, return_exceptions=True)
             
-            # Polish
-            final_blog = self.polish_chain.invoke({
-                "title": state["video_title"],
-                "draft": draft
-            })
+            # Retry only the sections that failed
+            for _ in range(settings.section_max_retries):
+                pending = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+                if not pending:
+                    break
+                retried = await self.section_chain.abatch(
+                    [inputs[i] for i in pending], config=config, return_exceptions=True
+                )
+                for i, result in zip(pending, retried):
+                    results[i] = result
             
-            state["final_blog"] = final_blog
+            return self._collect_sections(state, section_titles, results)
+        except Exception as e:
+            state["error"] = f"Section writing failed: {str(e)}"
+            return state
+    
+    def _polish_inputs(self, state: BlogGenerationState) -> Dict[str, str]:
+        """Assemble the draft from written sections and build polish_chain inputs."""
+        draft_parts = []
+        for section in state["sections"]:
+            draft_parts.append(f"## {section['title']}\n\n{section['content']}\n")
+        
+        return {
+            "title": state["video_title"],
+            "draft": "\n".join(draft_parts)
+        }
+    
+    def assemble_and_polish(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Assemble sections and polish the final blog."""
+        try:
+            state["final_blog"] = self.polish_chain.invoke(self._polish_inputs(state))
+            return state
+        except Exception as e:
+            state["error"] = f"Assembly/polish failed: {str(e)}"
+            return state
+    
+    async def aassemble_and_polish(self, state: BlogGenerationState) -> BlogGenerationState:
+        """Assemble sections and polish the final blog (async)."""
+        try:
+            state["final_blog"] = await self.polish_chain.ainvoke(self._polish_inputs(state))
             return state
         except Exception as e:
             state["error"] = f"Assembly/polish failed: {str(e)}"
@@ -216,15 +602,25 @@ Polish and finalize:""")
             return "error"
         return "continue"
     
+    def stage_nodes(self) -> Dict[str, RunnableLambda]:
+        """Graph nodes keyed by stage name (sync for invoke, async for ainvoke)."""
+        return {
+            "key_points": RunnableLambda(self.extract_key_points, afunc=self.aextract_key_points),
+            "outline": RunnableLambda(self.generate_outline, afunc=self.agenerate_outline),
+            "sections": RunnableLambda(self.write_sections, afunc=self.awrite_sections),
+            "polish": RunnableLambda(self.assemble_and_polish, afunc=self.aassemble_and_polish),
+        }
+    
     def build_graph(self) -> StateGraph:
         """Build the LangGraph workflow."""
         workflow = StateGraph(BlogGenerationState)
         
         # Add nodes
-        workflow.add_node("extract_key_points", self.extract_key_points)
-        workflow.add_node("generate_outline", self.generate_outline)
-        workflow.add_node("write_sections", self.write_sections)
-        workflow.add_node("assemble_polish", self.assemble_and_polish)
+        nodes = self.stage_nodes()
+        workflow.add_node("extract_key_points", nodes["key_points"])
+        workflow.add_node("generate_outline", nodes["outline"])
+        workflow.add_node("write_sections", nodes["sections"])
+        workflow.add_node("assemble_polish", nodes["polish"])
         
         # Add edges
         workflow.set_entry_point("extract_key_points")
@@ -235,7 +631,28 @@ Polish and finalize:""")
         
         return workflow.compile()
     
-    async def generate_blog(
+    async def run_stage(
+        self,
+        stage: str,
+        state: BlogGenerationState,
+        on_token: Optional[TokenCallback] = None
+    ) -> BlogGenerationState:
+        """
+        Run a single graph node outside the graph.
+        
+        Lets callers checkpoint the state between nodes and resume from any
+        of them; state holds the outputs of the earlier stages.
+        
+        Raises:
+            Exception: If the node reported an error
+        """
+        config = {"configurable": {"on_token": on_token}} if on_token else None
+        state = await self._stage_runnables[stage].ainvoke(state, config=config)
+        if state.get("error"):
+            raise Exception(state["error"])
+        return state
+    
+    def initial_state(
         self,
         video_id: str,
         video_title: str,
@@ -243,16 +660,9 @@ Polish and finalize:""")
         channel_title: str,
         transcript: str,
         metadata: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """
-        Generate blog post from video data.
-        
-        Returns:
-            Dict with 'content' (blog markdown) and 'metadata'
-        """
-        graph = self.build_graph()
-        
-        initial_state: BlogGenerationState = {
+    ) -> BlogGenerationState:
+        """Build the initial graph state for a video."""
+        return {
             "video_id": video_id,
             "video_title": video_title,
             "video_description": video_description,
@@ -262,23 +672,91 @@ Polish and finalize:""")
             "key_points": [],
             "outline": "",
             "sections": [],
+            "failed_sections": [],
             "final_blog": "",
             "error": ""
         }
-        
-        # Run the graph
-        final_state = await graph.ainvoke(initial_state)
-        
+    
+    def build_result(self, final_state: BlogGenerationState) -> Dict[str, Any]:
+        """Convert the final graph state into the generate_blog result."""
         if final_state.get("error"):
             raise Exception(final_state["error"])
         
         return {
             "content": final_state["final_blog"],
             "metadata": {
-                "video_id": video_id,
-                "video_title": video_title,
-                "channel_title": channel_title,
+                "video_id": final_state["video_id"],
+                "video_title": final_state["video_title"],
+                "channel_title": final_state["channel_title"],
                 "key_points": final_state["key_points"],
-                "sections_count": len(final_state["sections"])
+                "sections_count": len(final_state["sections"]),
+                "failed_sections": final_state["failed_sections"]
             }
         }
+    
+    async def generate_blog(
+        self,
+        video_id: str,
+        video_title: str,
+        video_description: str,
+        channel_title: str,
+        transcript: str,
+        metadata: Dict[str, Any],
+        on_token: Optional[TokenCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate blog post from video data.
+        
+        All nodes run natively on the caller's event loop, so several
+        pipelines can share one loop and interleave their LLM calls.
+        
+        Args:
+            on_token: Optional async callback (stage, token, section) receiving
+                section and polish tokens as they are generated
+        
+        Returns:
+            Dict with 'content' (blog markdown) and 'metadata'
+        """
+        initial_state = self.initial_state(
+            video_id, video_title, video_description, channel_title, transcript, metadata
+        )
+        
+        # Run the graph
+        config = {"configurable": {"on_token": on_token}} if on_token else None
+        final_state = await self.graph.ainvoke(initial_state, config=config)
+        return self.build_result(final_state)
+    
+    def generate_blog_sync(
+        self,
+        video_id: str,
+        video_title: str,
+        video_description: str,
+        channel_title: str,
+        transcript: str,
+        metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Generate blog post from video data without an event loop.
+        
+        Sync fallback for callers that cannot await generate_blog.
+        
+        Returns:
+            Dict with 'content' (blog markdown) and 'metadata'
+        """
+        initial_state = self.initial_state(
+            video_id, video_title, video_description, channel_title, transcript, metadata
+        )
+        
+        final_state = self.graph.invoke(initial_state)
+        return self.build_result(final_state)
+
+
+_pipeline: Optional[LLMPipeline] = None
+
+
+def get_llm_pipeline() -> LLMPipeline:
+    """Return the process-wide LLMPipeline, creating it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LLMPipeline()
+    return _pipeline
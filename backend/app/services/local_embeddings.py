@@ -0,0 +1,73 @@
+"""Deterministic local embeddings for offline runs, tests and benchmarks."""
+
+import re
+import zlib
+from collections import Counter
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Hashed n-gram embeddings computed locally with NumPy.
+
+    Word unigrams, word bigrams and character trigrams are hashed (CRC32) into
+    a fixed number of signed buckets, weighted by sublinear term frequency and
+    L2-normalized, so cosine similarity tracks lexical overlap. Vectors are
+    identical across processes and machines, and no network is needed.
+    """
+
+    def __init__(self, dimensions: int = 1536, char_ngram: int = 3):
+        self.dimensions = dimensions
+        self.char_ngram = char_ngram
+        self.model = (
+            f"hashing-ngram{char_ngram}-{dimensions}"  # Identifies vectors in caches
+        )
+
+    def _features(self, text: str) -> Counter:
+        """Count the n-gram features of a text."""
+        words = _WORD_RE.findall(text.lower())
+        grams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+        n = self.char_ngram
+        for word in words:
+            padded = f"<{word}>"
+            grams.extend([padded[i : i + n] for i in range(len(padded) - n + 1)])
+        return Counter(words + grams)
+
+    def _embed(self, text: str) -> List[float]:
+        features = self._features(text)
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if not features:
+            return vector.tolist()
+
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) for feature in features),
+            dtype=np.uint64,
+            count=len(features),
+        )
+        counts = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+        # Low bits pick the bucket, the top bit picks the sign to cancel collisions
+        signs = np.where(hashes >> np.uint64(31), -1.0, 1.0).astype(np.float32)
+        np.add.at(
+            vector,
+            (hashes % np.uint64(self.dimensions)).astype(np.int64),
+            signs * (1 + np.log(counts)),
+        )
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents."""
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query."""
+        return self._embed(text)
@@ -0,0 +1,301 @@
+"""Per-model request and token rate limiting with token buckets."""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+# Buckets refill over a minute: capacities are per-minute limits
+WINDOW_MS = 60_000
+
+# Checks and takes from the RPM and TPM buckets of a model in one step.
+# KEYS: request bucket, token bucket. ARGV: rpm, requests, tpm, tokens.
+# Returns 0 once both are taken, otherwise the milliseconds to wait.
+_ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local wait = 0
+local levels = {}
+for i = 1, 2 do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local cost = math.min(tonumber(ARGV[2 * i]), capacity)
+    local level = capacity
+    if capacity > 0 then
+        local bucket = redis.call('HMGET', KEYS[i], 'level', 'ts')
+        if bucket[1] then
+            local refill = (now_ms - tonumber(bucket[2])) * capacity / 60000
+            level = math.min(capacity, tonumber(bucket[1]) + refill)
+        end
+        if level < cost then
+            wait = math.max(wait, math.ceil((cost - level) * 60000 / capacity))
+        end
+    end
+    levels[i] = {capacity, level - cost}
+end
+if wait > 0 then
+    return wait
+end
+for i = 1, 2 do
+    if levels[i][1] > 0 then
+        redis.call('HSET', KEYS[i], 'level', tostring(levels[i][2]), 'ts', now_ms)
+        redis.call('PEXPIRE', KEYS[i], 120000)
+    end
+end
+return 0
+"""
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse "model=RPM:TPM,..." into {model: (rpm, tpm)}.
+
+    A limit of 0 leaves that dimension unlimited.
+    """
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        model, _, values = entry.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (int(rpm or 0), int(tpm or 0))
+    return limits
+
+
+class RateLimiter:
+    """
+    Token buckets per model for requests per minute and tokens per minute.
+
+    acquire() waits until both buckets hold enough, so callers queue up
+    instead of getting 429s. Buckets live in-process, or in Redis (via an
+    atomic Lua script) when a Redis URL is given, so every worker draws from
+    the same budget. Models without a configured limit are not limited.
+
+    Time spent waiting is counted per model in-process and, with Redis,
+    across all workers.
+    """
+
+    def __init__(
+        self, limits: Dict[str, Tuple[int, int]], redis_url: Optional[str] = None
+    ):
+        self.limits = limits
+        self.metrics: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float, float]] = (
+            {}
+        )  # model -> (requests, tokens, ts)
+        self._redis = None
+        self._aredis = None
+        if redis_url:
+            import redis
+            import redis.asyncio as aioredis
+
+            self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+            self._aredis = aioredis.Redis.from_url(redis_url, decode_responses=True)
+
+    @staticmethod
+    def _keys(model: str) -> Tuple[str, str]:
+        return f"ratelimit:{model}:requests", f"ratelimit:{model}:tokens"
+
+    @staticmethod
+    def metrics_key(model: str) -> str:
+        """Redis hash with the wait counters of every worker for a model."""
+        return f"ratelimit:{model}:metrics"
+
+    def _take_local(self, model: str, tokens: int) -> float:
+        """In-process version of _ACQUIRE_SCRIPT; returns seconds to wait."""
+        rpm, tpm = self.limits[model]
+        now = time.monotonic()
+        with self._lock:
+            requests_level, tokens_level, ts = self._buckets.get(model, (rpm, tpm, now))
+            elapsed_ms = (now - ts) * 1000
+            wait_ms = 0.0
+            levels = []
+            for capacity, level, cost in (
+                (rpm, requests_level, 1),
+                (tpm, tokens_level, tokens),
+            ):
+                if capacity <= 0:
+                    levels.append(level)
+                    continue
+                cost = min(cost, capacity)
+                level = min(capacity, level + elapsed_ms * capacity / WINDOW_MS)
+                if level < cost:
+                    wait_ms = max(wait_ms, (cost - level) * WINDOW_MS / capacity)
+                levels.append(level - cost)
+            if wait_ms > 0:
+                return wait_ms / 1000
+            self._buckets[model] = (levels[0], levels[1], now)
+            return 0.0
+
+    def _script_args(self, model: str, tokens: int) -> list:
+        rpm, tpm = self.limits[model]
+        return [*self._keys(model), rpm, 1, tpm, tokens]
+
+    def _take_sync(self, model: str, tokens: int) -> float:
+        if self._redis is None:
+            return self._take_local(model, tokens)
+        try:
+            return (
+                self._redis.eval(_ACQUIRE_SCRIPT, 2, *self._script_args(model, tokens))
+                / 1000
+            )
+        except Exception as e:
+            print(f"Rate limiter unavailable, not limiting {model}: {e}")
+            return 0.0
+
+    async def _take(self, model: str, tokens: int) -> float:
+        if self._aredis is None:
+            return self._take_local(model, tokens)
+        try:
+            return (
+                await self._aredis.eval(
+                    _ACQUIRE_SCRIPT, 2, *self._script_args(model, tokens)
+                )
+                / 1000
+            )
+        except Exception as e:
+            print(f"Rate limiter unavailable, not limiting {model}: {e}")
+            return 0.0
+
+    @staticmethod
+    def _backoff(wait: float) -> float:
+        """Sleep a little past the refill time, jittered so waiters do not wake together."""
+        return wait + random.uniform(0, min(wait, 0.25))
+
+    def _record(self, model: str, waited: float) -> None:
+        """Count one acquisition and the time spent waiting for it."""
+        with self._lock:
+            metrics = self.metrics.setdefault(
+                model,
+                {
+                    "acquired": 0,
+                    "waited": 0,
+                    "wait_seconds": 0.0,
+                    "max_wait_seconds": 0.0,
+                },
+            )
+            metrics["acquired"] += 1
+            if waited > 0:
+                metrics["waited"] += 1
+                metrics["wait_seconds"] += waited
+                metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], waited)
+        if waited > 0:
+            print(f"[RateLimit] {model}: waited {waited:.2f}s")
+
+    def _shared_update(self, pipe, model: str, waited: float) -> None:
+        key = self.metrics_key(model)
+        pipe.hincrby(key, "acquired", 1)
+        if waited > 0:
+            pipe.hincrby(key, "waited", 1)
+            pipe.hincrbyfloat(key, "wait_seconds", waited)
+
+    async def acquire(self, model: str, tokens: int = 0) -> float:
+        """
+        Wait until a request of `tokens` tokens to `model` fits its limits.
+
+        Returns:
+            Seconds spent waiting
+        """
+        if model not in self.limits:
+            return 0.0
+        start = time.perf_counter()
+        waited = 0.0
+        while True:
+            wait = await self._take(model, tokens)
+            if wait <= 0:
+                break
+            await asyncio.sleep(self._backoff(wait))
+            waited = time.perf_counter() - start
+        self._record(model, waited)
+        if self._aredis is not None:
+            try:
+                async with self._aredis.pipeline(transaction=False) as pipe:
+                    self._shared_update(pipe, model, waited)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"Rate limiter metrics update failed: {e}")
+        return waited
+
+    def acquire_sync(self, model: str, tokens: int = 0) -> float:
+        """Blocking version of acquire() for callers without an event loop."""
+        if model not in self.limits:
+            return 0.0
+        start = time.perf_counter()
+        waited = 0.0
+        while True:
+            wait = self._take_sync(model, tokens)
+            if wait <= 0:
+                break
+            time.sleep(self._backoff(wait))
+            waited = time.perf_counter() - start
+        self._record(model, waited)
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline(transaction=False) as pipe:
+                    self._shared_update(pipe, model, waited)
+                    pipe.execute()
+            except Exception as e:
+                print(f"Rate limiter metrics update failed: {e}")
+        return waited
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Wait counters per model: this process's, or every worker's when shared."""
+        with self._lock:
+            stats = {model: dict(metrics) for model, metrics in self.metrics.items()}
+        if self._redis is None:
+            return stats
+        try:
+            shared = {}
+            for model in self.limits:
+                values = self._redis.hgetall(self.metrics_key(model))
+                if values:
+                    shared[model] = {
+                        "acquired": int(values.get("acquired", 0)),
+                        "waited": int(values.get("waited", 0)),
+                        "wait_seconds": float(values.get("wait_seconds", 0.0)),
+                    }
+            return shared
+        except Exception as e:
+            print(f"Rate limiter metrics read failed: {e}")
+            return stats
+
+
+def create_rate_limiter(
+    backend: str, limits: Dict[str, Tuple[int, int]]
+) -> Optional[RateLimiter]:
+    """
+    Create a rate limiter for the configured backend.
+
+    Args:
+        backend: "none", "memory" (per process) or "redis" (shared by all workers)
+        limits: {model: (rpm, tpm)}
+
+    Returns:
+        RateLimiter instance, or None when limiting is disabled
+    """
+    backend = backend.lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "memory":
+        return RateLimiter(limits)
+    if backend == "redis":
+        return RateLimiter(limits, redis_url=settings.redis_url)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_created = False
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the process-wide RateLimiter, creating it on first use."""
+    global _rate_limiter, _rate_limiter_created
+    if not _rate_limiter_created:
+        _rate_limiter = create_rate_limiter(
+            settings.rate_limit_backend, parse_rate_limits(settings.rate_limits)
+        )
+        _rate_limiter_created = True
+    return _rate_limiter
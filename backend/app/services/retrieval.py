@@ -0,0 +1,72 @@
+"""In-memory vector index and rank fusion helpers for retrieval."""
+
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class InMemoryVectorIndex:
+    """Exact cosine-similarity index over a small set of texts, held in NumPy."""
+
+    def __init__(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        if len(texts) != len(vectors):
+            raise ValueError("texts and vectors must have the same length")
+        self.texts = list(texts)
+        self._matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """L2-normalize rows so a dot product equals cosine similarity."""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def search(
+        self, query_vectors: Sequence[Sequence[float]], k: int
+    ) -> List[List[int]]:
+        """
+        Find the top-k most similar texts for each query.
+
+        Args:
+            query_vectors: One embedding per query
+            k: Number of results per query
+
+        Returns:
+            Indices into texts per query, most similar first
+        """
+        if not self.texts or len(query_vectors) == 0:
+            return [[] for _ in query_vectors]
+
+        queries = self._normalize(np.asarray(query_vectors, dtype=np.float32))
+        scores = queries @ self._matrix.T
+        k = min(k, len(self.texts))
+
+        # argpartition finds the top-k in O(n); only those k get sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1).tolist()
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]], k: int = 60
+) -> List[Tuple[Hashable, float]]:
+    """
+    Fuse several ranked result lists with reciprocal rank fusion.
+
+    Each item scores sum(1 / (k + rank)) over the lists it appears in (rank
+    starting at 1), so items ranked well by several rankers rise to the top
+    without having to calibrate their raw scores against each other.
+
+    Args:
+        rankings: Result ids per ranker, best first
+        k: Damping constant; larger values flatten the rank weights
+
+    Returns:
+        (id, score) pairs, best first
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,338 @@
+"""
+Fair scheduling of generation jobs across submitters, coordinated through Redis.
+
+Every key of a lane carries the hash tag {lane}, so the scripts touching
+them run on a single slot. The dispatch script still reads submitter
+queues it cannot declare up front, which Redis Cluster does not allow:
+use a standalone or replicated Redis.
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.events import get_redis
+from app.workers.celery_app import celery_app
+
+# Request lanes, each with its own Celery queue and in-flight budget
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = [INTERACTIVE, BULK]
+
+# Celery message priority per level (Redis transport: 0 is served first)
+PRIORITY_LEVELS = {
+    "high": 0,
+    "normal": 3,
+    "low": 6,
+}
+
+# Priority level of a job that does not ask for one
+DEFAULT_PRIORITY = {
+    INTERACTIVE: "normal",
+    BULK: "low",
+}
+
+# Queues a job for its submitter; a submitter with nothing queued before
+# joins the back of the round-robin ring.
+# KEYS: submitter queue, ring, payloads, pending counter. ARGV: job_id, submitter, payload.
+_ENQUEUE_SCRIPT = """
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('INCR', KEYS[4])
+local queued = redis.call('RPUSH', KEYS[1], ARGV[1])
+if queued == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+return queued
+"""
+
+# Takes jobs round-robin across submitters, up to `weight` per turn, until
+# the lane's in-flight budget is spent. In-flight entries older than the
+# stale cutoff are dropped first, so crashed jobs free their slot.
+# KEYS: ring, in-flight set, payloads, pending counter.
+# ARGV: capacity, now, stale cutoff, submitter queue prefix, default weight,
+#       then submitter/weight pairs. Submitter queues are built from the
+#       prefix, undeclared: not Redis Cluster safe (see the module docstring).
+# Returns a flat list of submitter, job_id, payload triples.
+_DISPATCH_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])
+local capacity = tonumber(ARGV[1]) - redis.call('ZCARD', KEYS[2])
+local weights = {}
+for i = 6, #ARGV, 2 do
+    weights[ARGV[i]] = tonumber(ARGV[i + 1])
+end
+local dispatched = {}
+while capacity > 0 do
+    local submitter = redis.call('LPOP', KEYS[1])
+    if not submitter then
+        break
+    end
+    local queue = ARGV[4] .. submitter
+    local turn = weights[submitter] or tonumber(ARGV[5])
+    while turn > 0 and capacity > 0 do
+        local job_id = redis.call('LPOP', queue)
+        if not job_id then
+            break
+        end
+        local payload = redis.call('HGET', KEYS[3], job_id)
+        redis.call('HDEL', KEYS[3], job_id)
+        redis.call('DECR', KEYS[4])
+        redis.call('ZADD', KEYS[2], ARGV[2], job_id)
+        table.insert(dispatched, submitter)
+        table.insert(dispatched, job_id)
+        table.insert(dispatched, payload or '')
+        turn = turn - 1
+        capacity = capacity - 1
+    end
+    if redis.call('LLEN', queue) > 0 then
+        redis.call('RPUSH', KEYS[1], submitter)
+    end
+end
+return dispatched
+"""
+
+
+# Puts a job the broker did not accept back at the head of its submitter's
+# queue; a submitter with nothing queued rejoins the front of the ring.
+# KEYS: submitter queue, ring, payloads, pending counter, in-flight set.
+# ARGV: job_id, submitter, payload.
+_REQUEUE_SCRIPT = """
+redis.call('ZREM', KEYS[5], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('INCR', KEYS[4])
+local queued = redis.call('LPUSH', KEYS[1], ARGV[1])
+if queued == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[2])
+end
+return queued
+"""
+
+
+class AdmissionError(Exception):
+    """A job was refused because its lane or its submitter has too much queued."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def submitter_queue_key(lane: str, submitter: str) -> str:
+    """List of a submitter's jobs waiting in a lane."""
+    return f"sched:{{{lane}}}:submitter:{submitter}"
+
+
+def ring_key(lane: str) -> str:
+    """Round-robin ring of submitters with jobs waiting in a lane."""
+    return f"sched:{{{lane}}}:ring"
+
+
+def in_flight_key(lane: str) -> str:
+    """Sorted set of a lane's dispatched, unfinished jobs, scored by dispatch time."""
+    return f"sched:{{{lane}}}:inflight"
+
+
+def pending_key(lane: str) -> str:
+    """Number of jobs waiting in a lane."""
+    return f"sched:{{{lane}}}:pending"
+
+
+def payloads_key(lane: str) -> str:
+    """Hash of the task kwargs and priority of each job waiting in a lane."""
+    return f"sched:{{{lane}}}:payloads"
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    """Parse "submitter=weight,..." into {submitter: weight}."""
+    weights = {}
+    for entry in spec.split(","):
+        if entry.strip():
+            submitter, _, weight = entry.partition("=")
+            weights[submitter.strip()] = int(weight)
+    return weights
+
+
+def lane_capacity(lane: str) -> int:
+    """Jobs a lane may have running at once across all workers."""
+    if lane == BULK:
+        return settings.scheduler_bulk_max_in_flight
+    return settings.scheduler_interactive_max_in_flight
+
+
+def lane_max_pending(lane: str) -> int:
+    """Queue depth past which a lane stops admitting jobs."""
+    if lane == BULK:
+        return settings.admission_bulk_max_pending
+    return settings.admission_interactive_max_pending
+
+
+async def queue_depths(submitter: Optional[str] = None) -> Dict[str, int]:
+    """Jobs waiting per lane, plus the submitter's own waiting jobs when given."""
+    client = get_redis()
+    async with client.pipeline(transaction=False) as pipe:
+        for lane in LANES:
+            pipe.get(pending_key(lane))
+        if submitter:
+            for lane in LANES:
+                pipe.llen(submitter_queue_key(lane, submitter))
+        values = await pipe.execute()
+    depths = {lane: int(value or 0) for lane, value in zip(LANES, values)}
+    if submitter:
+        depths["submitter"] = sum(values[len(LANES) :])
+    return depths
+
+
+async def admit(lane: str, submitter: str) -> str:
+    """
+    Admission control for a new job.
+
+    An interactive job arriving while the interactive lane is full is
+    deferred to the bulk lane; a full bulk lane or a submitter with too many
+    waiting jobs is refused.
+
+    Returns:
+        The lane the job should be queued in
+
+    Raises:
+        AdmissionError: If the job cannot be queued now
+    """
+    depths = await queue_depths(submitter)
+    if depths["submitter"] >= settings.admission_max_pending_per_submitter:
+        raise AdmissionError(
+            f"Too many queued jobs for this submitter ({depths['submitter']})", 429, 60
+        )
+    if lane == INTERACTIVE and depths[INTERACTIVE] >= lane_max_pending(INTERACTIVE):
+        lane = BULK
+    if depths[lane] >= lane_max_pending(lane):
+        raise AdmissionError(
+            f"The {lane} queue is full ({depths[lane]} waiting)", 503, 120
+        )
+    return lane
+
+
+async def enqueue(
+    lane: str, submitter: str, job_id: str, task_kwargs: dict, priority: int
+) -> None:
+    """Queue a generation job behind its submitter's earlier jobs in a lane."""
+    payload = json.dumps({"kwargs": task_kwargs, "priority": priority})
+    await get_redis().eval(
+        _ENQUEUE_SCRIPT,
+        4,
+        submitter_queue_key(lane, submitter),
+        ring_key(lane),
+        payloads_key(lane),
+        pending_key(lane),
+        job_id,
+        submitter,
+        payload,
+    )
+
+
+def send_job(lane: str, task_kwargs: dict, priority: int) -> None:
+    """Send the generate_blog_post task to a lane's queue."""
+    celery_app.send_task(
+        "generate_blog_post", kwargs=task_kwargs, queue=lane, priority=priority
+    )
+
+
+async def asend_job(lane: str, task_kwargs: dict, priority: int) -> None:
+    """send_job() off the event loop: publishing is a blocking broker round trip."""
+    await asyncio.to_thread(send_job, lane, task_kwargs, priority)
+
+
+async def dispatch(lane: str) -> List[str]:
+    """
+    Hand waiting jobs of a lane to Celery while it has in-flight budget.
+
+    Returns:
+        IDs of the dispatched jobs
+    """
+    now = time.time()
+    weight_args = []
+    for submitter, weight in parse_weights(
+        settings.scheduler_submitter_weights
+    ).items():
+        weight_args += [submitter, weight]
+    result = await get_redis().eval(
+        _DISPATCH_SCRIPT,
+        4,
+        ring_key(lane),
+        in_flight_key(lane),
+        payloads_key(lane),
+        pending_key(lane),
+        lane_capacity(lane),
+        now,
+        now - settings.scheduler_in_flight_ttl_seconds,
+        submitter_queue_key(lane, ""),
+        settings.scheduler_default_weight,
+        *weight_args,
+    )
+
+    dispatched = []
+    failed = []
+    for submitter, job_id, payload in zip(result[::3], result[1::3], result[2::3]):
+        if not payload:
+            continue
+        job = json.loads(payload)
+        try:
+            await asend_job(lane, job["kwargs"], job["priority"])
+            dispatched.append(job_id)
+        except Exception as e:
+            print(f"[Scheduler] Could not dispatch job {job_id}, requeueing: {e}")
+            failed.append((submitter, job_id, payload))
+
+    # Requeued last-first so each submitter keeps its order
+    for submitter, job_id, payload in reversed(failed):
+        await get_redis().eval(
+            _REQUEUE_SCRIPT,
+            5,
+            submitter_queue_key(lane, submitter),
+            ring_key(lane),
+            payloads_key(lane),
+            pending_key(lane),
+            in_flight_key(lane),
+            job_id,
+            submitter,
+            payload,
+        )
+    return dispatched
+
+
+async def dispatch_all() -> List[str]:
+    """Dispatch waiting jobs of every lane."""
+    dispatched = []
+    for lane in LANES:
+        dispatched += await dispatch(lane)
+    return dispatched
+
+
+async def run_dispatcher(interval_seconds: float) -> None:
+    """
+    Dispatch every lane periodically.
+
+    Catches jobs left waiting when no submission or job completion triggered
+    a dispatch, e.g. after in-flight jobs crashed and their slots expired.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            dispatched = await dispatch_all()
+            if dispatched:
+                print(f"[Scheduler] Periodic dispatch sent {len(dispatched)} job(s)")
+        except Exception as e:
+            print(f"[Scheduler] Periodic dispatch failed: {e}")
+
+
+async def finish(job_id: str) -> None:
+    """Free a finished job's in-flight slot and dispatch the next waiting jobs."""
+    if not settings.fair_scheduling_enabled:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                pipe.zrem(in_flight_key(lane), job_id)
+            await pipe.execute()
+        await dispatch_all()
+    except Exception as e:
+        print(f"[Scheduler] Could not release job {job_id}: {e}")
@@ -0,0 +1,130 @@
+"""Token counting, token-based text splitting and prompt budgeting."""
+
+import math
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough characters-per-token ratio used when no tokenizer is available
+APPROX_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Optional[Any]:
+    """Return the cached tiktoken encoding for a model, or None if unavailable."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken missing or its encoding files cannot be downloaded
+        print(f"Tokenizer unavailable for {model}, using approximate counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens in text for a model."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4") -> str:
+    """Truncate text to at most max_tokens tokens."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * APPROX_CHARS_PER_TOKEN]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def split_by_tokens(text: str, chunk_tokens: int, model: str = "gpt-4") -> List[str]:
+    """Split text into consecutive chunks of at most chunk_tokens tokens."""
+    if not text:
+        return []
+
+    encoding = get_encoding(model)
+    if encoding is None:
+        size = chunk_tokens * APPROX_CHARS_PER_TOKEN
+        return [text[i : i + size] for i in range(0, len(text), size)]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    return [
+        encoding.decode(tokens[i : i + chunk_tokens])
+        for i in range(0, len(tokens), chunk_tokens)
+    ]
+
+
+# Context window sizes (prompt + completion) for models we use
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+
+def context_window(model: str) -> int:
+    """Return the context window for a model, matching the longest known prefix."""
+    for name in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+class TokenBudget:
+    """Fits prompt inputs into a model's context window minus an output reserve."""
+
+    def __init__(
+        self, model: str, max_output_tokens: int, context_tokens: Optional[int] = None
+    ):
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.context_tokens = context_tokens or context_window(model)
+
+    @property
+    def max_input_tokens(self) -> int:
+        """Tokens available for the rendered prompt."""
+        return self.context_tokens - self.max_output_tokens
+
+    def fit(
+        self, prompt: Any, inputs: Dict[str, str], shrinkable: List[str]
+    ) -> Tuple[Dict[str, str], int]:
+        """
+        Truncate inputs so the rendered prompt fits the input budget.
+
+        Args:
+            prompt: Prompt template exposing format(**inputs)
+            inputs: Prompt variables
+            shrinkable: Variables that may be truncated, least important first
+
+        Returns:
+            Tuple of (fitted inputs, prompt token count)
+        """
+        fitted = dict(inputs)
+        prompt_tokens = count_tokens(prompt.format(**fitted), self.model)
+
+        for name in shrinkable:
+            overflow = prompt_tokens - self.max_input_tokens
+            if overflow <= 0:
+                break
+            value = fitted.get(name) or ""
+            keep = max(count_tokens(value, self.model) - overflow, 0)
+            fitted[name] = truncate_to_tokens(value, keep, self.model)
+            prompt_tokens = count_tokens(prompt.format(**fitted), self.model)
+
+        if prompt_tokens > self.max_input_tokens:
+            raise ValueError(
+                f"Prompt needs {prompt_tokens} tokens but only {self.max_input_tokens} "
+                f"are available for {self.model}"
+            )
+        return fitted, prompt_tokens
@@ -0,0 +1,66 @@
+"""Persistent transcript store keyed by video and language."""
+
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from app.db.crud import TranscriptRepository
+from app.db.session import async_session_maker
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to zlib
+    zstandard = None
+
+
+def compress_text(text: str) -> Tuple[bytes, str]:
+    """
+    Compress text with zstd when available, else zlib.
+
+    Returns:
+        Tuple of (compressed bytes, compression name)
+    """
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), "zstd"
+    return zlib.compress(data, 9), "zlib"
+
+
+def decompress_text(data: bytes, compression: str) -> str:
+    """Reverse compress_text."""
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError(
+                "zstandard is required to read zstd-compressed transcripts"
+            )
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if compression == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def join_segments(segments: List[Dict]) -> str:
+    """Join timed transcript segments into plain text."""
+    return " ".join(segment["text"] for segment in segments)
+
+
+class TranscriptStore:
+    """Reads and writes transcripts in Postgres, each call in its own short session."""
+
+    def __init__(self, session_maker=async_session_maker):
+        self.session_maker = session_maker
+
+    async def get(self, video_id: str, language: str) -> Optional[str]:
+        """Return the stored transcript text, or None if not stored."""
+        async with self.session_maker() as session:
+            transcript = await TranscriptRepository.get(session, video_id, language)
+        if transcript is None:
+            return None
+        return decompress_text(transcript.text_compressed, transcript.compression)
+
+    async def save(self, video_id: str, language: str, segments: List[Dict]) -> None:
+        """Store raw segments and the compressed joined text."""
+        text_compressed, compression = compress_text(join_segments(segments))
+        async with self.session_maker() as session:
+            await TranscriptRepository.upsert(
+                session, video_id, language, segments, text_compressed, compression
+            )
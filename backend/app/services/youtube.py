@@ -1,35 +1,349 @@
 """YouTube data retrieval service."""
+import asyncio
+import importlib.util
+import json
 import re
-from typing import Optional, Dict, List
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import httpx
 from youtube_transcript_api import YouTubeTranscriptApi
 from googleapiclient.discovery import build
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.config import settings
+from app.services.cache import CacheBackend, create_cache, make_cache_key
+from app.services.transcripts import TranscriptStore, join_segments
 
+# Data API quota cost per call, in units (default daily quota: 10,000)
+QUOTA_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+}
 
-class YouTubeService:
+# Daily quota resets at midnight Pacific time
+try:
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except ZoneInfoNotFoundError:  # No tz database in the image
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+class QuotaTracker:
+    """
+    Counts Data API calls and quota units spent.
+    
+    Counters are kept per process; with a Redis URL the daily unit total is
+    also accumulated in Redis so it covers every worker.
+    """
+    
+    def __init__(self, redis_url: Optional[str] = None):
+        self.calls = Counter()
+        self.units = 0
+        self._lock = threading.Lock()
+        self._redis = None
+        self._aredis = None
+        if redis_url:
+            import redis
+            import redis.asyncio as aioredis
+            self._redis = redis.Redis.from_url(redis_url, decode_responses=True)
+            self._aredis = aioredis.Redis.from_url(redis_url, decode_responses=True)
+    
+    @staticmethod
+    def daily_key() -> str:
+        """Redis key for today's quota units, in the quota's timezone."""
+        return f"youtube:quota:{datetime.now(QUOTA_TIMEZONE):%Y-%m-%d}"
+    
+    def _count(self, method: str) -> int:
+        """Count a call in this process; returns its cost in units."""
+        cost = QUOTA_COSTS.get(method, 1)
+        with self._lock:
+            self.calls[method] += 1
+            self.units += cost
+        return cost
+    
+    @classmethod
+    def _shared_update(cls, pipe, cost: int) -> None:
+        key = cls.daily_key()
+        pipe.incrby(key, cost)
+        pipe.expire(key, 2 * 24 * 60 * 60)
+    
+    def record(self, method: str) -> None:
+        """Count one call to a Data API method."""
+        cost = self._count(method)
+        if self._redis is not None:
+            try:
+                with self._redis.pipeline(transaction=False) as pipe:
+                    self._shared_update(pipe, cost)
+                    pipe.execute()
+            except Exception as e:
+                print(f"YouTube quota counter update failed: {e}")
+    
+    async def arecord(self, method: str) -> None:
+        """Async version of record() for callers on an event loop."""
+        cost = self._count(method)
+        if self._aredis is not None:
+            try:
+                async with self._aredis.pipeline(transaction=False) as pipe:
+                    self._shared_update(pipe, cost)
+                    await pipe.execute()
+            except Exception as e:
+                print(f"YouTube quota counter update failed: {e}")
+    
+    def usage(self) -> Dict:
+        """Calls and units spent by this process, plus today's total when shared."""
+        usage = {'calls': dict(self.calls), 'units': self.units}
+        if self._redis is not None:
+            try:
+                usage['units_today'] = int(self._redis.get(self.daily_key()) or 0)
+            except Exception as e:
+                print(f"YouTube quota counter read failed: {e}")
+        return usage
+
+
+def create_youtube_caches(
+    channel_cache: Optional[CacheBackend] = None,
+    search_cache: Optional[CacheBackend] = None
+) -> Tuple[Optional[CacheBackend], Optional[CacheBackend]]:
+    """Build the channel and search caches, unless given."""
+    # Channel IDs never change; search results go stale as channels upload
+    backend = settings.youtube_cache_backend
+    if channel_cache is None:
+        channel_cache = create_cache(
+            backend,
+            namespace="youtube:channel",
+            max_entries=settings.youtube_cache_max_entries,
+            ttl_seconds=settings.youtube_channel_cache_ttl_seconds,
+            redis_url=settings.redis_url,
+            sqlite_path=settings.llm_cache_sqlite_path,
+            local_entries=settings.youtube_cache_local_entries
+        )
+    if search_cache is None:
+        search_cache = create_cache(
+            backend,
+            namespace="youtube:search",
+            max_entries=settings.youtube_cache_max_entries,
+            ttl_seconds=settings.youtube_search_cache_ttl_seconds,
+            redis_url=settings.redis_url,
+            sqlite_path=settings.llm_cache_sqlite_path,
+            local_entries=settings.youtube_cache_local_entries
+        )
+    return channel_cache, search_cache
+
+
+def create_quota_tracker() -> QuotaTracker:
+    """Quota tracker sharing its daily total through Redis when the caches do."""
+    shared = settings.youtube_cache_backend.lower() == "redis"
+    return QuotaTracker(settings.redis_url if shared else None)
+
+
+def extract_video_id(url_or_id: str) -> Optional[str]:
+    """Extract video ID from URL or return if already an ID."""
+    patterns = [
+        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+        r'(?:embed\/)([0-9A-Za-z_-]{11})',
+        r'^([0-9A-Za-z_-]{11})$'
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, url_or_id)
+        if match:
+            return match.group(1)
+    return None
+
+
+def channel_handle(channel_name: str) -> str:
+    """Clean a channel name or @handle for searching."""
+    return channel_name.replace('@', '').strip()
+
+
+def channel_cache_key(channel_name: str) -> str:
+    """Cache key for a channel name's resolved channel ID."""
+    return make_cache_key(channel_handle(channel_name).lower())
+
+
+def search_cache_key(channel_id: str, query: str) -> str:
+    """Cache key for a channel video search."""
+    return make_cache_key(channel_id, query.strip().lower())
+
+
+def format_search_item(item: Dict) -> Dict:
+    """Convert a search.list video item into our video dict."""
+    snippet = item['snippet']
+    return {
+        'video_id': item['id']['videoId'],
+        'title': snippet['title'],
+        'description': snippet['description'],
+        'thumbnail': snippet['thumbnails']['high']['url'],
+        'channel_title': snippet['channelTitle'],
+        'published_at': snippet['publishedAt']
+    }
+
+
+def format_video_item(item: Dict) -> Dict:
+    """Convert a videos.list item into our metadata dict."""
+    return {
+        'title': item['snippet']['title'],
+        'description': item['snippet']['description'],
+        'channel_title': item['snippet']['channelTitle'],
+        'published_at': item['snippet']['publishedAt'],
+        'thumbnail': item['snippet']['thumbnails']['high']['url'],
+        'tags': item['snippet'].get('tags', []),
+        'view_count': item['statistics'].get('viewCount', '0'),
+        'like_count': item['statistics'].get('likeCount', '0'),
+        'duration': item['contentDetails']['duration']
+    }
+
+
+def pick_best_match(videos: List[Dict], video_title: str) -> Dict:
+    """Pick the video whose title contains the requested one, else the top result."""
+    # Find best match
+    for video in videos:
+        if video_title.lower() in video['title'].lower():
+            return video
+    
+    # Return first result if no exact match
+    return videos[0]
+
+
+def fetch_transcript_segments(video_id: str, language: str = 'en') -> Optional[List[Dict]]:
+    """
+    Download a video's timed transcript segments (blocking).
+    
+    Falls back to auto-generated captions when no manual transcript exists.
+    
+    Returns:
+        [{"text", "start", "duration"}, ...] or None
+    """
+    try:
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
+    except Exception as e:
+        print(f"Transcript fetch error for {video_id}: {e}")
+        # Try to get auto-generated captions
+        try:
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+            transcript = transcript_list.find_generated_transcript([language])
+            transcript_list = transcript.fetch()
+        except Exception as e2:
+            print(f"Auto-generated transcript error: {e2}")
+            return None
+    
+    return [
+        {'text': entry['text'], 'start': entry['start'], 'duration': entry['duration']}
+        for entry in transcript_list
+    ]
+
+
+def fetch_transcript(video_id: str, language: str = 'en') -> Optional[str]:
+    """Download a video's transcript text (blocking)."""
+    segments = fetch_transcript_segments(video_id, language)
+    return join_segments(segments) if segments is not None else None
+
+
+class _YouTubeServiceBase:
+    """Caches, quota tracking and helpers shared by the sync and async services."""
+    
+    def __init__(
+        self,
+        channel_cache: Optional[CacheBackend] = None,
+        search_cache: Optional[CacheBackend] = None,
+        quota: Optional[QuotaTracker] = None
+    ):
+        self.channel_cache, self.search_cache = create_youtube_caches(channel_cache, search_cache)
+        self.quota = quota or create_quota_tracker()
+    
+    def extract_video_id(self, url_or_id: str) -> Optional[str]:
+        """Extract video ID from URL or return if already an ID."""
+        return extract_video_id(url_or_id)
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters for the channel and search caches, plus quota usage."""
+        return {
+            'channel_cache': self.channel_cache.stats.as_dict() if self.channel_cache else {},
+            'search_cache': self.search_cache.stats.as_dict() if self.search_cache else {},
+            'quota': self.quota.usage()
+        }
+
+
+class YouTubeService(_YouTubeServiceBase):
     """Service for fetching YouTube video data and transcripts."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        channel_cache: Optional[CacheBackend] = None,
+        search_cache: Optional[CacheBackend] = None,
+        quota: Optional[QuotaTracker] = None
+    ):
+        super().__init__(channel_cache, search_cache, quota)
         self.api_key = settings.youtube_api_key
         if self.api_key:
             self.youtube = build('youtube', 'v3', developerKey=self.api_key)
         else:
             self.youtube = None
     
-    def extract_video_id(self, url_or_id: str) -> Optional[str]:
-        """Extract video ID from URL or return if already an ID."""
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'(?:embed\/)([0-9A-Za-z_-]{11})',
-            r'^([0-9A-Za-z_-]{11})$'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url_or_id)
-            if match:
-                return match.group(1)
-        return None
+    def _execute(self, request, method: str):
+        """Execute a Data API request, charging its quota cost."""
+        self.quota.record(method)
+        return request.execute()
+    
+    def resolve_channel_id(self, channel_name: str) -> Optional[str]:
+        """
+        Resolve a channel name or handle to its channel ID.
+        
+        Handles map to fixed channel IDs, so resolutions are cached for
+        youtube_channel_cache_ttl_seconds.
+        """
+        key = channel_cache_key(channel_name)
+        
+        if self.channel_cache is not None:
+            channel_id = self.channel_cache.get(key)
+            if channel_id:
+                return channel_id
+        
+        # Search for the channel
+        channel_request = self.youtube.search().list(
+            part='snippet',
+            q=channel_handle(channel_name),
+            type='channel',
+            maxResults=1
+        )
+        channel_response = self._execute(channel_request, 'search.list')
+        
+        if not channel_response.get('items'):
+            return None
+        
+        channel_id = channel_response['items'][0]['id']['channelId']
+        if self.channel_cache is not None:
+            self.channel_cache.set(key, channel_id)
+        return channel_id
+    
+    def search_channel_videos(self, channel_id: str, query: str) -> List[Dict]:
+        """
+        Search a channel's videos, caching results per (channel_id, query).
+        
+        Returns:
+            Up to 5 video dicts, best match first as ranked by YouTube
+        """
+        key = search_cache_key(channel_id, query)
+        
+        if self.search_cache is not None:
+            cached = self.search_cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        
+        video_request = self.youtube.search().list(
+            part='snippet',
+            channelId=channel_id,
+            q=query,
+            type='video',
+            maxResults=5
+        )
+        video_response = self._execute(video_request, 'search.list')
+        videos = [format_search_item(item) for item in video_response.get('items', [])]
+        
+        if self.search_cache is not None:
+            self.search_cache.set(key, json.dumps(videos))
+        return videos
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
     def search_video(self, channel_name: str, video_title: str) -> Optional[Dict]:
@@ -48,59 +362,18 @@ class YouTubeService:
             return None
         
         try:
-            # Clean channel name
-            channel_handle = channel_name.replace('@', '')
-            
-            # Search for the channel first
-            channel_request = self.youtube.search().list(
-                part='snippet',
-                q=channel_handle,
-                type='channel',
-                maxResults=1
-            )
-            channel_response = channel_request.execute()
+            channel_id = self.resolve_channel_id(channel_name)
             
-            if not channel_response.get('items'):
+            if not channel_id:
                 return None
             
-            channel_id = channel_response['items'][0]['id']['channelId']
-            
             # Search for video in the channel
-            video_request = self.youtube.search().list(
-                part='snippet',
-                channelId=channel_id,
-                q=video_title,
-                type='video',
-                maxResults=5
-            )
-            video_response = video_request.execute()
+            videos = self.search_channel_videos(channel_id, video_title)
             
-            if not video_response.get('items'):
+            if not videos:
                 return None
             
-            # Find best match
-            for item in video_response['items']:
-                snippet = item['snippet']
-                if video_title.lower() in snippet['title'].lower():
-                    return {
-                        'video_id': item['id']['videoId'],
-                        'title': snippet['title'],
-                        'description': snippet['description'],
-                        'thumbnail': snippet['thumbnails']['high']['url'],
-                        'channel_title': snippet['channelTitle'],
-                        'published_at': snippet['publishedAt']
-                    }
-            
-            # Return first result if no exact match
-            first_item = video_response['items'][0]
-            return {
-                'video_id': first_item['id']['videoId'],
-                'title': first_item['snippet']['title'],
-                'description': first_item['snippet']['description'],
-                'thumbnail': first_item['snippet']['thumbnails']['high']['url'],
-                'channel_title': first_item['snippet']['channelTitle'],
-                'published_at': first_item['snippet']['publishedAt']
-            }
+            return pick_best_match(videos, video_title)
             
         except Exception as e:
             print(f"YouTube API search error: {e}")
@@ -117,50 +390,261 @@ class YouTubeService:
         Returns:
             Full transcript text or None
         """
+        return fetch_transcript(video_id)
+    
+    def get_video_metadata(self, video_id: str) -> Optional[Dict]:
+        """Get video metadata using API."""
+        if not self.youtube:
+            return None
+        
         try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            transcript_text = ' '.join([entry['text'] for entry in transcript_list])
-            return transcript_text
+            request = self.youtube.videos().list(
+                part='snippet,statistics,contentDetails',
+                id=video_id
+            )
+            response = self._execute(request, 'videos.list')
+            
+            if not response.get('items'):
+                return None
+            
+            return format_video_item(response['items'][0])
         except Exception as e:
-            print(f"Transcript fetch error for {video_id}: {e}")
-            # Try to get auto-generated captions
+            print(f"Metadata fetch error: {e}")
+            return None
+
+
+# Closes of clients left behind by a previous event loop
+_stale_client_closes: Set[asyncio.Task] = set()
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class AsyncYouTubeService(_YouTubeServiceBase):
+    """
+    Non-blocking counterpart of YouTubeService.
+    
+    Data API calls go over one pooled httpx.AsyncClient (keep-alive, HTTP/2
+    when h2 is installed) instead of the discovery client, and the blocking
+    transcript download runs in a worker thread. Methods mirror
+    YouTubeService but are coroutines.
+    """
+    
+    def __init__(
+        self,
+        channel_cache: Optional[CacheBackend] = None,
+        search_cache: Optional[CacheBackend] = None,
+        quota: Optional[QuotaTracker] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        transcript_store: Optional[TranscriptStore] = None
+    ):
+        super().__init__(channel_cache, search_cache, quota)
+        if transcript_store is None and settings.transcript_store_enabled:
+            transcript_store = TranscriptStore()
+        self.transcript_store = transcript_store
+        self.api_key = settings.youtube_api_key if api_key is None else api_key
+        self.base_url = base_url or settings.youtube_api_base_url
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        # Pooled connections belong to the loop that opened them
+        if self._client is None or self._client_loop is not loop:
+            if self._client is not None:
+                self._close_stale_client(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=settings.youtube_http2 and _http2_available(),
+                timeout=settings.youtube_http_timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=settings.youtube_http_max_connections,
+                    max_keepalive_connections=settings.youtube_http_max_connections,
+                    keepalive_expiry=60
+                ),
+                transport=self._transport
+            )
+            self._client_loop = loop
+        return self._client
+    
+    @staticmethod
+    def _close_stale_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+        """Close a client opened on another loop, on that loop while it still runs."""
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        
+        # The loop is gone; its connections cannot be closed cleanly, only dropped
+        async def close():
             try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                transcript = transcript_list.find_generated_transcript(['en'])
-                transcript_data = transcript.fetch()
-                transcript_text = ' '.join([entry['text'] for entry in transcript_data])
-                return transcript_text
-            except Exception as e2:
-                print(f"Auto-generated transcript error: {e2}")
+                await client.aclose()
+            except Exception as e:
+                print(f"Could not close stale YouTube HTTP client: {e}")
+        
+        # Referenced until done so the task is not garbage-collected mid-close
+        task = asyncio.get_running_loop().create_task(close())
+        _stale_client_closes.add(task)
+        task.add_done_callback(_stale_client_closes.discard)
+    
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get(self, path: str, method: str, **params) -> Dict:
+        """Call a Data API endpoint, charging its quota cost."""
+        await self.quota.arecord(method)
+        response = await self.client.get(path, params={**params, 'key': self.api_key})
+        response.raise_for_status()
+        return response.json()
+    
+    async def resolve_channel_id(self, channel_name: str) -> Optional[str]:
+        """Resolve a channel name or handle to its (cached) channel ID."""
+        key = channel_cache_key(channel_name)
+        
+        if self.channel_cache is not None:
+            channel_id = await self.channel_cache.aget(key)
+            if channel_id:
+                return channel_id
+        
+        channel_response = await self._get(
+            '/search',
+            'search.list',
+            part='snippet',
+            q=channel_handle(channel_name),
+            type='channel',
+            maxResults=1
+        )
+        
+        if not channel_response.get('items'):
+            return None
+        
+        channel_id = channel_response['items'][0]['id']['channelId']
+        if self.channel_cache is not None:
+            await self.channel_cache.aset(key, channel_id)
+        return channel_id
+    
+    async def search_channel_videos(self, channel_id: str, query: str) -> List[Dict]:
+        """Search a channel's videos, caching results per (channel_id, query)."""
+        key = search_cache_key(channel_id, query)
+        
+        if self.search_cache is not None:
+            cached = await self.search_cache.aget(key)
+            if cached is not None:
+                return json.loads(cached)
+        
+        video_response = await self._get(
+            '/search',
+            'search.list',
+            part='snippet',
+            channelId=channel_id,
+            q=query,
+            type='video',
+            maxResults=5
+        )
+        videos = [format_search_item(item) for item in video_response.get('items', [])]
+        
+        if self.search_cache is not None:
+            await self.search_cache.aset(key, json.dumps(videos))
+        return videos
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
+    async def search_video(self, channel_name: str, video_title: str) -> Optional[Dict]:
+        """Search for a video on a channel (see YouTubeService.search_video)."""
+        if not self.api_key:
+            return None
+        
+        try:
+            channel_id = await self.resolve_channel_id(channel_name)
+            
+            if not channel_id:
                 return None
+            
+            videos = await self.search_channel_videos(channel_id, video_title)
+            
+            if not videos:
+                return None
+            
+            return pick_best_match(videos, video_title)
+            
+        except Exception as e:
+            print(f"YouTube API search error: {e}")
+            return None
     
-    def get_video_metadata(self, video_id: str) -> Optional[Dict]:
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
+    async def get_transcript(self, video_id: str, language: str = 'en') -> Optional[str]:
+        """
+        Get video transcript without blocking the event loop.
+        
+        The transcript store is checked first; downloaded transcripts are
+        saved to it so repeat and retried jobs skip the download.
+        """
+        if self.transcript_store is not None:
+            try:
+                text = await self.transcript_store.get(video_id, language)
+                if text is not None:
+                    return text
+            except Exception as e:
+                print(f"Transcript store read error for {video_id}: {e}")
+        
+        segments = await asyncio.to_thread(fetch_transcript_segments, video_id, language)
+        if segments is None:
+            return None
+        
+        if self.transcript_store is not None:
+            try:
+                await self.transcript_store.save(video_id, language, segments)
+            except Exception as e:
+                print(f"Transcript store write error for {video_id}: {e}")
+        return join_segments(segments)
+    
+    async def get_video_metadata(self, video_id: str) -> Optional[Dict]:
         """Get video metadata using API."""
-        if not self.youtube:
+        if not self.api_key:
             return None
         
         try:
-            request = self.youtube.videos().list(
+            response = await self._get(
+                '/videos',
+                'videos.list',
                 part='snippet,statistics,contentDetails',
                 id=video_id
             )
-            response = request.execute()
             
             if not response.get('items'):
                 return None
             
-            item = response['items'][0]
-            return {
-                'title': item['snippet']['title'],
-                'description': item['snippet']['description'],
-                'channel_title': item['snippet']['channelTitle'],
-                'published_at': item['snippet']['publishedAt'],
-                'thumbnail': item['snippet']['thumbnails']['high']['url'],
-                'tags': item['snippet'].get('tags', []),
-                'view_count': item['statistics'].get('viewCount', '0'),
-                'like_count': item['statistics'].get('likeCount', '0'),
-                'duration': item['contentDetails']['duration']
-            }
+            return format_video_item(response['items'][0])
         except Exception as e:
             print(f"Metadata fetch error: {e}")
             return None
+
+
+_youtube_service: Optional[YouTubeService] = None
+
+
+def get_youtube_service() -> YouTubeService:
+    """Return the process-wide YouTubeService, so its caches outlive a single job."""
+    global _youtube_service
+    if _youtube_service is None:
+        _youtube_service = YouTubeService()
+    return _youtube_service
+
+
+_async_youtube_service: Optional[AsyncYouTubeService] = None
+
+
+def get_async_youtube_service() -> AsyncYouTubeService:
+    """Return the process-wide AsyncYouTubeService and its connection pool."""
+    global _async_youtube_service
+    if _async_youtube_service is None:
+        _async_youtube_service = AsyncYouTubeService()
+    return _async_youtube_service
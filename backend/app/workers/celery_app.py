@@ -1,7 +1,30 @@
 """Celery worker configuration."""
 from celery import Celery
+from kombu import Queue
 from app.config import settings
 
+# Queues for new jobs: interactive requests and bulk submissions
+JOB_QUEUES = ["interactive", "bulk"]
+
+# Queue per pipeline stage and job queue, so I/O-, LLM- and DB-bound work
+# and interactive and bulk traffic scale separately (e.g.
+# `celery ... worker -Q llm.interactive` on hosts dedicated to generation)
+STAGE_QUEUES = {
+    "ingest": "ingest",
+    "key_points": "llm",
+    "outline": "llm",
+    "sections": "llm",
+    "polish": "llm",
+    "save": "db",
+    "embed": "db",
+}
+
+
+def stage_queue(stage: str, lane: str = "interactive") -> str:
+    """Queue a pipeline stage of a job in the given job queue runs on."""
+    return f"{STAGE_QUEUES[stage]}.{lane}"
+
+
 celery_app = Celery(
     "ytblog_worker",
     broker=settings.celery_broker_url,
@@ -21,4 +44,22 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
     result_extended=True,  # Store extended result metadata
     task_ignore_result=False,  # Store task results
+    # Workers started without -Q consume every queue
+    task_queues=[
+        Queue(name, routing_key=name)
+        for name in [
+            "celery",
+            *JOB_QUEUES,
+            *sorted({stage_queue(stage, lane) for stage in STAGE_QUEUES for lane in JOB_QUEUES}),
+        ]
+    ],
+    # Defaults; generate_blog_post sends each job's stages to its own lane
+    task_routes={
+        "generate_blog_post": {"queue": "interactive"},
+        **{f"stage.{stage}": {"queue": stage_queue(stage)} for stage in STAGE_QUEUES},
+    },
+    # Serve higher-priority messages (lower numbers) first within each queue
+    broker_transport_options={"queue_order_strategy": "priority", "priority_steps": [0, 3, 6, 9]},
+    task_default_priority=3,
+    worker_prefetch_multiplier=1,  # Prefetched messages would bypass priorities
 )
@@ -0,0 +1,171 @@
+"""Per-process asyncio runtime for Celery workers."""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, List, Optional
+
+from app.config import settings
+from app.db import session as db_session
+from app.services import events
+from app.workers.celery_app import celery_app
+
+
+class WorkerRuntime:
+    """
+    One long-lived event loop per worker process, run in a daemon thread.
+
+    Every task coroutine runs on this loop, so loop-bound resources (the
+    asyncpg pool, async Redis and HTTP clients) are created once and reused
+    across tasks instead of being tied to a throwaway loop.
+
+    Tasks may be submitted from many threads at once (Celery's threads
+    pool): their coroutines then interleave on the loop, and at most
+    max_in_flight of them run at a time. That pool cannot enforce Celery's
+    time limits, so each coroutine is cancelled after task_timeout seconds.
+
+    A runtime belongs to the process that started it: a forked child
+    inherits the loop but not its thread, and sees the runtime as stopped.
+    """
+
+    def __init__(
+        self, max_in_flight: Optional[int] = None, task_timeout: Optional[float] = None
+    ):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.max_in_flight = max_in_flight
+        self.task_timeout = task_timeout
+        self._pid: Optional[int] = None
+        self.in_flight = 0
+        self._thread: Optional[threading.Thread] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._background: List[Future] = []
+
+    @property
+    def running(self) -> bool:
+        return (
+            self.loop is not None
+            and self._pid == os.getpid()
+            and self.loop.is_running()
+        )
+
+    def start(self) -> None:
+        """Start the loop thread and create the process's database pool."""
+        if self.running:
+            return
+        # Pools inherited from the parent process must not be shared after fork
+        db_session.init_engine()
+        events.reset_redis()
+
+        self._pid = os.getpid()
+        self._background = []
+        self.loop = asyncio.new_event_loop()
+        if self.max_in_flight:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        ready = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(
+            target=run_loop, name="worker-runtime", daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+
+    async def _guarded(self, coro: Coroutine) -> Any:
+        """Run a coroutine once an in-flight slot is free, within the task deadline."""
+        return await asyncio.wait_for(self._acquire_slot(coro), self.task_timeout)
+
+    async def _acquire_slot(self, coro: Coroutine) -> Any:
+        if self._slots is None:
+            return await self._track(coro)
+        async with self._slots:
+            return await self._track(coro)
+
+    async def _track(self, coro: Coroutine) -> Any:
+        self.in_flight += 1
+        try:
+            return await coro
+        finally:
+            self.in_flight -= 1
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the runtime loop from any thread."""
+        if not self.running:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(self._guarded(coro), self.loop)
+
+    def start_background(self, coro: Coroutine) -> Future:
+        """Run a long-lived coroutine on the loop, outside the in-flight limit, until stop()."""
+        if not self.running:
+            self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        self._background.append(future)
+        return future
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the runtime loop and wait for its result."""
+        return self.submit(coro).result(timeout)
+
+    async def _close_resources(self) -> None:
+        """Release pooled connections held on the runtime loop."""
+        from app.services.youtube import get_async_youtube_service
+
+        await get_async_youtube_service().aclose()
+        await events.close_redis()
+        await db_session.dispose_engine()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Dispose of pools and stop the loop."""
+        if not self.running:
+            return
+        for future in self._background:
+            future.cancel()
+        self._background = []
+        try:
+            self.run(self._close_resources(), timeout)
+        except Exception as e:
+            print(f"Worker runtime shutdown error: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.loop.close()
+        self.loop = None
+        self._thread = None
+
+
+_runtime: Optional[WorkerRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    """Forget the parent's runtime in a forked child; its loop thread did not survive the fork."""
+    global _runtime, _runtime_lock
+    _runtime = None
+    _runtime_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_runtime() -> WorkerRuntime:
+    """Return the process-wide WorkerRuntime, starting it on first use."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = WorkerRuntime(
+                max_in_flight=settings.worker_max_in_flight,
+                task_timeout=celery_app.conf.task_time_limit,
+            )
+        if not _runtime.running:
+            _runtime.start()
+    return _runtime
+
+
+def stop_runtime() -> None:
+    """Stop the process-wide WorkerRuntime if one was started."""
+    with _runtime_lock:
+        if _runtime is not None:
+            _runtime.stop()
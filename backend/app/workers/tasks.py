@@ -1,154 +1,493 @@
 """Celery tasks for background processing."""
 import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 from uuid import UUID
-from celery import Task
-from app.workers.celery_app import celery_app
-from app.services.youtube import YouTubeService
-from app.services.llm_pipeline import LLMPipeline
-from app.services.embeddings import EmbeddingService
+from celery import Task, chain
+from celery.concurrency.prefork import TaskPool as PreforkPool
+from celery.signals import worker_process_init, worker_process_shutdown, worker_ready, worker_shutdown
+from app.workers.celery_app import STAGE_QUEUES, celery_app, stage_queue
+from app.workers.runtime import get_runtime, stop_runtime
+from app.services.youtube import get_async_youtube_service
+from app.services.llm_pipeline import get_llm_pipeline
+from app.services.embeddings import get_embedding_service
+from app.services.events import TokenStreamPublisher, publish_progress
+from app.services.dedupe import (
+    ATTACHED, REUSED, claim_or_follow, refresh_video_claim, release_video, remember_video, settle_followers
+)
+from app.services import scheduler
+from app.config import settings
 from app.db.session import async_session_maker
-from app.db.crud import JobRepository, BlogPostRepository
+from app.db.crud import BlogPostRepository, CheckpointRepository, EmbeddingRepository, JobRepository
 from app.models.database import JobStatus
 
 
-def run_async(coro):
-    """Helper to run async code in Celery task."""
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Start the event loop and database pool, and build the shared clients, once per worker process."""
+    get_runtime()
+    get_llm_pipeline()
+    get_embedding_service()
+    get_async_youtube_service()
+    start_dispatcher()
+
+
+@worker_ready.connect
+def start_main_process_dispatcher(sender=None, **kwargs):
+    """
+    Start the dispatcher in the main process of thread and solo pools.
+    
+    Prefork children start their own; the parent must not start a runtime
+    its children would inherit.
+    """
+    if not isinstance(getattr(sender, 'pool', None), PreforkPool):
+        start_dispatcher()
+
+
+def start_dispatcher() -> None:
+    """
+    Dispatch waiting jobs periodically from the process running tasks.
+    
+    Submissions and job completions dispatch too; this catches jobs left
+    waiting when neither happens, e.g. after workers crashed mid-job.
+    """
+    interval = settings.scheduler_dispatch_interval_seconds
+    if settings.fair_scheduling_enabled and interval > 0:
+        get_runtime().start_background(scheduler.run_dispatcher(interval))
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """
+    Close pooled connections before the worker process exits.
+
+    worker_process_shutdown covers prefork children; worker_shutdown covers
+    the threads pool, where tasks run in the main process and the runtime
+    is started by the first task.
+    """
+    stop_runtime()
+
+
+async def report_progress(
+    job_id: str,
+    progress: Optional[int],
+    message: str,
+    status: JobStatus = JobStatus.RUNNING,
+    **fields
+) -> None:
+    """
+    Publish a progress update to Redis.
+    
+    This is the single progress write per step: the status endpoint and
+    push subscribers read it from Redis instead of Postgres.
+    """
+    try:
+        await publish_progress(job_id, status.value, progress, message, **fields)
+    except Exception as e:
+        print(f"[Task {job_id}] Progress publish failed: {e}")
+
+
+async def end_token_stream(job_id: str, status: JobStatus, error: Optional[str] = None) -> None:
+    """Close the job's token stream; like progress, a failed publish must not stop the job."""
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        await TokenStreamPublisher(job_id).end(status.value, error=error)
+    except Exception as e:
+        print(f"[Task {job_id}] Token stream end failed: {e}")
+
+
+async def finish_single_flight(
+    session,
+    job_id: str,
+    video_id: Optional[str],
+    status: JobStatus,
+    blog_post_id: Optional[int] = None,
+    error: Optional[str] = None
+) -> None:
+    """Release the video lock and hand the outcome to jobs attached to this one."""
+    if not video_id:
+        return
+    try:
+        await release_video(video_id, job_id)
+        settled = await settle_followers(session, job_id, status.value, blog_post_id, error)
+        if settled:
+            print(f"[Task {job_id}] Settled {settled} attached job(s) for video {video_id}")
+    except Exception as e:
+        print(f"[Task {job_id}] Could not settle attached jobs: {e}")
+
+
+async def extend_single_flight(job_id: str, outputs: Dict[str, dict]) -> None:
+    """Keep the video lock and the attached jobs of a leader alive for its next stage."""
+    video_id = outputs.get('ingest', {}).get('video', {}).get('video_id')
+    if not settings.video_dedupe_enabled or not video_id:
+        return
+    try:
+        if not await refresh_video_claim(video_id, job_id):
+            print(f"[Task {job_id}] No longer holds the lock for video {video_id}")
+    except Exception as e:
+        print(f"[Task {job_id}] Could not refresh the video lock: {e}")
+
+
+class StepTimer:
+    """Records wall-clock seconds per pipeline step."""
+    
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+    
+    @contextmanager
+    def step(self, name: str):
+        """Time the enclosed block as step `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+    
+    async def run(self, name: str, awaitable: Awaitable):
+        """Await and time a single step."""
+        with self.step(name):
+            return await awaitable
+
+
+async def fetch_video_inputs(youtube_service, video_id: str, timer: StepTimer) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    Fetch the transcript and metadata of a video concurrently.
+    
+    Both need only the video_id, so the slower fetch (and any retry
+    backoff) overlaps the other instead of following it. Timings are
+    recorded per fetch and for the whole stage ("ingest").
+    
+    Returns:
+        Tuple of (transcript, metadata), either may be None
+    """
+    with timer.step('ingest'):
+        return await asyncio.gather(
+            timer.run('transcript', youtube_service.get_transcript(video_id)),
+            timer.run('metadata', youtube_service.get_video_metadata(video_id))
+        )
+
+
+# Pipeline stages in run order; each is a task on its stage_queue()
+STAGES = ["ingest", "key_points", "outline", "sections", "polish", "save", "embed"]
+
+# Progress reported when a stage starts
+STAGE_PROGRESS = {
+    "ingest": (15, "Searching for video..."),
+    "key_points": (40, "Extracting key points..."),
+    "outline": (50, "Outlining blog post..."),
+    "sections": (60, "Writing sections..."),
+    "polish": (70, "Polishing blog post..."),
+    "save": (80, "Saving blog post..."),
+    "embed": (90, "Generating embeddings..."),
+}
+
+# Graph state fields each LLM stage produces
+LLM_STAGE_FIELDS = {
+    "key_points": ["key_points"],
+    "outline": ["outline"],
+    "sections": ["sections", "failed_sections"],
+    "polish": ["final_blog"],
+}
+
+
+class PipelineError(Exception):
+    """A stage failure that retrying cannot fix."""
+
+
+class PipelineStopped(Exception):
+    """The job needs no further stages (its result came from another job)."""
+    
+    def __init__(self, outcome: str):
+        super().__init__(outcome)
+        self.outcome = outcome
+
+
+async def ingest_stage(session, job_id: str, outputs: Dict[str, dict], timer: StepTimer) -> dict:
+    """Find the video, claim it, and fetch its transcript and metadata."""
+    youtube_service = get_async_youtube_service()
+    job = await JobRepository.get_by_id(session, UUID(job_id))
+    if not job:
+        raise PipelineError(f"Job {job_id} not found")
+    
+    print(f"[Task {job_id}] Searching for video: '{job.video_title}' on channel '{job.channel_name}'")
+    video_data = await timer.run('search', youtube_service.search_video(job.channel_name, job.video_title))
     
+    if not video_data:
+        raise PipelineError(f"Could not find video '{job.video_title}' on channel '{job.channel_name}'. Make sure YOUTUBE_API_KEY is configured.")
+    
+    print(f"[Task {job_id}] Found video: {video_data.get('video_id')}")
+    video_id = video_data['video_id']
+    await JobRepository.update_video_id(session, UUID(job_id), video_id)
+    
+    # Single-flight per video: reuse a fresh post or wait on the run in progress
+    if settings.video_dedupe_enabled:
+        try:
+            await remember_video(job.channel_name, job.video_title, video_id)
+            outcome = await claim_or_follow(session, job_id, video_id)
+        except Exception as e:
+            print(f"[Task {job_id}] Dedupe unavailable, generating anyway: {e}")
+            outcome = None
+        
+        if outcome:
+            raise PipelineStopped(outcome)
+    
+    await report_progress(job_id, 30, 'Fetching transcript and metadata...')
+    transcript, metadata = await fetch_video_inputs(youtube_service, video_id, timer)
+    
+    if not transcript:
+        raise Exception(f"Could not fetch transcript for video {video_id}")
+    
+    return {
+        'video': video_data,
+        'transcript': transcript,
+        'metadata': metadata or video_data  # Fallback to search data
+    }
+
+
+def pipeline_state(outputs: Dict[str, dict]) -> Dict[str, Any]:
+    """Rebuild the LangGraph state from the ingest and LLM stage checkpoints."""
+    ingest = outputs['ingest']
+    video_data = ingest['video']
+    state = get_llm_pipeline().initial_state(
+        video_id=video_data['video_id'],
+        video_title=video_data['title'],
+        video_description=video_data['description'],
+        channel_title=video_data['channel_title'],
+        transcript=ingest['transcript'],
+        metadata=ingest['metadata']
+    )
+    for stage in LLM_STAGE_FIELDS:
+        state.update(outputs.get(stage, {}))
+    return state
+
+
+def make_llm_stage(stage: str):
+    """Build the handler running one LangGraph node as a pipeline stage."""
+    async def llm_stage(session, job_id: str, outputs: Dict[str, dict], timer: StepTimer) -> dict:
+        state = await get_llm_pipeline().run_stage(
+            stage, pipeline_state(outputs), on_token=TokenStreamPublisher(job_id).on_token
+        )
+        return {field: state[field] for field in LLM_STAGE_FIELDS[stage]}
+    return llm_stage
+
+
+async def save_stage(session, job_id: str, outputs: Dict[str, dict], timer: StepTimer) -> dict:
+    """Save the blog post, reusing one saved by an earlier attempt."""
+    blog_post = await BlogPostRepository.get_by_job_id(session, UUID(job_id))
+    if not blog_post:
+        blog_result = get_llm_pipeline().build_result(pipeline_state(outputs))
+        blog_post = await BlogPostRepository.create(
+            session,
+            job_id=UUID(job_id),
+            title=outputs['ingest']['video']['title'],
+            content=blog_result['content'],
+            video_metadata=blog_result['metadata']
+        )
+    return {'blog_post_id': blog_post.id}
+
+
+async def embed_stage(session, job_id: str, outputs: Dict[str, dict], timer: StepTimer) -> dict:
+    """Embed the saved blog post, unless an earlier attempt already stored its chunks."""
+    blog_post_id = outputs['save']['blog_post_id']
+    existing = await EmbeddingRepository.get_by_blog_post(session, blog_post_id)
+    if existing:
+        return {'chunks': len(existing)}
+    
+    count = await get_embedding_service().generate_and_store_embeddings(
+        session, blog_post_id, outputs['polish']['final_blog']
+    )
+    return {'chunks': count}
+
+
+STAGE_HANDLERS = {
+    "ingest": ingest_stage,
+    **{stage: make_llm_stage(stage) for stage in LLM_STAGE_FIELDS},
+    "save": save_stage,
+    "embed": embed_stage,
+}
+
+
+async def complete_job(session, job_id: str, outputs: Dict[str, dict]) -> None:
+    """Mark a job completed and hand its post to jobs attached to it."""
+    blog_post_id = outputs['save']['blog_post_id']
+    await JobRepository.update_status(session, UUID(job_id), JobStatus.COMPLETED, 100)
+    await report_progress(
+        job_id, 100, 'Completed!', status=JobStatus.COMPLETED, blog_post_id=blog_post_id
+    )
+    await end_token_stream(job_id, JobStatus.COMPLETED)
+    video_id = outputs['ingest']['video']['video_id'] if settings.video_dedupe_enabled else None
+    await finish_single_flight(
+        session, job_id, video_id, JobStatus.COMPLETED, blog_post_id=blog_post_id
+    )
+    await scheduler.finish(job_id)
+
+
+async def fail_job(job_id: str, error: str) -> None:
+    """Mark a job failed once a stage has run out of retries or it could not start."""
     try:
-        return loop.run_until_complete(coro)
+        async with async_session_maker() as session:
+            job = await JobRepository.update_status(session, UUID(job_id), JobStatus.FAILED, error=error)
+            await report_progress(job_id, None, 'Failed', status=JobStatus.FAILED, error=error)
+            await end_token_stream(job_id, JobStatus.FAILED, error=error)
+            video_id = job.video_id if job and settings.video_dedupe_enabled else None
+            await finish_single_flight(session, job_id, video_id, JobStatus.FAILED, error=error)
     finally:
-        # Don't close the loop as it might be reused
-        pass
+        # The lane's in-flight slot is freed even if the job could not be updated
+        await scheduler.finish(job_id)
 
 
-async def async_generate_blog_post(task: Task, job_id: str, channel_name: str, video_title: str):
-    """Async implementation of blog post generation."""
-    import traceback
-    
-    youtube_service = YouTubeService()
-    llm_pipeline = LLMPipeline()
-    embedding_service = EmbeddingService()
+async def run_stage(job_id: str, stage: str) -> Dict[str, Any]:
+    """
+    Run one pipeline stage of a job and checkpoint its output.
     
+    The outputs of earlier stages are read from their checkpoints, so any
+    stage can run on any worker and a retry repeats only the failed stage.
+    A stage that already has a checkpoint is skipped; for the last stage the
+    job is still completed if an earlier attempt failed while completing it.
+    """
     async with async_session_maker() as session:
+        checkpoints = await CheckpointRepository.get_all(session, UUID(job_id))
+        outputs = {name: checkpoint.data for name, checkpoint in checkpoints.items()}
+        if stage in checkpoints:
+            print(f"[Task {job_id}] Stage '{stage}' already checkpointed, skipping")
+            if stage == STAGES[-1]:
+                job = await JobRepository.get_by_id(session, UUID(job_id))
+                if job and job.status != JobStatus.COMPLETED.value:
+                    await complete_job(session, job_id, outputs)
+            return {'status': 'skipped', 'job_id': job_id, 'stage': stage}
+        
+        await extend_single_flight(job_id, outputs)
+        progress, message = STAGE_PROGRESS[stage]
+        await report_progress(job_id, progress, message)
+        
+        timer = StepTimer()
         try:
-            # Update: Starting
-            task.update_state(state='PROGRESS', meta={'current': 0, 'total': 100, 'status': 'Starting...'})
-            await JobRepository.update_status(session, UUID(job_id), JobStatus.RUNNING, 0)
-            
-            # Step 1: Search for video
-            task.update_state(state='PROGRESS', meta={'current': 15, 'total': 100, 'status': 'Searching for video...'})
-            
-            print(f"[Task {job_id}] Searching for video: '{video_title}' on channel '{channel_name}'")
-            video_data = youtube_service.search_video(channel_name, video_title)
-            
-            if not video_data:
-                raise Exception(f"Could not find video '{video_title}' on channel '{channel_name}'. Make sure YOUTUBE_API_KEY is configured.")
-            
-            print(f"[Task {job_id}] Found video: {video_data.get('video_id')}")
-            video_id = video_data['video_id']
-            await JobRepository.update_video_id(session, UUID(job_id), video_id)
-            
-            # Step 2: Fetch transcript
-            task.update_state(state='PROGRESS', meta={'current': 30, 'total': 100, 'status': 'Fetching transcript...'})
-            transcript = youtube_service.get_transcript(video_id)
-            
-            if not transcript:
-                raise Exception(f"Could not fetch transcript for video {video_id}")
-            
-            # Step 3: Get metadata
-            task.update_state(state='PROGRESS', meta={'current': 45, 'total': 100, 'status': 'Extracting metadata...'})
-            metadata = youtube_service.get_video_metadata(video_id)
-            
-            if not metadata:
-                metadata = video_data  # Fallback to search data
-            
-            # Step 4: Generate blog with LangGraph
-            task.update_state(state='PROGRESS', meta={'current': 60, 'total': 100, 'status': 'Generating blog post...'})
-            
-            blog_result = await llm_pipeline.generate_blog(
-                video_id=video_id,
-                video_title=video_data['title'],
-                video_description=video_data['description'],
-                channel_title=video_data['channel_title'],
-                transcript=transcript,
-                metadata=metadata
-            )
-            
-            # Step 5: Save blog post
-            task.update_state(state='PROGRESS', meta={'current': 80, 'total': 100, 'status': 'Saving blog post...'})
-            
-            blog_post = await BlogPostRepository.create(
-                session,
-                job_id=UUID(job_id),
-                title=video_data['title'],
-                content=blog_result['content'],
-                video_metadata=blog_result['metadata']
-            )
-            
-            # Step 6: Generate and save embeddings
-            task.update_state(state='PROGRESS', meta={'current': 90, 'total': 100, 'status': 'Generating embeddings...'})
-            
-            await embedding_service.generate_and_store_embeddings(
-                session,
-                blog_post.id,
-                blog_result['content']
-            )
-            
-            # Step 7: Mark as completed
-            task.update_state(state='PROGRESS', meta={'current': 100, 'total': 100, 'status': 'Completed!'})
-            await JobRepository.update_status(session, UUID(job_id), JobStatus.COMPLETED, 100)
-            
+            with timer.step(stage):
+                outputs[stage] = await STAGE_HANDLERS[stage](session, job_id, outputs, timer)
+        except PipelineStopped as e:
+            # Result comes from another job: the stage task drops the remaining stages
+            print(f"[Task {job_id}] Video {e.outcome}, skipping generation")
+            await scheduler.finish(job_id)
             return {
-                'status': 'completed',
+                'status': e.outcome,
                 'job_id': job_id,
-                'blog_post_id': blog_post.id,
-                'message': 'Blog post generated successfully'
+                'reused': True,
+                'message': f'Result {e.outcome} from another job for this video'
             }
-            
+        finally:
+            print(f"[Task {job_id}] Stage '{stage}' timings (s): {timer.timings}")
+        
+        await CheckpointRepository.save(
+            session, UUID(job_id), stage, outputs[stage], timer.timings[stage]
+        )
+        if stage != STAGES[-1]:
+            return {'status': 'checkpointed', 'job_id': job_id, 'stage': stage, 'timings': timer.timings}
+        
+        await complete_job(session, job_id, outputs)
+        timings = {name: checkpoint.duration_seconds for name, checkpoint in checkpoints.items()}
+        timings[stage] = timer.timings[stage]
+        return {
+            'status': 'completed',
+            'job_id': job_id,
+            'blog_post_id': outputs['save']['blog_post_id'],
+            'timings': timings,
+            'message': 'Blog post generated successfully'
+        }
+
+
+class StageTask(Task):
+    """Base for pipeline tasks: reports retries and fails the job once retries run out."""
+    
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        job_id = kwargs.get('job_id', args[0] if args else None)
+        print(f"[Task {job_id}] {self.name} failed, retrying: {exc}")
+        get_runtime().run(report_progress(job_id, None, f'Retrying after error: {exc}'))
+    
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        job_id = kwargs.get('job_id', args[0] if args else None)
+        print(f"[Task {job_id}] {self.name} failed: {exc}\n{einfo}")
+        try:
+            get_runtime().run(fail_job(job_id, str(exc)))
         except Exception as e:
-            # Mark job as failed
-            import traceback
-            error_msg = f"{str(e)}\n{traceback.format_exc()}"
-            print(f"[Task {job_id}] ERROR: {error_msg}")
-            
-            await JobRepository.update_status(
-                session,
-                UUID(job_id),
-                JobStatus.FAILED,
-                error=str(e)
-            )
-            raise
-
-
-@celery_app.task(name="generate_blog_post", bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 0})
-def generate_blog_post_task(self, job_id: str, channel_name: str, video_title: str, email: str = None):
+            print(f"[Task {job_id}] Could not mark job failed: {e}")
+
+
+def make_stage_task(stage: str) -> Task:
+    """Register the Celery task running one pipeline stage."""
+    @celery_app.task(
+        name=f"stage.{stage}",
+        bind=True,
+        base=StageTask,
+        autoretry_for=(Exception,),
+        dont_autoretry_for=(PipelineError,),
+        max_retries=settings.stage_max_retries,
+        retry_backoff=True,
+        retry_backoff_max=settings.stage_retry_backoff_max_seconds,
+        retry_jitter=True
+    )
+    def stage_task(self, job_id: str):
+        result = get_runtime().run(run_stage(job_id, stage))
+        # The request is thread-local: only this (the worker's) thread can stop the chain
+        if result['status'] in (REUSED, ATTACHED):
+            self.request.chain = None
+        return result
+    
+    stage_task.__doc__ = f"Run the '{stage}' pipeline stage of a job (queues: {STAGE_QUEUES[stage]}.<lane>)."
+    return stage_task
+
+
+STAGE_TASKS = {stage: make_stage_task(stage) for stage in STAGES}
+
+
+async def start_pipeline(job_id: str) -> List[str]:
+    """
+    Mark a job running and return the stages it still has to run.
+    
+    Stages with a checkpoint are done, so a job re-submitted after a
+    failure resumes from its last good stage.
+    """
+    async with async_session_maker() as session:
+        checkpoints = await CheckpointRepository.get_all(session, UUID(job_id))
+        remaining = [stage for stage in STAGES if stage not in checkpoints]
+        if remaining:
+            await JobRepository.update_status(session, UUID(job_id), JobStatus.RUNNING, 0)
+            await report_progress(job_id, 0, 'Starting...')
+        return remaining
+
+
+@celery_app.task(name="generate_blog_post", bind=True, base=StageTask)
+def generate_blog_post_task(
+    self,
+    job_id: str,
+    channel_name: str,
+    video_title: str,
+    email: str = None,
+    priority: Optional[int] = None,
+    lane: str = "interactive"
+):
     """
     Background task to generate a blog post from a YouTube video.
     
-    Steps:
-    1. Search for YouTube video
-    2. Fetch video transcript
-    3. Extract metadata
-    4. Create embeddings
-    5. Run LangGraph pipeline to generate blog post
-    6. Save to database
-    7. Send email if requested
+    Dispatches a chain of stage tasks, each retried on its own and
+    checkpointed in job_checkpoints:
+    1. ingest: search for the video, fetch transcript and metadata
+    2. key_points, outline, sections, polish: LangGraph nodes
+    3. save: store the blog post
+    4. embed: create and store embeddings
+    
+    Sending this task again for a failed job resumes it from the first
+    stage without a checkpoint. Stage tasks run on the stage queues of the
+    job's lane (e.g. llm.bulk) and inherit its priority.
     """
-    import traceback
-    try:
-        result = run_async(async_generate_blog_post(self, job_id, channel_name, video_title))
-        return result
-        
-    except Exception as e:
-        error_msg = f"{str(e)}\n{traceback.format_exc()}"
-        print(f"Task failed: {error_msg}")
-        self.update_state(state='FAILURE', meta={'error': str(e), 'exc_type': type(e).__name__})
-        raise
+    remaining = get_runtime().run(start_pipeline(job_id))
+    if not remaining:
+        return {'status': 'completed', 'job_id': job_id, 'message': 'All stages already completed'}
+    
+    options = {'priority': priority} if priority is not None else {}
+    chain(*(
+        STAGE_TASKS[stage].si(job_id).set(queue=stage_queue(stage, lane), **options)
+        for stage in remaining
+    )).apply_async()
+    print(f"[Task {job_id}] Dispatched stages: {remaining}")
+    return {'status': 'dispatched', 'job_id': job_id, 'stages': remaining}
@@ -0,0 +1,98 @@
+"""Benchmark embedding writes: per-row ORM flush vs multi-row bulk insert.
+
+Needs a Postgres database with the pgvector extension and the schema from
+the Alembic migrations (DATABASE_URL). Each run inserts into a throwaway
+job/blog post inside a transaction that is rolled back, so no data is kept.
+
+Usage (from backend/):
+    python -m benchmarks.bench_embedding_insert --sizes 10 100 1000 --repeat 3
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.db.crud import BlogPostRepository, EmbeddingRepository  # noqa: E402
+from app.db.session import async_session_maker, engine  # noqa: E402
+from app.models.database import Job, JobStatus  # noqa: E402
+
+DIMENSIONS = 1536
+
+
+def make_chunks(count: int):
+    """Random chunk texts and unit-ish vectors."""
+    chunks = [f"benchmark chunk {i} " * 40 for i in range(count)]
+    vectors = [[random.random() for _ in range(DIMENSIONS)] for _ in range(count)]
+    return chunks, vectors
+
+
+async def create_blog_post(session) -> int:
+    """Create a job and blog post to attach embeddings to."""
+    job = Job(
+        id=uuid.uuid4(),
+        channel_name="bench",
+        video_title="bench",
+        status=JobStatus.QUEUED.value,
+    )
+    session.add(job)
+    await session.flush()
+    blog_post = await BlogPostRepository.create(
+        session, job_id=job.id, title="bench", content="bench", video_metadata={}
+    )
+    return blog_post.id
+
+
+async def per_row(session, blog_post_id, chunks, vectors):
+    """Old path: one EmbeddingRepository.create (and flush) per chunk."""
+    for idx, (chunk, vector) in enumerate(zip(chunks, vectors)):
+        await EmbeddingRepository.create(
+            session,
+            blog_post_id=blog_post_id,
+            chunk_text=chunk,
+            embedding_vector=vector,
+            chunk_index=idx,
+        )
+
+
+async def bulk(session, blog_post_id, chunks, vectors):
+    """New path: EmbeddingRepository.bulk_create."""
+    await EmbeddingRepository.bulk_create(session, blog_post_id, chunks, vectors)
+
+
+async def time_once(write, chunks, vectors) -> float:
+    """Time one write inside a rolled-back transaction."""
+    async with async_session_maker() as session:
+        blog_post_id = await create_blog_post(session)
+        start = time.perf_counter()
+        await write(session, blog_post_id, chunks, vectors)
+        await session.flush()
+        elapsed = time.perf_counter() - start
+        await session.rollback()
+    return elapsed
+
+
+async def main(sizes, repeat):
+    engine.echo = False
+    print(f"{'chunks':>8} {'per-row ms':>12} {'bulk ms':>10} {'speedup':>8}")
+    for size in sizes:
+        chunks, vectors = make_chunks(size)
+        row_times = [await time_once(per_row, chunks, vectors) for _ in range(repeat)]
+        bulk_times = [await time_once(bulk, chunks, vectors) for _ in range(repeat)]
+        row_ms = statistics.median(row_times) * 1000
+        bulk_ms = statistics.median(bulk_times) * 1000
+        print(f"{size:>8} {row_ms:>12.1f} {bulk_ms:>10.1f} {row_ms / bulk_ms:>7.1f}x")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,180 @@
+"""Benchmark pgvector ANN search (HNSW / IVFFlat) against exact search.
+
+Builds a scratch table of clustered random vectors inside Postgres, computes
+exact top-k ground truth with index scans disabled, then reports recall@k
+and latency (p50/p95) for each index type and search setting.
+
+Needs a Postgres database with the pgvector extension (DATABASE_URL). The
+scratch table is dropped afterwards. 1M rows x 1536 dims needs ~6 GB of
+disk and a long index build; use --dims to scale down for a quick run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_vector_search --rows 10000 100000 1000000 --k 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from pgvector.asyncpg import register_vector  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from app.config import settings  # noqa: E402
+
+TABLE = "bench_vectors"
+CLUSTERS = 100
+
+
+def to_literal(vector: np.ndarray) -> str:
+    """Format a vector as a pgvector literal."""
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+async def load_rows(conn, rows: int, dims: int, rng: np.random.Generator):
+    """Create the scratch table and fill it with clustered vectors."""
+    await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await conn.execute(
+        text(f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, embedding vector({dims}))")
+    )
+
+    centroids = rng.normal(size=(CLUSTERS, dims)).astype(np.float32)
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    await register_vector(driver)  # Binary COPY of numpy vectors
+
+    batch = 5000
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        labels = rng.integers(0, CLUSTERS, size=count)
+        vectors = centroids[labels] + 0.3 * rng.normal(size=(count, dims)).astype(
+            np.float32
+        )
+        records = [(start + i, v) for i, v in enumerate(vectors)]
+        await driver.copy_records_to_table(
+            TABLE, records=records, columns=["id", "embedding"]
+        )
+
+    await conn.execute(text(f"ANALYZE {TABLE}"))
+    return centroids
+
+
+def make_queries(centroids: np.ndarray, count: int, rng: np.random.Generator) -> list:
+    """Query vectors drawn from the same distribution as the data."""
+    labels = rng.integers(0, CLUSTERS, size=count)
+    dims = centroids.shape[1]
+    return [
+        to_literal(v) for v in centroids[labels] + 0.3 * rng.normal(size=(count, dims))
+    ]
+
+
+async def run_queries(conn, queries: list, k: int, setup_sql: list):
+    """Run each query in its own transaction; return (ids per query, latencies)."""
+    results, latencies = [], []
+    for query in queries:
+        async with conn.begin():
+            for sql in setup_sql:
+                await conn.execute(text(sql))
+            start = time.perf_counter()
+            rows = await conn.execute(
+                text(
+                    f"SELECT id FROM {TABLE} ORDER BY embedding <=> CAST(:q AS vector) LIMIT :k"
+                ),
+                {"q": query, "k": k},
+            )
+            ids = [row[0] for row in rows]
+            latencies.append(time.perf_counter() - start)
+        results.append(ids)
+    return results, latencies
+
+
+def report(label: str, truth: list, results: list, latencies: list, k: int):
+    """Print recall@k and latency percentiles."""
+    recall = statistics.mean(len(set(t) & set(r)) / k for t, r in zip(truth, results))
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(
+        f"  {label:<28} recall@{k}={recall:.3f}  p50={statistics.median(ms):7.2f} ms  p95={p95:7.2f} ms"
+    )
+
+
+async def bench(
+    engine, rows: int, dims: int, k: int, query_count: int, rng: np.random.Generator
+):
+    print(f"\n{rows} rows, {dims} dims, {query_count} queries")
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        centroids = await load_rows(conn, rows, dims, rng)
+        queries = make_queries(centroids, query_count, rng)
+
+    async with engine.connect() as conn:
+        exact_setup = [
+            "SET LOCAL enable_indexscan = off",
+            "SET LOCAL enable_bitmapscan = off",
+        ]
+        truth, latencies = await run_queries(conn, queries, k, exact_setup)
+        report("exact (seq scan)", truth, truth, latencies, k)
+
+        build_start = time.perf_counter()
+        await conn.execute(
+            text(
+                f"CREATE INDEX bench_hnsw ON {TABLE} USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {settings.hnsw_m}, ef_construction = {settings.hnsw_ef_construction})"
+            )
+        )
+        await conn.commit()
+        print(f"  hnsw build: {time.perf_counter() - build_start:.1f} s")
+        for ef_search in (20, 40, 100, 200):
+            results, latencies = await run_queries(
+                conn, queries, k, [f"SET LOCAL hnsw.ef_search = {ef_search}"]
+            )
+            report(f"hnsw ef_search={ef_search}", truth, results, latencies, k)
+        await conn.execute(text("DROP INDEX bench_hnsw"))
+
+        lists = max(rows // 1000, 10)
+        build_start = time.perf_counter()
+        await conn.execute(
+            text(
+                f"CREATE INDEX bench_ivfflat ON {TABLE} USING ivfflat (embedding vector_cosine_ops) "
+                f"WITH (lists = {lists})"
+            )
+        )
+        await conn.commit()
+        print(
+            f"  ivfflat build (lists={lists}): {time.perf_counter() - build_start:.1f} s"
+        )
+        for probes in (1, 10, 40):
+            results, latencies = await run_queries(
+                conn, queries, k, [f"SET LOCAL ivfflat.probes = {probes}"]
+            )
+            report(f"ivfflat probes={probes}", truth, results, latencies, k)
+
+        await conn.execute(text(f"DROP TABLE {TABLE}"))
+        await conn.commit()
+
+
+async def main(args):
+    engine = create_async_engine(
+        settings.database_url.replace("postgresql://", "postgresql+asyncpg://")
+    )
+    rng = np.random.default_rng(args.seed)
+    try:
+        for rows in args.rows:
+            await bench(engine, rows, args.dims, args.k, args.queries, rng)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -47,3 +47,49 @@ async def db_session(db_engine) -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
         await session.rollback()
+
+
+@pytest.fixture(scope="function")
+def fake_redis(monkeypatch):
+    """Replace the shared async Redis client with an in-memory fake."""
+    import fakeredis
+    from app.services import events
+    
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(events, "_redis", client)
+    return client
+
+
+@pytest.fixture(scope="function")
+def youtube_stub():
+    """Local stand-in for the YouTube Data API, served in-process over ASGI."""
+    from fastapi import FastAPI, Request
+    
+    stub = FastAPI()
+    stub.state.requests = []
+    snippet = {
+        "title": "Intro to Vectors",
+        "description": "All about vectors",
+        "channelTitle": "Chan",
+        "publishedAt": "2024-01-01T00:00:00Z",
+        "thumbnails": {"high": {"url": "https://i.ytimg.com/vi/abc123def45/hqdefault.jpg"}}
+    }
+    
+    @stub.get("/search")
+    async def search(request: Request):
+        params = dict(request.query_params)
+        stub.state.requests.append(("search", params))
+        if params["type"] == "channel":
+            return {"items": [{"id": {"channelId": "UC123"}}]}
+        return {"items": [{"id": {"videoId": "abc123def45"}, "snippet": snippet}]}
+    
+    @stub.get("/videos")
+    async def videos(request: Request):
+        stub.state.requests.append(("videos", dict(request.query_params)))
+        return {"items": [{
+            "snippet": {**snippet, "tags": ["vectors"]},
+            "statistics": {"viewCount": "10", "likeCount": "2"},
+            "contentDetails": {"duration": "PT10M"}
+        }]}
+    
+    return stub
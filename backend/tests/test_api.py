@@ -72,3 +72,83 @@ async def test_status_endpoint_not_found():
         response = await client.get(f"/api/v1/status/{fake_id}")
         # Will fail until DB is connected, expecting 404 or 500
         assert response.status_code in [404, 500]
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_invalid_id():
+    """Test token stream endpoint with invalid job ID."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/v1/stream/invalid-uuid")
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_status_endpoint_served_from_progress_snapshot(fake_redis):
+    """Test status is read from the Redis snapshot without a database query."""
+    import uuid
+    from app.services.events import publish_progress
+    
+    job_id = str(uuid.uuid4())
+    await publish_progress(job_id, "running", 45, "Extracting metadata...", created_at="2024-01-01T00:00:00+00:00")
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(f"/api/v1/status/{job_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "running"
+        assert data["progress"] == 45
+        assert data["version"] == 1
+        
+        # Long-poll for a version the job has already passed returns at once
+        response = await client.get(f"/api/v1/status/{job_id}", params={"wait": 5, "version": 0})
+        assert response.json()["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint_paginates_with_cursor(monkeypatch):
+    """Test search returns an opaque cursor that resumes after the last hit."""
+    from datetime import datetime
+    from app.api import search as search_api
+    
+    calls = []
+    
+    class FakeEmbeddingService:
+        async def search(self, session, query, **kwargs):
+            calls.append(kwargs)
+            hit = {
+                "chunk_text": "Vector indexes", "chunk_index": 0, "blog_post_id": 7,
+                "blog_title": "Postgres", "channel_name": "DB", "video_id": "abc",
+                "similarity_score": 0.9, "created_at": datetime(2024, 1, 1)
+            }
+            return [hit], (0.1, 42) if kwargs["after"] is None else None
+    
+    monkeypatch.setattr(search_api, "get_embedding_service", lambda: FakeEmbeddingService())
+    
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/v1/search", params={"q": "vector", "channel": "DB", "limit": 1})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["results"][0]["blog_post_id"] == 7
+        
+        response = await client.get("/api/v1/search", params={"q": "vector", "cursor": data["next_cursor"]})
+        assert response.json()["next_cursor"] is None
+        assert calls[0]["channel"] == "DB"
+        assert calls[1]["after"] == (0.1, 42)
+        
+        response = await client.get("/api/v1/search", params={"q": "vector", "cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_generate_rejects_submitter_over_admission_limit(fake_redis, monkeypatch):
+    """Test admission control refuses work before a job is created."""
+    from app.config import settings
+    
+    monkeypatch.setattr(settings, "admission_max_pending_per_submitter", 0)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/generate",
+            json={"channel_name": "TestChannel", "video_title": "Test Video", "submitter": "batch"}
+        )
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "60"
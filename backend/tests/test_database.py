@@ -106,3 +106,78 @@ async def test_get_blog_post_by_job_id(db_session):
     blog_post = await BlogPostRepository.get_by_job_id(db_session, job_id)
     assert blog_post is not None
     assert blog_post.job_id == job_id
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_embeddings_uses_multi_row_insert():
+    """Test embeddings are written with one multi-row INSERT per batch."""
+    from sqlalchemy.dialects import postgresql
+    from app.db.crud import EmbeddingRepository
+    
+    class RecordingSession:
+        """Captures executed statements instead of talking to a database."""
+        
+        def __init__(self):
+            self.statements = []
+        
+        async def execute(self, stmt):
+            self.statements.append(stmt)
+    
+    session = RecordingSession()
+    chunks = [f"chunk {i}" for i in range(5)]
+    vectors = [[float(i)] * 1536 for i in range(5)]
+    
+    count = await EmbeddingRepository.bulk_create(session, 1, chunks, vectors, batch_size=3)
+    
+    assert count == 5
+    assert len(session.statements) == 2
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert sql.count("(%(blog_post_id_m") == 3
+    compiled = session.statements[1].compile(dialect=postgresql.dialect())
+    assert compiled.params["chunk_index_m1"] == 4
+
+
+@pytest.mark.asyncio
+async def test_filtered_search_pages_past_ef_search(db_session, monkeypatch):
+    """Test filtered, paged HNSW search returns every match, not just ef_search candidates."""
+    from sqlalchemy import text
+    from app.config import settings
+    from app.db.crud import EmbeddingRepository
+    from app.services.embeddings import EmbeddingService
+    
+    def vector(i):
+        return [1.0, i / 100] + [0.0] * 1534
+    
+    class FixedEmbeddings:
+        async def aembed_documents(self, texts):
+            return [vector(0) for _ in texts]
+    
+    job_id = uuid4()
+    await JobRepository.create(db_session, job_id=job_id, channel_name="Chan", video_title="Video")
+    blog_post = await BlogPostRepository.create(
+        db_session, job_id=job_id, title="Post", content="# Post", video_metadata={}
+    )
+    chunks = [f"chunk {i}" for i in range(60)]
+    await EmbeddingRepository.bulk_create(
+        db_session, blog_post.id, chunks, [vector(i) for i in range(60)]
+    )
+    await db_session.execute(text(
+        "CREATE INDEX test_embeddings_hnsw ON embeddings USING hnsw (embedding vector_cosine_ops)"
+    ))
+    await db_session.commit()
+    
+    monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+    monkeypatch.setattr(settings, "hnsw_ef_search", 10)
+    service = EmbeddingService(cache=None, embeddings_model=FixedEmbeddings())
+    
+    found, after = [], None
+    while True:
+        # Force the index even on a table this small
+        await db_session.execute(text("SET LOCAL enable_seqscan = off"))
+        hits, after = await service.search(db_session, "query", limit=25, after=after, channel="chan")
+        await db_session.commit()
+        found += [hit["chunk_text"] for hit in hits]
+        if after is None:
+            break
+    
+    assert found == chunks
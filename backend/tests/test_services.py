@@ -1,4 +1,5 @@
 """Tests for YouTube service."""
+from types import SimpleNamespace
 import pytest
 from app.services.youtube import YouTubeService
 
@@ -29,3 +30,1074 @@ def test_get_transcript():
     transcript = service.get_transcript("dQw4w9WgXcQ")
     # Transcript may or may not be available
     assert transcript is None or isinstance(transcript, str)
+
+
+class FakeYouTubeClient:
+    """Minimal stand-in for the Data API client's search().list() chain."""
+    
+    def __init__(self):
+        self.requests = []
+    
+    def search(self):
+        return self
+    
+    def list(self, **params):
+        self.requests.append(params)
+        if params["type"] == "channel":
+            response = {"items": [{"id": {"channelId": "UC123"}}]}
+        else:
+            response = {"items": [{
+                "id": {"videoId": "abc123def45"},
+                "snippet": {
+                    "title": "Intro to Vectors", "description": "", "channelTitle": "Chan",
+                    "publishedAt": "2024-01-01T00:00:00Z", "thumbnails": {"high": {"url": "u"}}
+                }
+            }]}
+        return SimpleNamespace(execute=lambda: response)
+
+
+def test_search_video_caches_channel_and_results():
+    """Test repeated searches skip the API and quota units are counted."""
+    from app.services.cache import MemoryCache
+    from app.services.youtube import QuotaTracker
+    
+    service = YouTubeService(channel_cache=MemoryCache(), search_cache=MemoryCache(), quota=QuotaTracker())
+    service.youtube = FakeYouTubeClient()
+    
+    assert service.search_video("@Chan", "intro to vectors")["video_id"] == "abc123def45"
+    assert service.search_video("chan", "Intro to Vectors ")["video_id"] == "abc123def45"
+    service.search_video("Chan", "another video")
+    
+    # Channel resolved once; two distinct queries searched once each
+    assert [request["type"] for request in service.youtube.requests] == ["channel", "video", "video"]
+    stats = service.cache_stats()
+    assert stats["quota"] == {"calls": {"search.list": 3}, "units": 300}
+    assert stats["search_cache"]["hits"] == 1
+
+
+def _section_state(outline: str) -> dict:
+    """Build a minimal pipeline state for section writing tests."""
+    return {
+        "transcript": "transcript text",
+        "key_points": ["1. First point"],
+        "outline": outline,
+        "sections": [],
+        "failed_sections": [],
+        "error": ""
+    }
+
+
+@pytest.mark.asyncio
+async def test_write_sections_keeps_order_and_retries_failed_section():
+    """Test concurrent section writing retries only the failed section."""
+    from langchain_core.runnables import RunnableLambda
+    from app.services.llm_pipeline import LLMPipeline
+    
+    calls = {}
+    
+    def fake_section(inputs):
+        title = inputs["section_title"]
+        calls[title] = calls.get(title, 0) + 1
+        if title == "Second" and calls[title] == 1:
+            raise RuntimeError("transient failure")
+        return f"content for {title}"
+    
+    pipeline = LLMPipeline()
+    pipeline.section_chain = RunnableLambda(fake_section)
+    
+    state = await pipeline.awrite_sections(_section_state("## First\n## Second\n## Third"))
+    
+    assert state["error"] == ""
+    assert [s["title"] for s in state["sections"]] == ["First", "Second", "Third"]
+    assert state["failed_sections"] == []
+    assert calls == {"First": 1, "Second": 2, "Third": 1}
+
+
+def test_write_sections_drops_only_failing_section():
+    """Test a persistently failing section does not discard the others."""
+    from langchain_core.runnables import RunnableLambda
+    from app.services.llm_pipeline import LLMPipeline
+    
+    def fake_section(inputs):
+        if inputs["section_title"] == "Broken":
+            raise RuntimeError("permanent failure")
+        return "ok"
+    
+    pipeline = LLMPipeline()
+    pipeline.section_chain = RunnableLambda(fake_section)
+    
+    state = pipeline.write_sections(_section_state("## Intro\n## Broken\n## Outro"))
+    
+    assert state["error"] == ""
+    assert [s["title"] for s in state["sections"]] == ["Intro", "Outro"]
+    assert state["failed_sections"] == ["Broken"]
+
+
+def _fake_chain(text: str, async_only: bool = False):
+    """Build a fake chain returning fixed text, optionally refusing sync calls."""
+    from langchain_core.runnables import RunnableLambda
+    
+    def sync_call(inputs):
+        if async_only:
+            raise AssertionError("blocking invoke() used inside the event loop")
+        return text
+    
+    async def async_call(inputs):
+        return text
+    
+    return RunnableLambda(sync_call, afunc=async_call)
+
+
+def _install_fake_chains(pipeline, async_only: bool = False):
+    """Replace all LLM chains on a pipeline with fakes."""
+    pipeline.key_points_chain = _fake_chain("1. Point one\n2. Point two", async_only)
+    pipeline.outline_chain = _fake_chain("# Title\n## Intro\n## Body", async_only)
+    pipeline.section_chain = _fake_chain("Section body", async_only)
+    pipeline.polish_chain = _fake_chain("# Final blog", async_only)
+
+
+@pytest.mark.asyncio
+async def test_generate_blog_uses_async_nodes():
+    """Test graph.ainvoke drives every node through ainvoke."""
+    from app.services.llm_pipeline import LLMPipeline
+    
+    pipeline = LLMPipeline()
+    _install_fake_chains(pipeline, async_only=True)
+    
+    result = await pipeline.generate_blog("vid", "Title", "Desc", "Channel", "transcript", {})
+    
+    assert result["content"] == "# Final blog"
+    assert result["metadata"]["key_points"] == ["1. Point one", "2. Point two"]
+    assert result["metadata"]["sections_count"] == 2
+
+
+def test_generate_blog_sync_fallback():
+    """Test the sync fallback runs the same workflow without an event loop."""
+    from app.services.llm_pipeline import LLMPipeline
+    
+    pipeline = LLMPipeline()
+    _install_fake_chains(pipeline)
+    
+    result = pipeline.generate_blog_sync("vid", "Title", "Desc", "Channel", "transcript", {})
+    
+    assert result["content"] == "# Final blog"
+    assert result["metadata"]["sections_count"] == 2
+
+
+def test_get_llm_pipeline_reuses_compiled_graph():
+    """Test the process-wide pipeline and its graph are built once."""
+    from app.services.llm_pipeline import get_llm_pipeline
+    
+    pipeline = get_llm_pipeline()
+    
+    assert get_llm_pipeline() is pipeline
+    assert get_llm_pipeline().graph is pipeline.graph
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cache_backends_ttl_and_counters(backend, tmp_path):
+    """Test local cache backends store values, expire them and count hits."""
+    from app.services.cache import create_cache
+    
+    cache = create_cache(
+        backend,
+        namespace="test",
+        max_entries=2,
+        ttl_seconds=60,
+        sqlite_path=str(tmp_path / "cache.sqlite3")
+    )
+    
+    assert cache.get("a") is None
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    
+    # "b" is least recently used and gets evicted
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 2
+
+
+def test_memory_cache_expires_entries():
+    """Test TTL expiry in the in-process cache."""
+    from app.services.cache import MemoryCache
+    
+    cache = MemoryCache(ttl_seconds=1)
+    cache.set("key", "value")
+    cache._data["key"] = ("value", 0)  # Force expiry
+    
+    assert cache.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_hit_skips_model_call():
+    """Test identical chain inputs are served from the response cache."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.services.cache import MemoryCache
+    from app.services.llm_pipeline import LLMPipeline
+    
+    llm = FakeListChatModel(responses=["first", "second"])
+    pipeline = LLMPipeline(llm=llm, cache=MemoryCache())
+    inputs = {"title": "T", "channel": "C", "key_points": "1. Point"}
+    
+    assert await pipeline.outline_chain.ainvoke(inputs) == "first"
+    assert pipeline.outline_chain.invoke(inputs) == "first"
+    assert llm.i == 1  # Model was only called once
+    
+    assert await pipeline.outline_chain.ainvoke({**inputs, "title": "Other"}) == "second"
+    assert pipeline.cache.stats.hits == 1
+    assert pipeline.cache.stats.misses == 2
+
+
+def test_split_by_tokens_respects_budget():
+    """Test token-based splitting and truncation."""
+    from app.services.tokens import count_tokens, split_by_tokens, truncate_to_tokens
+    
+    text = "word " * 500
+    chunks = split_by_tokens(text, 50)
+    
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert count_tokens(truncate_to_tokens(text, 20)) <= 20
+
+
+@pytest.mark.asyncio
+async def test_extract_key_points_map_reduce(monkeypatch):
+    """Test long transcripts are mapped in chunks and merged without duplicates."""
+    from langchain_core.runnables import RunnableLambda
+    from app.config import settings
+    from app.services.llm_pipeline import LLMPipeline
+    
+    monkeypatch.setattr(settings, "key_points_mode", "map_reduce")
+    monkeypatch.setattr(settings, "key_points_chunk_tokens", 50)
+    
+    map_calls = []
+    reduce_inputs = []
+    
+    async def fake_map(inputs):
+        map_calls.append(inputs["transcript"])
+        return f"1. Shared insight\n2. Detail from part {len(map_calls)}"
+    
+    async def fake_reduce(inputs):
+        reduce_inputs.append(inputs["key_points"])
+        return "1. Merged point\n2. Another merged point"
+    
+    pipeline = LLMPipeline()
+    pipeline.key_points_chain = RunnableLambda(fake_map)
+    pipeline.key_points_reduce_chain = RunnableLambda(fake_reduce)
+    
+    state = {
+        "video_title": "T",
+        "channel_title": "C",
+        "video_description": "D",
+        "transcript": "spoken words " * 200,
+        "key_points": [],
+        "error": ""
+    }
+    state = await pipeline.aextract_key_points(state)
+    
+    assert len(map_calls) > 1
+    assert "".join(map_calls) == "spoken words " * 200  # Nothing truncated
+    assert reduce_inputs[0].count("Shared insight") == 1
+    assert state["key_points"] == ["1. Merged point", "2. Another merged point"]
+
+
+def test_vector_index_returns_top_k_by_cosine():
+    """Test the in-memory index ranks texts by cosine similarity."""
+    from app.services.retrieval import InMemoryVectorIndex
+    
+    index = InMemoryVectorIndex(
+        ["north", "east", "north-east"],
+        [[0, 1], [1, 0], [1, 1]]
+    )
+    
+    assert index.search([[0, 2], [3, 0]], k=2) == [[0, 2], [1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_write_sections_uses_section_specific_context(monkeypatch):
+    """Test each section only receives the transcript chunks relevant to it."""
+    from langchain_core.runnables import RunnableLambda
+    from app.config import settings
+    from app.services.llm_pipeline import LLMPipeline
+    
+    class FakeEmbeddingService:
+        """Embeds text by keyword so retrieval is predictable."""
+        
+        def __init__(self):
+            self.calls = 0
+        
+        def split_text(self, text):
+            return text.split("|")
+        
+        async def embed_documents(self, texts):
+            self.calls += 1
+            return [[float("cats" in t.lower()), float("dogs" in t.lower()), 0.1] for t in texts]
+    
+    contexts = {}
+    
+    async def fake_section(inputs):
+        contexts[inputs["section_title"]] = inputs["context"]
+        return "body"
+    
+    embedding_service = FakeEmbeddingService()
+    pipeline = LLMPipeline(embedding_service=embedding_service)
+    pipeline.section_chain = RunnableLambda(fake_section)
+    
+    chunks = ["cats purr", "dogs bark", "cats nap", "dogs fetch", "weather", "cats climb"]
+    state = _section_state("## All About Cats\n## All About Dogs")
+    state["transcript"] = "|".join(chunks)
+    
+    monkeypatch.setattr(settings, "section_context_top_k", 2)
+    await pipeline.awrite_sections(state)
+    
+    assert embedding_service.calls == 1
+    assert "dogs" not in contexts["All About Cats"]
+    assert "cats" not in contexts["All About Dogs"]
+    assert contexts["All About Dogs"] == "dogs bark\n\ndogs fetch"
+
+
+def test_token_budget_trims_least_important_input_first():
+    """Test prompt inputs are packed into the model's input budget."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from app.services.tokens import TokenBudget, count_tokens
+    
+    prompt = ChatPromptTemplate.from_messages([("user", "{title}\n{description}\n{transcript}")])
+    budget = TokenBudget("gpt-4", max_output_tokens=100, context_tokens=400)
+    inputs = {"title": "Title", "description": "desc " * 100, "transcript": "words " * 1000}
+    
+    fitted, prompt_tokens = budget.fit(prompt, inputs, ["description", "transcript"])
+    
+    assert prompt_tokens <= budget.max_input_tokens
+    assert prompt_tokens == count_tokens(prompt.format(**fitted))
+    assert fitted["title"] == "Title"
+    assert fitted["description"] == ""
+    assert fitted["transcript"]
+
+
+@pytest.mark.asyncio
+async def test_chain_reports_token_usage(monkeypatch):
+    """Test every model call is budgeted and its token counts recorded."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.config import settings
+    from app.services.llm_pipeline import LLMPipeline
+    
+    monkeypatch.setattr(settings, "llm_context_tokens", 2000)
+    pipeline = LLMPipeline(llm=FakeListChatModel(responses=["1. Point"]))
+    
+    await pipeline.key_points_chain.ainvoke({
+        "title": "T",
+        "channel": "C",
+        "description": "D",
+        "transcript": "very long transcript " * 5000
+    })
+    
+    usage = pipeline.token_usage["key_points"]
+    assert usage["calls"] == 1
+    assert 0 < usage["prompt_tokens"] <= 2000 - 800
+    assert usage["completion_tokens"] > 0
+
+
+@pytest.mark.asyncio
+async def test_generate_blog_streams_section_and_polish_tokens():
+    """Test section and polish tokens reach the on_token callback."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.services.cache import MemoryCache
+    from app.services.llm_pipeline import LLMPipeline
+    
+    llm = FakeListChatModel(responses=[
+        "1. Point",
+        "# Title\n## Only Section",
+        "Section text",
+        "Final blog"
+    ])
+    pipeline = LLMPipeline(llm=llm, cache=MemoryCache())
+    
+    tokens = []
+    
+    async def on_token(stage, token, section):
+        tokens.append((stage, token, section))
+    
+    result = await pipeline.generate_blog("vid", "T", "D", "C", "transcript", {}, on_token=on_token)
+    
+    assert result["content"] == "Final blog"
+    assert {stage for stage, _, _ in tokens} == {"section", "polish"}
+    assert "".join(t for stage, t, _ in tokens if stage == "section") == "Section text"
+    assert all(section == "Only Section" for stage, _, section in tokens if stage == "section")
+    assert "".join(t for stage, t, _ in tokens if stage == "polish") == "Final blog"
+
+
+def test_format_sse():
+    """Test server-sent event framing."""
+    from app.services.events import format_sse
+    
+    frame = format_sse({"type": "token", "token": "hi"})
+    
+    assert frame.startswith("event: token\ndata: ")
+    assert frame.endswith("\n\n")
+
+
+@pytest.mark.asyncio
+async def test_publish_progress_versions_snapshot(fake_redis):
+    """Test progress updates merge into a versioned snapshot."""
+    from app.services.events import get_progress, publish_progress
+    
+    await publish_progress("job-1", "queued", 0, "Queued", created_at="2024-01-01T00:00:00")
+    await publish_progress("job-1", "running", 30, "Fetching transcript...")
+    await publish_progress("job-1", "failed", None, "Failed", error="boom")
+    
+    snapshot = await get_progress("job-1")
+    
+    assert snapshot["version"] == 3
+    assert snapshot["status"] == "failed"
+    assert snapshot["progress"] == 30  # None keeps the previous value
+    assert snapshot["created_at"] == "2024-01-01T00:00:00"
+    assert snapshot["error"] == "boom"
+
+
+@pytest.mark.asyncio
+async def test_wait_for_progress_returns_on_publish(fake_redis):
+    """Test long-polling wakes up when a newer version is published."""
+    import asyncio
+    from app.services.events import publish_progress, wait_for_progress
+    
+    await publish_progress("job-2", "running", 10, "Started")
+    
+    async def publish_later():
+        await asyncio.sleep(0.1)
+        await publish_progress("job-2", "running", 50, "Halfway")
+    
+    publisher = asyncio.create_task(publish_later())
+    snapshot = await wait_for_progress("job-2", after_version=1, timeout=5)
+    await publisher
+    
+    assert snapshot["version"] == 2
+    assert snapshot["progress"] == 50
+    
+    # Nothing newer: returns the current snapshot after the timeout
+    snapshot = await wait_for_progress("job-2", after_version=2, timeout=0.2)
+    assert snapshot["version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_token_stream_ends_for_finished_and_running_jobs(fake_redis):
+    """Test a late subscriber gets the end event of a finished job and a live one gets tokens."""
+    import asyncio
+    from app.services.events import TokenStreamPublisher, follow_token_stream, publish_progress
+    
+    await publish_progress("done", "failed", None, "Failed", error="boom")
+    events = [event async for event in follow_token_stream("done", timeout=0.2)]
+    assert events == [{"type": "end", "status": "failed", "error": "boom"}]
+    
+    await publish_progress("live", "running", 60, "Writing sections...")
+    stream = follow_token_stream("live", timeout=0.2)
+    first = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.05)
+    publisher = TokenStreamPublisher("live")
+    await publisher.on_token("sections", "Hello")
+    await publisher.end("completed")
+    
+    events = [await first] + [event async for event in stream]
+    assert [event["type"] for event in events] == ["token", "end"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index_type,expected", [
+    ("hnsw", "SET LOCAL hnsw.ef_search = 80"),
+    ("ivfflat", "SET LOCAL ivfflat.probes = 10"),
+])
+async def test_configure_search_tunes_ann_index(monkeypatch, index_type, expected):
+    """Test per-query ANN tuning is scoped to the transaction."""
+    from app.config import settings
+    from app.services.embeddings import EmbeddingService
+    
+    class RecordingSession:
+        def __init__(self):
+            self.sql = []
+        
+        async def execute(self, stmt):
+            self.sql.append(str(stmt))
+    
+    monkeypatch.setattr(settings, "vector_index_type", index_type)
+    monkeypatch.setattr(settings, "ivfflat_probes", 10)
+    session = RecordingSession()
+    
+    await EmbeddingService().configure_search(session, ef_search=80)
+    
+    assert session.sql == [expected]
+
+
+class CountingEmbeddings:
+    """Fake embeddings model that records the texts it is asked to embed."""
+    
+    model = "fake-embedding"
+    
+    def __init__(self):
+        self.calls = []
+    
+    def _vector(self, text):
+        return [float(len(text)), 1.0, 0.5]
+    
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+    
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache_batches_only_misses():
+    """Test cached vectors are reused and misses are embedded in one call."""
+    from app.services.cache import MemoryCache
+    from app.services.embeddings import EmbeddingService
+    
+    service = EmbeddingService(cache=MemoryCache())
+    service.embeddings_model = CountingEmbeddings()
+    
+    assert await service.embed_documents(["aa", "bbb"]) == [[2.0, 1.0, 0.5], [3.0, 1.0, 0.5]]
+    vectors = await service.embed_documents(["bbb", "cccc", "aa", "cccc"])
+    
+    assert vectors == [[3.0, 1.0, 0.5], [4.0, 1.0, 0.5], [2.0, 1.0, 0.5], [4.0, 1.0, 0.5]]
+    assert service.embeddings_model.calls == [["aa", "bbb"], ["cccc"]]
+    
+    # Repeated queries never reach the model again
+    await service.embed_text("cccc")
+    assert service.embed_documents_sync(["aa"]) == [[2.0, 1.0, 0.5]]
+    assert len(service.embeddings_model.calls) == 2
+    assert service.cache_stats()["hits"] == 4
+
+
+@pytest.mark.asyncio
+async def test_tiered_cache_promotes_shared_hits(tmp_path):
+    """Test the local tier is filled from the shared tier on a hit."""
+    from app.services.cache import MemoryCache, SQLiteCache, TieredCache
+    
+    shared = SQLiteCache(str(tmp_path / "cache.sqlite3"), namespace="test")
+    shared.set("a", "1")
+    cache = TieredCache(MemoryCache(), shared)
+    
+    assert await cache.aget_many(["a", "b"]) == ["1", None]
+    assert cache.local.get("a") == "1"
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    
+    await cache.aset_many({"b": "2"})
+    assert shared.get("b") == "2"
+    assert cache.get("b") == "2"
+
+
+def test_local_embedding_provider_is_deterministic(monkeypatch):
+    """Test the offline hashing provider is selectable and lexically meaningful."""
+    import numpy as np
+    from app.config import settings
+    from app.services.embeddings import EmbeddingService
+    from app.services.local_embeddings import HashingEmbeddings
+    
+    monkeypatch.setattr(settings, "embedding_provider", "local")
+    service = EmbeddingService(cache=None)
+    assert isinstance(service.embeddings_model, HashingEmbeddings)
+    
+    texts = ["vector search in postgres", "postgres vector search index", "baking sourdough bread"]
+    vectors = np.asarray(service.embed_documents_sync(texts))
+    
+    assert vectors.shape == (3, settings.embedding_dimensions)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+    assert HashingEmbeddings().embed_query(texts[0]) == vectors[0].tolist()
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """Test items ranked by both rankers beat items ranked highly by one."""
+    from app.services.retrieval import reciprocal_rank_fusion
+    
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "b"]], k=60)
+    
+    assert [item for item, _ in fused] == ["c", "b", "a", "d"]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["hybrid", "lexical"])
+async def test_hybrid_search_fuses_lexical_and_vector(mode):
+    """Test hybrid search fuses both rankings and lexical mode skips embedding."""
+    from types import SimpleNamespace
+    from app.services.embeddings import EmbeddingService
+    
+    def row(chunk_id, **extra):
+        return SimpleNamespace(
+            id=chunk_id, chunk_text=f"chunk {chunk_id}", chunk_index=0,
+            title="Post", blog_post_id=1, **extra
+        )
+    
+    class FakeSession:
+        async def execute(self, stmt):
+            sql = str(stmt)
+            if "ts_rank_cd" in sql:
+                rows = [row(1, rank=0.9), row(2, rank=0.5)]
+            elif "<=>" in sql:
+                rows = [row(2, distance=0.1), row(3, distance=0.2)]
+            else:
+                rows = []  # SET LOCAL
+            return SimpleNamespace(all=lambda: rows)
+    
+    embeddings = CountingEmbeddings()
+    service = EmbeddingService(cache=None, embeddings_model=embeddings)
+    
+    hits = await service.hybrid_search(FakeSession(), "postgres tuning", limit=3, mode=mode)
+    
+    if mode == "lexical":
+        assert [hit["blog_post_id"] for hit in hits] == [1, 1]
+        assert [hit["vector_rank"] for hit in hits] == [None, None]
+        assert embeddings.calls == []
+    else:
+        assert [hit["chunk_text"] for hit in hits] == ["chunk 2", "chunk 1", "chunk 3"]
+        assert (hits[0]["lexical_rank"], hits[0]["vector_rank"]) == (2, 1)
+        assert embeddings.calls == [["postgres tuning"]]
+
+
+@pytest.mark.asyncio
+async def test_search_pushes_filters_and_keyset_into_sql():
+    """Test filters, threshold and pagination are part of the SQL query."""
+    from types import SimpleNamespace
+    from sqlalchemy.dialects import postgresql
+    from app.services.embeddings import EmbeddingService
+    
+    class FakeSession:
+        def __init__(self):
+            self.sql = ""
+        
+        async def execute(self, stmt):
+            rows = []
+            if not isinstance(stmt, str) and "SET LOCAL" not in str(stmt):
+                self.sql = str(stmt.compile(dialect=postgresql.dialect()))
+                rows = [
+                    SimpleNamespace(
+                        id=i, chunk_text="text", chunk_index=0, title="Post", blog_post_id=i,
+                        created_at=None, channel_name="DB", video_id="abc", distance=0.1 * i
+                    )
+                    for i in range(1, 4)
+                ]
+            return SimpleNamespace(all=lambda: rows)
+    
+    session = FakeSession()
+    service = EmbeddingService(cache=None, embeddings_model=CountingEmbeddings())
+    
+    hits, next_after = await service.search(
+        session, "query", limit=2, after=(0.05, 9), channel="DB",
+        video_id="abc", min_similarity=0.5, collapse=True
+    )
+    
+    assert len(hits) == 2
+    assert next_after == (pytest.approx(0.2), 2)
+    assert "DISTINCT ON (blog_posts.id)" in session.sql
+    assert "lower(jobs.channel_name)" in session.sql
+    assert "jobs.video_id =" in session.sql
+    assert "(anon_1.distance, anon_1.id) >" in session.sql
+    assert "LIMIT" in session.sql
+
+
+@pytest.mark.asyncio
+async def test_search_scans_hnsw_past_ef_search_when_filtered(monkeypatch):
+    """Test filtered or paged searches turn on the iterative scan and cover the page."""
+    from types import SimpleNamespace
+    from app.config import settings
+    from app.services.embeddings import EmbeddingService
+    
+    class RecordingSession:
+        def __init__(self):
+            self.sql = []
+        
+        async def execute(self, stmt):
+            if "SET LOCAL" in str(stmt):
+                self.sql.append(str(stmt))
+            return SimpleNamespace(all=lambda: [])
+    
+    monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+    monkeypatch.setattr(settings, "hnsw_ef_search", 40)
+    service = EmbeddingService(cache=None, embeddings_model=CountingEmbeddings())
+    
+    plain = RecordingSession()
+    await service.search(plain, "query", limit=10)
+    filtered = RecordingSession()
+    await service.search(filtered, "query", limit=100, channel="DB")
+    
+    assert plain.sql == ["SET LOCAL hnsw.ef_search = 40"]
+    assert filtered.sql == [
+        "SET LOCAL hnsw.ef_search = 101",
+        "SET LOCAL hnsw.iterative_scan = strict_order",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_claim_video_is_single_flight(fake_redis):
+    """Test only one job holds a video's lock and only it can release it."""
+    from app.services.dedupe import claim_video, get_leader, release_video
+    
+    assert await claim_video("vid", "job-a") == "job-a"
+    assert await claim_video("vid", "job-b") == "job-a"
+    
+    await release_video("vid", "job-b")  # Not the holder: no effect
+    assert await get_leader("vid") == "job-a"
+    
+    await release_video("vid", "job-a")
+    assert await claim_video("vid", "job-b") == "job-b"
+
+
+@pytest.mark.asyncio
+async def test_leader_refreshes_its_lock_and_followers(fake_redis):
+    """Test the leader's lock and followers outlive the TTL when refreshed, and only by the leader."""
+    from app.config import settings
+    from app.services import dedupe
+    
+    await dedupe.claim_video("vid", "job-a")
+    await dedupe.attach_follower("job-a", "job-b")
+    await fake_redis.expire(dedupe.leader_key("vid"), 5)
+    await fake_redis.expire(dedupe.followers_key("job-a"), 5)
+    
+    assert not await dedupe.refresh_video_claim("vid", "job-c")
+    assert await fake_redis.ttl(dedupe.leader_key("vid")) <= 5
+    
+    assert await dedupe.refresh_video_claim("vid", "job-a")
+    assert await fake_redis.ttl(dedupe.leader_key("vid")) > 5
+    assert await fake_redis.ttl(dedupe.followers_key("job-a")) > settings.video_lock_ttl_seconds - 5
+
+
+@pytest.mark.asyncio
+async def test_attached_jobs_are_settled_by_leader(fake_redis, monkeypatch):
+    """Test followers attach to an in-flight run and get its result when it ends."""
+    import uuid
+    from app.db.crud import BlogPostRepository, JobRepository
+    from app.services import dedupe
+    from app.services.events import get_progress, publish_progress
+    
+    attached = {}
+    
+    async def fake_attach_result(session, job_id, source_job_id, status=None, error=None):
+        attached[str(job_id)] = (str(source_job_id), status)
+    
+    async def no_recent_post(session, video_id, max_age_seconds):
+        return None
+    
+    monkeypatch.setattr(JobRepository, "attach_result", fake_attach_result)
+    monkeypatch.setattr(BlogPostRepository, "get_recent_by_video_id", no_recent_post)
+    leader, follower, late = (str(uuid.uuid4()) for _ in range(3))
+    
+    assert await dedupe.claim_or_follow(None, leader, "vid") is None
+    await publish_progress(leader, "running", 60, "Generating blog post...")
+    
+    assert await dedupe.claim_or_follow(None, follower, "vid") == dedupe.ATTACHED
+    assert (await get_progress(follower))["source_job_id"] == leader
+    
+    # Leader finishes: terminal status first, then followers are settled
+    await publish_progress(leader, "completed", 100, "Completed!", blog_post_id=7)
+    assert await dedupe.settle_followers(None, leader, "completed", blog_post_id=7) == 1
+    
+    snapshot = await get_progress(follower)
+    assert snapshot["status"] == "completed"
+    assert snapshot["blog_post_id"] == 7
+    assert attached[follower][0] == leader
+    
+    # A job attaching after the leader finished settles itself from the final snapshot
+    assert await dedupe.attach_follower(leader, late) is not None
+
+
+@pytest.mark.asyncio
+async def test_async_youtube_service_against_stub(youtube_stub):
+    """Test the async client talks to the Data API over one pooled client."""
+    import httpx
+    from app.services.cache import MemoryCache
+    from app.services.youtube import AsyncYouTubeService, QuotaTracker
+    
+    service = AsyncYouTubeService(
+        channel_cache=MemoryCache(),
+        search_cache=MemoryCache(),
+        quota=QuotaTracker(),
+        api_key="test-key",
+        base_url="http://youtube.test",
+        transport=httpx.ASGITransport(app=youtube_stub)
+    )
+    
+    video = await service.search_video("@Chan", "intro to vectors")
+    client = service.client
+    assert video["video_id"] == "abc123def45"
+    assert await service.search_video("Chan", "Intro to Vectors") == video
+    
+    metadata = await service.get_video_metadata("abc123def45")
+    assert metadata["duration"] == "PT10M"
+    assert service.client is client
+    
+    assert [name for name, _ in youtube_stub.state.requests] == ["search", "search", "videos"]
+    assert all(params["key"] == "test-key" for _, params in youtube_stub.state.requests)
+    assert service.quota.units == 201
+    await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_async_youtube_service_shares_quota_without_blocking(youtube_stub, fake_redis):
+    """Test async calls add their quota units to the shared daily counter."""
+    import httpx
+    from app.services.youtube import AsyncYouTubeService, QuotaTracker
+    
+    quota = QuotaTracker()
+    quota._aredis = fake_redis
+    service = AsyncYouTubeService(
+        quota=quota,
+        api_key="test-key",
+        base_url="http://youtube.test",
+        transport=httpx.ASGITransport(app=youtube_stub)
+    )
+    
+    await service.get_video_metadata("abc123def45")
+    await service.aclose()
+    
+    assert quota.calls == {"videos.list": 1}
+    assert int(await fake_redis.get(QuotaTracker.daily_key())) == 1
+
+
+def test_async_youtube_client_closes_client_of_previous_loop():
+    """Test moving to a new event loop closes the client opened on the old one."""
+    import asyncio
+    import threading
+    from app.services.youtube import AsyncYouTubeService, QuotaTracker
+    
+    service = AsyncYouTubeService(quota=QuotaTracker(), api_key="test-key", base_url="http://youtube.test")
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever, daemon=True)
+    thread.start()
+    
+    async def get_client():
+        return service.client
+    
+    old_client = asyncio.run_coroutine_threadsafe(get_client(), old_loop).result(5)
+    new_loop = asyncio.new_event_loop()
+    new_client = new_loop.run_until_complete(get_client())
+    new_loop.close()
+    
+    # The old client is closed on its own loop
+    asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), old_loop).result(5)
+    old_loop.call_soon_threadsafe(old_loop.stop)
+    thread.join(5)
+    old_loop.close()
+    
+    assert new_client is not old_client
+    assert old_client.is_closed
+    assert not new_client.is_closed
+
+
+def test_transcript_compression_round_trip():
+    """Test transcript text survives compression with the available codec."""
+    from app.services.transcripts import compress_text, decompress_text
+    
+    text = "never gonna give you up " * 200
+    data, compression = compress_text(text)
+    
+    assert compression in ("zstd", "zlib")
+    assert len(data) < len(text) / 10
+    assert decompress_text(data, compression) == text
+
+
+@pytest.mark.asyncio
+async def test_get_transcript_checks_store_first(monkeypatch):
+    """Test stored transcripts skip the download and downloads get stored."""
+    from app.services import youtube
+    from app.services.cache import MemoryCache
+    
+    class FakeStore:
+        def __init__(self):
+            self.saved = {}
+        
+        async def get(self, video_id, language):
+            segments = self.saved.get((video_id, language))
+            return youtube.join_segments(segments) if segments else None
+        
+        async def save(self, video_id, language, segments):
+            self.saved[(video_id, language)] = segments
+    
+    downloads = []
+    
+    def fake_fetch(video_id, language):
+        downloads.append(video_id)
+        return [{"text": "hello", "start": 0.0, "duration": 1.5}, {"text": "world", "start": 1.5, "duration": 1.0}]
+    
+    monkeypatch.setattr(youtube, "fetch_transcript_segments", fake_fetch)
+    store = FakeStore()
+    service = youtube.AsyncYouTubeService(
+        channel_cache=MemoryCache(), search_cache=MemoryCache(), transcript_store=store
+    )
+    
+    assert await service.get_transcript("abc123def45") == "hello world"
+    assert await service.get_transcript("abc123def45") == "hello world"
+    assert downloads == ["abc123def45"]
+    assert store.saved[("abc123def45", "en")][1]["start"] == 1.5
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_queues_until_tokens_refill():
+    """Test the token bucket makes callers wait for refill instead of failing."""
+    from app.services.rate_limit import RateLimiter, parse_rate_limits
+    
+    limits = parse_rate_limits("fast=0:600, unlimited=0:0")
+    limiter = RateLimiter(limits)
+    
+    assert limits == {"fast": (0, 600), "unlimited": (0, 0)}
+    assert await limiter.acquire("fast", 600) == 0.0  # Bucket starts full
+    waited = await limiter.acquire("fast", 2)  # 600 TPM refills 10 tokens/s
+    assert 0.15 <= waited < 1.0
+    assert await limiter.acquire("other-model", 10**6) == 0.0
+    
+    stats = limiter.stats()
+    assert stats["fast"]["acquired"] == 2
+    assert stats["fast"]["waited"] == 1
+    assert stats["fast"]["wait_seconds"] == pytest.approx(waited)
+
+
+@pytest.mark.asyncio
+async def test_chain_charges_rate_limiter_before_model_call():
+    """Test chain calls acquire prompt plus output budget tokens; cache hits acquire nothing."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from app.services.cache import MemoryCache
+    from app.services.llm_pipeline import LLMPipeline, OUTPUT_TOKEN_BUDGETS
+    from app.services.rate_limit import RateLimiter
+    
+    class RecordingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__({})
+            self.calls = []
+        
+        async def acquire(self, model, tokens=0):
+            self.calls.append((model, tokens))
+            return 0.0
+    
+    limiter = RecordingLimiter()
+    pipeline = LLMPipeline(
+        llm=FakeListChatModel(responses=["# Outline"]), cache=MemoryCache(), rate_limiter=limiter
+    )
+    inputs = {"title": "T", "channel": "C", "key_points": "1. Point"}
+    
+    await pipeline.outline_chain.ainvoke(inputs)
+    await pipeline.outline_chain.ainvoke(inputs)
+    
+    assert len(limiter.calls) == 1
+    model, tokens = limiter.calls[0]
+    assert model == "FakeListChatModel"
+    assert tokens > OUTPUT_TOKEN_BUDGETS["outline"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_round_robins_submitters_within_capacity(fake_redis, monkeypatch):
+    """Test a heavy submitter cannot starve others and dispatch stops at the in-flight budget."""
+    from app.config import settings
+    from app.services import scheduler
+    
+    sent = []
+    monkeypatch.setattr(scheduler, "send_job", lambda lane, kwargs, priority: sent.append(kwargs["job_id"]))
+    monkeypatch.setattr(settings, "scheduler_interactive_max_in_flight", 4)
+    monkeypatch.setattr(settings, "scheduler_submitter_weights", "heavy=2")
+    
+    for i in range(5):
+        await scheduler.enqueue("interactive", "bulk-user", f"b{i}", {"job_id": f"b{i}"}, 3)
+    for i in range(3):
+        await scheduler.enqueue("interactive", "heavy", f"h{i}", {"job_id": f"h{i}"}, 3)
+    await scheduler.enqueue("interactive", "light", "l0", {"job_id": "l0"}, 3)
+    
+    assert await scheduler.dispatch("interactive") == ["b0", "h0", "h1", "l0"]
+    assert (await scheduler.queue_depths())["interactive"] == 5
+    
+    await scheduler.finish("h0")
+    await scheduler.finish("b0")
+    assert sent == ["b0", "h0", "h1", "l0", "b1", "h2"]
+
+
+@pytest.mark.asyncio
+async def test_admission_defers_interactive_and_limits_submitters(fake_redis, monkeypatch):
+    """Test a full interactive lane defers to bulk and a busy submitter is refused."""
+    from app.config import settings
+    from app.services import scheduler
+    
+    monkeypatch.setattr(settings, "admission_interactive_max_pending", 1)
+    monkeypatch.setattr(settings, "admission_max_pending_per_submitter", 2)
+    
+    assert await scheduler.admit("interactive", "alice") == "interactive"
+    await scheduler.enqueue("interactive", "alice", "a0", {"job_id": "a0"}, 3)
+    assert await scheduler.admit("interactive", "alice") == "bulk"
+    await scheduler.enqueue("bulk", "alice", "a1", {"job_id": "a1"}, 3)
+    
+    with pytest.raises(scheduler.AdmissionError) as excinfo:
+        await scheduler.admit("bulk", "alice")
+    assert excinfo.value.status_code == 429
+    assert await scheduler.admit("bulk", "bob") == "bulk"
+
+
+@pytest.mark.asyncio
+async def test_scheduler_requeues_jobs_the_broker_rejects(fake_redis, monkeypatch):
+    """Test a failed send puts the job back in its submitter's queue instead of losing it."""
+    from app.services import scheduler
+    
+    def broken_send(lane, kwargs, priority):
+        raise ConnectionError("broker down")
+    
+    await scheduler.enqueue("interactive", "alice", "a0", {"job_id": "a0"}, 3)
+    await scheduler.enqueue("interactive", "alice", "a1", {"job_id": "a1"}, 3)
+    monkeypatch.setattr(scheduler, "send_job", broken_send)
+    
+    assert await scheduler.dispatch("interactive") == []
+    assert (await scheduler.queue_depths("alice"))["interactive"] == 2
+    assert await fake_redis.lrange(scheduler.submitter_queue_key("interactive", "alice"), 0, -1) == ["a0", "a1"]
+    assert await fake_redis.zcard(scheduler.in_flight_key("interactive")) == 0
+    
+    sent = []
+    monkeypatch.setattr(scheduler, "send_job", lambda lane, kwargs, priority: sent.append(kwargs["job_id"]))
+    assert await scheduler.dispatch("interactive") == ["a0", "a1"]
+    assert sent == ["a0", "a1"]
+
+
+@pytest.mark.asyncio
+async def test_dispatch_publishes_off_the_event_loop(fake_redis, monkeypatch):
+    """Test a slow broker publish does not stall other coroutines."""
+    import asyncio
+    import time
+    from app.services import scheduler
+    
+    def slow_send(lane, kwargs, priority):
+        time.sleep(0.2)
+    
+    ticks = []
+    
+    async def ticker():
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+    
+    monkeypatch.setattr(scheduler, "send_job", slow_send)
+    await scheduler.enqueue("interactive", "alice", "a0", {"job_id": "a0"}, 3)
+    
+    ticking = asyncio.create_task(ticker())
+    assert await scheduler.dispatch("interactive") == ["a0"]
+    ticking.cancel()
+    
+    assert len(ticks) >= 5
+
+
+@pytest.mark.asyncio
+async def test_periodic_dispatcher_sends_jobs_without_new_submissions(fake_redis, monkeypatch):
+    """Test jobs whose in-flight slots expired are dispatched without any new submission."""
+    import asyncio
+    from app.config import settings
+    from app.services import scheduler
+    
+    sent = []
+    monkeypatch.setattr(scheduler, "send_job", lambda lane, kwargs, priority: sent.append(kwargs["job_id"]))
+    monkeypatch.setattr(settings, "scheduler_interactive_max_in_flight", 1)
+    await fake_redis.zadd(scheduler.in_flight_key("interactive"), {"crashed": 0})
+    await scheduler.enqueue("interactive", "alice", "a0", {"job_id": "a0"}, 3)
+    
+    dispatcher = asyncio.create_task(scheduler.run_dispatcher(0.01))
+    await asyncio.sleep(0.1)
+    dispatcher.cancel()
+    
+    assert sent == ["a0"]
@@ -0,0 +1,388 @@
+"""Tests for Celery worker tasks."""
+
+import asyncio
+import time
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_fetch_video_inputs_runs_fetches_concurrently():
+    """Test transcript and metadata fetches overlap and are timed."""
+    from app.workers.tasks import StepTimer, fetch_video_inputs
+
+    class SlowYouTube:
+        async def get_transcript(self, video_id):
+            await asyncio.sleep(0.2)
+            return "transcript"
+
+        async def get_video_metadata(self, video_id):
+            await asyncio.sleep(0.2)
+            return {"title": "Video"}
+
+    timer = StepTimer()
+    start = time.perf_counter()
+    transcript, metadata = await fetch_video_inputs(SlowYouTube(), "abc123def45", timer)
+    elapsed = time.perf_counter() - start
+
+    assert transcript == "transcript"
+    assert metadata == {"title": "Video"}
+    assert elapsed < 0.35
+    assert timer.timings["transcript"] >= 0.2
+    assert timer.timings["metadata"] >= 0.2
+    assert (
+        timer.timings["ingest"]
+        < timer.timings["transcript"] + timer.timings["metadata"]
+    )
+
+
+def test_worker_runtime_reuses_one_loop_across_tasks(monkeypatch):
+    """Test every task runs on the same long-lived loop until shutdown."""
+    from app.db import session as db_session
+    from app.workers.runtime import WorkerRuntime
+
+    engines = []
+    disposed = []
+
+    async def fake_dispose():
+        disposed.append(asyncio.get_running_loop())
+
+    monkeypatch.setattr(db_session, "init_engine", lambda: engines.append(object()))
+    monkeypatch.setattr(db_session, "dispose_engine", fake_dispose)
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    runtime = WorkerRuntime()
+    runtime.start()
+    first = runtime.run(current_loop())
+    second = runtime.run(current_loop())
+
+    assert first is second is runtime.loop
+    assert len(engines) == 1
+
+    runtime.stop()
+    assert disposed == [first]
+    assert not runtime.running
+
+
+def test_worker_runtime_caps_tasks_in_flight(monkeypatch):
+    """Test coroutines submitted from many threads overlap on one loop, up to max_in_flight."""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.db import session as db_session
+    from app.workers.runtime import WorkerRuntime
+
+    async def fake_dispose():
+        pass
+
+    monkeypatch.setattr(db_session, "init_engine", lambda: None)
+    monkeypatch.setattr(db_session, "dispose_engine", fake_dispose)
+
+    runtime = WorkerRuntime(max_in_flight=3)
+    runtime.start()
+    peak = []
+
+    async def job():
+        peak.append(runtime.in_flight)
+        await asyncio.sleep(0.1)
+        return asyncio.get_running_loop()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        loops = list(pool.map(lambda _: runtime.run(job()), range(6)))
+    elapsed = time.perf_counter() - start
+    runtime.stop()
+
+    assert all(loop is loops[0] for loop in loops)
+    assert max(peak) == 3
+    assert 0.2 <= elapsed < 0.5
+    assert runtime.in_flight == 0
+
+
+def test_worker_runtime_cancels_tasks_past_their_deadline(monkeypatch):
+    """Test a coroutine running longer than task_timeout is cancelled and frees its slot."""
+    from app.db import session as db_session
+    from app.workers.runtime import WorkerRuntime
+
+    async def fake_dispose():
+        pass
+
+    monkeypatch.setattr(db_session, "init_engine", lambda: None)
+    monkeypatch.setattr(db_session, "dispose_engine", fake_dispose)
+
+    runtime = WorkerRuntime(max_in_flight=1, task_timeout=0.1)
+    runtime.start()
+
+    with pytest.raises(asyncio.TimeoutError):
+        runtime.run(asyncio.sleep(5))
+    assert runtime.in_flight == 0
+    assert runtime.run(asyncio.sleep(0, result="next")) == "next"
+    runtime.stop()
+
+
+def test_worker_runtime_is_rebuilt_in_forked_child(monkeypatch):
+    """Test a child forked after the parent started its runtime gets a working one."""
+    import os
+    from app.db import session as db_session
+    from app.workers import runtime as worker_runtime
+
+    async def fake_dispose():
+        pass
+
+    monkeypatch.setattr(db_session, "init_engine", lambda: None)
+    monkeypatch.setattr(db_session, "dispose_engine", fake_dispose)
+    monkeypatch.setattr(worker_runtime, "_runtime", None)
+
+    parent = worker_runtime.get_runtime()
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            child = worker_runtime.get_runtime()
+            ok = child is not parent and child.run(asyncio.sleep(0, result=1), 5) == 1
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    worker_runtime.stop_runtime()
+
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_stage_resumes_from_checkpoints(monkeypatch):
+    """Test a stage reads earlier checkpoints, skips finished stages and checkpoints its output."""
+    from types import SimpleNamespace
+    from app.workers import tasks
+
+    saved = {}
+    stored = {
+        "ingest": SimpleNamespace(data={"transcript": "hello"}, duration_seconds=1.0)
+    }
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def get_all(session, job_id):
+        return dict(stored)
+
+    async def save(session, job_id, stage, data, duration_seconds=None):
+        saved[stage] = data
+        stored[stage] = SimpleNamespace(data=data, duration_seconds=duration_seconds)
+
+    async def key_points(session, job_id, outputs, timer):
+        return {"key_points": [outputs["ingest"]["transcript"].upper()]}
+
+    async def no_progress(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(tasks, "async_session_maker", FakeSession)
+    monkeypatch.setattr(tasks.CheckpointRepository, "get_all", get_all)
+    monkeypatch.setattr(tasks.CheckpointRepository, "save", save)
+    monkeypatch.setitem(tasks.STAGE_HANDLERS, "key_points", key_points)
+    monkeypatch.setattr(tasks, "report_progress", no_progress)
+
+    job_id = "00000000-0000-0000-0000-000000000001"
+
+    skipped = await tasks.run_stage(job_id, "ingest")
+    result = await tasks.run_stage(job_id, "key_points")
+
+    assert skipped["status"] == "skipped"
+    assert result["status"] == "checkpointed"
+    assert saved == {"key_points": {"key_points": ["HELLO"]}}
+
+
+@pytest.mark.asyncio
+async def test_run_stage_retries_completion_of_checkpointed_last_stage(monkeypatch):
+    """Test a retry of the last stage completes the job if an earlier attempt failed to."""
+    from types import SimpleNamespace
+    from app.models.database import JobStatus
+    from app.workers import tasks
+
+    stored = {"embed": SimpleNamespace(data={"chunks": 3}, duration_seconds=1.0)}
+    completed = []
+    job = SimpleNamespace(status=JobStatus.RUNNING.value)
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def get_all(session, job_id):
+        return dict(stored)
+
+    async def get_by_id(session, job_id):
+        return job
+
+    async def complete_job(session, job_id, outputs):
+        completed.append(outputs)
+        job.status = JobStatus.COMPLETED.value
+
+    monkeypatch.setattr(tasks, "async_session_maker", FakeSession)
+    monkeypatch.setattr(tasks.CheckpointRepository, "get_all", get_all)
+    monkeypatch.setattr(tasks.JobRepository, "get_by_id", get_by_id)
+    monkeypatch.setattr(tasks, "complete_job", complete_job)
+
+    job_id = "00000000-0000-0000-0000-000000000002"
+
+    first = await tasks.run_stage(job_id, "embed")
+    second = await tasks.run_stage(job_id, "embed")
+
+    assert first["status"] == second["status"] == "skipped"
+    assert completed == [{"embed": {"chunks": 3}}]
+
+
+@pytest.mark.parametrize(
+    "outcome, chain", [("attached", None), ("reused", None), (None, ["next"])]
+)
+def test_stage_task_stops_chain_of_jobs_served_by_another(monkeypatch, outcome, chain):
+    """Test the worker thread's request drops the remaining stages of a reused or attached job."""
+    from app.db import session as db_session
+    from app.workers import tasks
+    from app.workers.runtime import WorkerRuntime
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def get_all(session, job_id):
+        return {}
+
+    async def save(session, job_id, stage, data, duration_seconds=None):
+        pass
+
+    async def ingest(session, job_id, outputs, timer):
+        if outcome:
+            raise tasks.PipelineStopped(outcome)
+        return {}
+
+    async def nothing(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(db_session, "init_engine", lambda: None)
+    monkeypatch.setattr(db_session, "dispose_engine", nothing)
+    monkeypatch.setattr(tasks, "async_session_maker", FakeSession)
+    monkeypatch.setattr(tasks.CheckpointRepository, "get_all", get_all)
+    monkeypatch.setattr(tasks.CheckpointRepository, "save", save)
+    monkeypatch.setitem(tasks.STAGE_HANDLERS, "ingest", ingest)
+    monkeypatch.setattr(tasks, "report_progress", nothing)
+    monkeypatch.setattr(tasks.scheduler, "finish", nothing)
+
+    # Stages run on the runtime's loop thread, as in a worker
+    runtime = WorkerRuntime()
+    runtime.start()
+    monkeypatch.setattr(tasks, "get_runtime", lambda: runtime)
+
+    task = tasks.STAGE_TASKS["ingest"]
+    task.push_request(chain=["next"])
+    try:
+        task.run("00000000-0000-0000-0000-000000000003")
+        assert task.request.chain == chain
+    finally:
+        task.pop_request()
+        runtime.stop()
+
+
+def test_generate_task_routes_stages_to_its_lane(monkeypatch):
+    """Test a bulk job's stages run on the bulk stage queues with the job's priority."""
+    from types import SimpleNamespace
+    from app.workers import tasks
+
+    captured = []
+
+    def fake_chain(*signatures):
+        captured.extend(signatures)
+        return SimpleNamespace(apply_async=lambda: None)
+
+    def fake_run(coro):
+        coro.close()
+        return ["sections", "polish", "save"]
+
+    monkeypatch.setattr(tasks, "chain", fake_chain)
+    monkeypatch.setattr(tasks, "get_runtime", lambda: SimpleNamespace(run=fake_run))
+
+    result = tasks.generate_blog_post_task.run(
+        "job", "Chan", "Video", priority=6, lane="bulk"
+    )
+
+    assert result["stages"] == ["sections", "polish", "save"]
+    assert [sig.options["queue"] for sig in captured] == [
+        "llm.bulk",
+        "llm.bulk",
+        "db.bulk",
+    ]
+    assert all(sig.options["priority"] == 6 for sig in captured)
+
+
+def test_dispatcher_is_not_started_in_prefork_parent(monkeypatch):
+    """Test the main process starts the dispatcher for the threads pool only."""
+    from types import SimpleNamespace
+    from celery.concurrency import prefork, thread
+    from app.workers import tasks
+
+    started = []
+
+    def start_background(coro):
+        coro.close()
+        started.append(coro)
+
+    monkeypatch.setattr(tasks.settings, "fair_scheduling_enabled", True)
+    monkeypatch.setattr(
+        tasks, "get_runtime", lambda: SimpleNamespace(start_background=start_background)
+    )
+
+    prefork_pool = prefork.TaskPool.__new__(prefork.TaskPool)
+    tasks.start_main_process_dispatcher(sender=SimpleNamespace(pool=prefork_pool))
+    assert started == []
+
+    threads_pool = thread.TaskPool.__new__(thread.TaskPool)
+    tasks.start_main_process_dispatcher(sender=SimpleNamespace(pool=threads_pool))
+    assert len(started) == 1
+
+
+def test_generate_task_failure_frees_its_scheduler_slot(monkeypatch):
+    """Test a job that fails before its stages are dispatched is failed and leaves the lane."""
+    from types import SimpleNamespace
+    from app.workers import tasks
+
+    finished = []
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def broken_update(*args, **kwargs):
+        raise ConnectionError("database down")
+
+    async def finish(job_id):
+        finished.append(job_id)
+
+    def fake_run(coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    monkeypatch.setattr(tasks, "async_session_maker", FakeSession)
+    monkeypatch.setattr(tasks.JobRepository, "update_status", broken_update)
+    monkeypatch.setattr(tasks.scheduler, "finish", finish)
+    monkeypatch.setattr(tasks, "get_runtime", lambda: SimpleNamespace(run=fake_run))
+
+    job_id = "00000000-0000-0000-0000-000000000004"
+    result = tasks.generate_blog_post_task.apply(
+        kwargs={"job_id": job_id, "channel_name": "Chan", "video_title": "Video"}
+    )
+
+    assert result.failed()
+    assert finished == [job_id]